@@ -6,6 +6,7 @@ from flask_migrate import Migrate
 from flask_admin import Admin
 from flask_mail import Mail
 from flask_apscheduler import APScheduler
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from flask_cors import CORS
 from .models import db
 from flask_jwt_extended import JWTManager
@@ -18,7 +19,7 @@ admin = Admin(name='Admin Panel', template_mode='bootstrap4')
 scheduler = APScheduler()
 jwt = JWTManager()
 
-def create_app():
+def create_app(test_config=None):
     app = Flask(__name__)
     
     
@@ -27,7 +28,7 @@ def create_app():
             "origins": ["http://localhost:3000", "https://invotrack-frontend.vercel.app"],
             "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
             "allow_headers": ["Content-Type", "Authorization"],
-            "expose_headers": ["Content-Range", "X-Content-Range"],
+            "expose_headers": ["Content-Range", "X-Content-Range", "ETag", "X-Next-Cursor"],
             "supports_credentials": True
         }
     })
@@ -41,17 +42,48 @@ def create_app():
         MAIL_USE_TLS=os.getenv('MAIL_USE_TLS', 'true').lower() == 'true',
         MAIL_USERNAME=os.getenv('MAIL_USERNAME'),
         MAIL_PASSWORD=os.getenv('MAIL_PASSWORD'),
+        MAIL_BATCH_SIZE=int(os.getenv('MAIL_BATCH_SIZE', 50)),
+        MAIL_MAX_WORKERS=int(os.getenv('MAIL_MAX_WORKERS', 4)),
+        MAIL_RATE_LIMIT=float(os.getenv('MAIL_RATE_LIMIT', 10)),
+        OUTBOX_POLL_SECONDS=int(os.getenv('OUTBOX_POLL_SECONDS', 60)),
+        MPESA_CALLBACK_POLL_SECONDS=int(os.getenv('MPESA_CALLBACK_POLL_SECONDS', 10)),
+        INVOICE_NUMBER_FORMAT=os.getenv('INVOICE_NUMBER_FORMAT', 'INV-{number:06d}'),
+        INVOICE_NUMBER_BLOCK_SIZE=int(os.getenv('INVOICE_NUMBER_BLOCK_SIZE', 20)),
+        EMAIL_DELIVERABILITY_CHECK=os.getenv('EMAIL_DELIVERABILITY_CHECK', 'off'),
+        EMAIL_DOMAIN_CACHE_TTL=int(os.getenv('EMAIL_DOMAIN_CACHE_TTL', 24 * 3600)),
+        RESPONSE_CACHE_URL=os.getenv('RESPONSE_CACHE_URL'),
+        RESPONSE_CACHE_TTL=int(os.getenv('RESPONSE_CACHE_TTL', 30)),
+        RESPONSE_CACHE_SIZE=int(os.getenv('RESPONSE_CACHE_SIZE', 2048)),
+        METRICS_LOG_SECONDS=int(os.getenv('METRICS_LOG_SECONDS', 300)),
         SCHEDULER_API_ENABLED=True,
+        SCHEDULER_JOB_DEFAULTS={
+            "coalesce": True,
+            "max_instances": 1,
+            "misfire_grace_time": int(os.getenv('SCHEDULER_MISFIRE_GRACE_SECONDS', 12 * 3600))
+        },
+        SCHEDULER_LOCK_FILE=os.getenv('SCHEDULER_LOCK_FILE'),
+        SCHEDULER_AUTOSTART=os.getenv('SCHEDULER_AUTOSTART', 'false').lower() == 'true',
         CORS_HEADERS='Content-Type'
     )
+    if test_config:
+        app.config.update(test_config)
     
     db.init_app(app)
     mail.init_app(app)
     migrate.init_app(app, db)
     admin.init_app(app)
+    
+    # jobs live in the database so missed runs are caught up after a restart
+    with app.app_context():
+        app.config['SCHEDULER_JOBSTORES'] = {
+            "default": SQLAlchemyJobStore(engine=db.engine, tablename='scheduler_jobs')
+        }
     scheduler.init_app(app)
     jwt.init_app(app)
     
+    from .cache import init_cache
+    init_cache(app)
+    
     
     with app.app_context():
         
@@ -60,6 +92,7 @@ def create_app():
         from .user.invoices import invoices
         from .user.payments import payments
         from .user.user import user
+        from .user.dashboard import dashboard
         from .mpesa import mpesa
         
         app.register_blueprint(user_auth)
@@ -67,9 +100,28 @@ def create_app():
         app.register_blueprint(business, url_prefix="", name="business_route")
         app.register_blueprint(payments, url_prefix="")
         app.register_blueprint(user, url_prefix="")
+        app.register_blueprint(dashboard, url_prefix="")
         app.register_blueprint(mpesa, url_prefix="")
         
-        from .scheduler import init_scheduler
-        init_scheduler(app)
+        from .summaries import rebuild_summaries_command
+        app.cli.add_command(rebuild_summaries_command)
+        
+        from .outbox import outbox_worker_command
+        app.cli.add_command(outbox_worker_command)
+        
+        from .mpesa_callbacks import mpesa_callback_worker_command
+        app.cli.add_command(mpesa_callback_worker_command)
+        
+        from .reconciliation import reconcile_mpesa_command
+        app.cli.add_command(reconcile_mpesa_command)
+        
+        from .search import build_search_index_command
+        app.cli.add_command(build_search_index_command)
+        
+        from .scheduling import init_scheduler, scheduler_command
+        app.cli.add_command(scheduler_command)
+        # flask commands (migrations, workers) stay out of the leader election
+        if app.config['SCHEDULER_AUTOSTART'] and os.environ.get('FLASK_RUN_FROM_CLI') != 'true':
+            init_scheduler(app)
         
         return app
\ No newline at end of file
@@ -0,0 +1,132 @@
+import json
+from datetime import datetime
+from sqlalchemy import insert
+from .models import db, uuid7, Business, Invoice, InvoiceItem
+from .cache import mark_invoices_changed
+from .invoice_numbers import next_invoice_numbers
+from .summaries import apply_deltas
+from .validation import ValidationError, INVOICE_CREATE
+
+# Bulk invoice creation for ERP exports. Every document is validated before
+# anything is written, then all valid invoices and their items are inserted
+# with batched executemany INSERTs in a single transaction. The summaries are
+# adjusted once for the whole batch.
+
+MAX_BULK_INVOICES = 10000
+INSERT_BATCH_SIZE = 1000
+
+
+class BulkInvoiceError(ValueError):
+    """Raised when a bulk request body cannot be read."""
+
+
+def read_documents(request, ndjson_mimetype):
+    """
+    Reads the invoices of a bulk request: a JSON array, an object with an
+    `invoices` array, or one JSON object per line for NDJSON bodies.
+
+    Returns:
+        list: the submitted invoice documents
+
+    Raises:
+        BulkInvoiceError: if the body is not valid JSON or has too many invoices
+    """
+    if request.mimetype == ndjson_mimetype:
+        documents = []
+        for number, line in enumerate(request.stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                documents.append(json.loads(line))
+            except ValueError:
+                raise BulkInvoiceError(f"invalid JSON on line {number}")
+    else:
+        documents = request.get_json(silent=True)
+        if isinstance(documents, dict):
+            documents = documents.get('invoices')
+        if not isinstance(documents, list):
+            raise BulkInvoiceError("expected a JSON array of invoices")
+
+    if not documents:
+        raise BulkInvoiceError("no invoices provided")
+    if len(documents) > MAX_BULK_INVOICES:
+        raise BulkInvoiceError(f"at most {MAX_BULK_INVOICES} invoices per request")
+    return documents
+
+
+def _batches(rows, size=INSERT_BATCH_SIZE):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def create_invoices(issuer_id, documents):
+    """
+    Validates and inserts a batch of invoices issued by one user.
+
+    Invalid invoices are reported and skipped; the valid ones are inserted
+    together and committed.
+
+    Args:
+        issuer_id (UUID): the user issuing the invoices
+        documents (list): invoice documents as accepted by create_invoice
+
+    Returns:
+        list: per document, in order, either {index, invoice_id,
+              invoice_number, payment_reference, total_amount} or
+              {index, error}
+    """
+    parsed, results = [], []
+    for index, document in enumerate(documents):
+        try:
+            parsed.append((index, INVOICE_CREATE.validate(document)))
+            results.append(None)
+        except ValidationError as e:
+            results.append({"index": index, "error": str(e), "errors": e.errors})
+
+    business_ids = {invoice['business_id'] for _, invoice in parsed}
+    known = set()
+    for batch in _batches(list(business_ids)):
+        known.update(business_id for (business_id,) in
+                     db.session.query(Business.id).filter(Business.id.in_(batch)))
+
+    valid = []
+    for index, invoice in parsed:
+        if invoice['business_id'] in known:
+            valid.append((index, invoice))
+        else:
+            results[index] = {"index": index, "error": "business not found"}
+    if not valid:
+        return results
+
+    now = datetime.now()
+    numbers = next_invoice_numbers(issuer_id, count=len(valid), issued=now)
+    invoice_rows, item_rows = [], []
+    total = 0
+    for (index, invoice), (invoice_number, payment_reference) in zip(valid, numbers):
+        invoice_id = uuid7()
+        amount = 0
+        for item in invoice['items']:
+            item_rows.append({"id": uuid7(), "invoice_id": invoice_id, **item})
+            amount += item['quantity'] * item['unit_price']
+        invoice_rows.append({"id": invoice_id, "invoice_number": invoice_number,
+                             "payment_reference": payment_reference, "issuer_id": issuer_id,
+                             "business_id": invoice['business_id'], "status": 'pending', "total_amount": amount,
+                             "date_issued": now, "due_date": invoice['due_date'], "created_at": now})
+        results[index] = {"index": index, "invoice_id": invoice_id, "invoice_number": invoice_number,
+                          "payment_reference": payment_reference, "total_amount": amount}
+        total += amount
+
+    try:
+        connection = db.session.connection()
+        for batch in _batches(invoice_rows):
+            connection.execute(insert(Invoice.__table__), batch)
+        for batch in _batches(item_rows):
+            connection.execute(insert(InvoiceItem.__table__), batch)
+        apply_deltas(connection, {issuer_id: {'pending': [len(invoice_rows), total]}})
+        mark_invoices_changed(issuer_ids=[issuer_id], business_ids={row['business_id'] for row in invoice_rows})
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return results
@@ -0,0 +1,291 @@
+import functools
+import hashlib
+import json
+import threading
+import time
+from cachetools import TLRUCache
+from flask import current_app, has_app_context, make_response, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import event, inspect, select
+from .metrics import DEFAULT_LOG_SECONDS, PeriodicLog
+from .models import db, dialect_insert, Business, CacheVersion, Invoice, InvoiceItem, Payment, User
+from .pagination import wants_stream
+
+# Response caching and conditional GETs for the endpoints the frontend polls.
+# Every response is built from a few scopes, e.g. "issuer:<user id>" for the
+# invoices a user issued or "invoice:<id>" for one invoice and its items. Each
+# scope has a version in the cache_versions table, bumped in the same
+# transaction as the writes that touch it, so every worker sees it change at
+# commit. A response's ETag and cache key are derived from the versions of
+# its scopes: a request with a matching If-None-Match gets a 304 after one
+# primary key lookup, and a changed scope simply stops matching old entries.
+# The JSON and the streamed ndjson listing share a URL and are chosen by the
+# Accept header, so only the JSON one is cached and validated, and it is sent
+# with Vary: Accept.
+#
+# ORM writes are picked up on flush. Renaming a business or a user also
+# bumps the scopes of every invoice that shows the name. Statements that
+# bypass the ORM (bulk inserts, set based updates) call
+# mark_invoices_changed / mark_stale.
+#
+# Responses are stored in anything with redis-py's get and set(ex=): a
+# redis.Redis client when RESPONSE_CACHE_URL is set, otherwise LocalBackend.
+# Hit and miss counts are logged every METRICS_LOG_SECONDS, see metrics.py.
+
+DEFAULT_TTL = 30
+DEFAULT_SIZE = 2048
+
+
+class LocalBackend:
+    """In-process, thread safe TTL/LRU stand-in for the subset of Redis the cache uses."""
+
+    def __init__(self, maxsize=DEFAULT_SIZE):
+        self.lock = threading.Lock()
+        self.entries = TLRUCache(maxsize=maxsize, ttu=self._expires, timer=time.monotonic)
+
+    @staticmethod
+    def _expires(key, entry, now):
+        _, ex = entry
+        return now + ex if ex else float('inf')
+
+    def get(self, name):
+        with self.lock:
+            entry = self.entries.get(name)
+        return entry[0] if entry is not None else None
+
+    def set(self, name, value, ex=None):
+        with self.lock:
+            self.entries[name] = (value, ex)
+        return True
+
+
+class CacheMetrics:
+    """Thread safe hit, miss, store and not-modified counts, logged every log_interval seconds."""
+
+    def __init__(self, log_interval=DEFAULT_LOG_SECONDS):
+        self.lock = threading.Lock()
+        self.counts = {"hits": 0, "misses": 0, "stores": 0, "not_modified": 0}
+        self.log = PeriodicLog('response_cache', self.snapshot, log_interval)
+
+    def record(self, name, count=1):
+        with self.lock:
+            self.counts[name] += count
+        self.log.maybe_log()
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: counts and the hit ratio
+        """
+        with self.lock:
+            counts = dict(self.counts)
+        lookups = counts["hits"] + counts["misses"]
+        counts["hit_ratio"] = round(counts["hits"] / lookups, 4) if lookups else None
+        return counts
+
+
+class ResponseCache:
+    """
+    Response store over a backend.
+
+    Args:
+        backend: LocalBackend or a redis.Redis client
+        ttl (int): seconds a response is kept
+        metrics_log_seconds (int): seconds between metrics log lines, 0 for none
+    """
+
+    def __init__(self, backend, ttl=DEFAULT_TTL, metrics_log_seconds=DEFAULT_LOG_SECONDS):
+        self.backend = backend
+        self.ttl = ttl
+        self.metrics = CacheMetrics(metrics_log_seconds)
+
+    def get(self, key):
+        value = self.backend.get(key)
+        if value is None:
+            self.metrics.record("misses")
+            return None
+        self.metrics.record("hits")
+        return json.loads(value)
+
+    def set(self, key, status, mimetype, body):
+        self.backend.set(key, json.dumps({"status": status, "mimetype": mimetype, "body": body}), ex=self.ttl)
+        self.metrics.record("stores")
+
+
+def init_cache(app):
+    """Creates the app's response cache from RESPONSE_CACHE_URL, TTL, SIZE and METRICS_LOG_SECONDS."""
+    url = app.config.get('RESPONSE_CACHE_URL')
+    if url:
+        import redis
+        backend = redis.Redis.from_url(url)
+    else:
+        backend = LocalBackend(maxsize=app.config.get('RESPONSE_CACHE_SIZE', DEFAULT_SIZE))
+    app.extensions['response_cache'] = ResponseCache(
+        backend,
+        ttl=app.config.get('RESPONSE_CACHE_TTL', DEFAULT_TTL),
+        metrics_log_seconds=app.config.get('METRICS_LOG_SECONDS', DEFAULT_LOG_SECONDS)
+    )
+
+
+def response_cache():
+    """Returns the current app's response cache, None if caching is not set up."""
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('response_cache')
+
+
+def scope_versions(scopes):
+    """
+    Returns:
+        list: the current version of each scope, 0 for scopes never written
+    """
+    table = CacheVersion.__table__
+    rows = db.session.execute(select(table.c.scope, table.c.version).where(table.c.scope.in_(scopes)))
+    versions = dict(rows.all())
+    return [versions.get(scope, 0) for scope in scopes]
+
+
+def bump_versions(connection, scopes):
+    """Increments the versions of scopes within the caller's transaction."""
+    if not scopes:
+        return
+    table = CacheVersion.__table__
+    insert = dialect_insert(connection)
+    stmt = insert(table).on_conflict_do_update(
+        index_elements=[table.c.scope],
+        set_={"version": table.c.version + 1}
+    )
+    # a fixed order keeps concurrent transactions from deadlocking on the rows
+    connection.execute(stmt, [{"scope": scope, "version": 1} for scope in sorted(scopes)])
+
+
+def cached_response(scopes):
+    """
+    Serves a view's successful responses with an ETag, answers matching
+    If-None-Match requests with 304, and caches the responses per user when a
+    response cache is set up. Goes below @jwt_required(). Requests for a
+    streamed response go straight to the view, without an ETag.
+
+    Args:
+        scopes (callable): called with user_id and the view arguments, returns
+                           the scopes the response is built from
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if wants_stream(request):
+                return view(*args, **kwargs)
+
+            cache = response_cache()
+            user_id = get_jwt_identity()
+            names = scopes(user_id=user_id, **kwargs)
+            versions = ','.join(map(str, scope_versions(names)))
+            digest = hashlib.sha1(f"{user_id}:{request.full_path}:{versions}".encode('utf-8')).hexdigest()
+
+            if digest in request.if_none_match:
+                if cache is not None:
+                    cache.metrics.record("not_modified")
+                response = make_response('', 304)
+                response.set_etag(digest)
+                response.vary.add('Accept')
+                return response
+
+            key = f"cache:response:{digest}"
+            cached = cache.get(key) if cache is not None else None
+            if cached is not None:
+                response = make_response(cached["body"], cached["status"])
+                response.mimetype = cached["mimetype"]
+                response.headers['X-Cache'] = 'HIT'
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                if cache is not None:
+                    cache.set(key, response.status_code, response.mimetype, response.get_data(as_text=True))
+                    response.headers['X-Cache'] = 'MISS'
+            response.set_etag(digest)
+            response.vary.add('Accept')
+            return response
+        return wrapper
+    return decorator
+
+
+def mark_stale(*scopes):
+    """Bumps scopes in the current transaction, for writes that bypass the ORM."""
+    bump_versions(db.session.connection(), set(scopes))
+
+
+def _owner_scopes(connection, business_ids):
+    if not business_ids:
+        return set()
+    rows = connection.execute(select(Business.owner_id).where(Business.id.in_(list(business_ids))))
+    return {f'owner:{owner_id}' for (owner_id,) in rows}
+
+
+def mark_invoices_changed(issuer_ids=(), business_ids=(), invoice_ids=()):
+    """
+    Bumps the scopes covering invoices written without the ORM, including the
+    received invoices of the businesses' owners.
+    """
+    business_ids = set(business_ids)
+    scopes = {f'issuer:{issuer_id}' for issuer_id in issuer_ids}
+    scopes.update(f'business:{business_id}' for business_id in business_ids)
+    scopes.update(f'invoice:{invoice_id}' for invoice_id in invoice_ids)
+    scopes.update(_owner_scopes(db.session.connection(), business_ids))
+    mark_stale(*scopes)
+
+
+def _history(obj, key):
+    history = inspect(obj).attrs[key].history
+    return [value for value in history.sum() if value is not None]
+
+
+def _renamed(session, obj):
+    return obj not in session.new and inspect(obj).attrs['name'].history.has_changes()
+
+
+def _renamed_scopes(connection, business_ids, user_ids):
+    """Scopes of the responses that show the names of renamed businesses and users."""
+    scopes = set()
+    if business_ids:
+        # issuers list their invoices with the recipient business' name
+        rows = connection.execute(select(Invoice.id, Invoice.issuer_id)
+                                  .where(Invoice.business_id.in_(list(business_ids))))
+        for invoice_id, issuer_id in rows:
+            scopes.update((f'issuer:{issuer_id}', f'invoice:{invoice_id}'))
+    if user_ids:
+        # recipients list the invoices they received with the issuer's name
+        rows = connection.execute(select(Invoice.id, Invoice.business_id, Business.owner_id)
+                                  .join(Business, Business.id == Invoice.business_id)
+                                  .where(Invoice.issuer_id.in_(list(user_ids))))
+        for invoice_id, business_id, owner_id in rows:
+            scopes.update((f'invoice:{invoice_id}', f'business:{business_id}', f'owner:{owner_id}'))
+        scopes.update(f'payer:{user_id}' for user_id in user_ids)
+    return scopes
+
+
+@event.listens_for(db.session, 'after_flush')
+def _bump_written_scopes(session, flush_context):
+    scopes, business_ids = set(), set()
+    renamed_businesses, renamed_users = set(), set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Invoice):
+            scopes.update(f'issuer:{value}' for value in _history(obj, 'issuer_id'))
+            scopes.add(f'invoice:{obj.id}')
+            business_ids.update(_history(obj, 'business_id'))
+        elif isinstance(obj, InvoiceItem):
+            scopes.update(f'invoice:{value}' for value in _history(obj, 'invoice_id'))
+        elif isinstance(obj, Payment):
+            scopes.update(f'payer:{value}' for value in _history(obj, 'payer_id'))
+            scopes.update(f'invoice:{value}' for value in _history(obj, 'invoice_id'))
+        elif isinstance(obj, Business):
+            scopes.update(f'owner:{value}' for value in _history(obj, 'owner_id'))
+            scopes.add(f'business:{obj.id}')
+            if _renamed(session, obj):
+                renamed_businesses.add(obj.id)
+        elif isinstance(obj, User) and _renamed(session, obj):
+            renamed_users.add(obj.id)
+    scopes.update(f'business:{business_id}' for business_id in business_ids)
+    scopes.update(_owner_scopes(session.connection(), business_ids))
+    scopes.update(_renamed_scopes(session.connection(), renamed_businesses, renamed_users))
+    bump_versions(session.connection(), scopes)
@@ -0,0 +1,243 @@
+import base64
+import logging
+import os
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from .metrics import DEFAULT_LOG_SECONDS, PeriodicLog
+
+# Client for Safaricom's Daraja API. All calls share one pooled session so TLS
+# connections are kept alive between STK pushes, every call is bounded by
+# connect/read timeouts, idempotent calls are retried with jittered, capped
+# backoff, and per endpoint latencies are recorded and logged every METRICS_LOG_SECONDS
+# (see metrics.py).
+
+logger = logging.getLogger(__name__)
+
+SANDBOX_URL = 'https://sandbox.safaricom.co.ke'
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 15
+MAX_RETRIES = 3
+BACKOFF_SECONDS = 0.25
+MAX_BACKOFF_SECONDS = 2
+POOL_SIZE = 20
+
+
+class DarajaError(Exception):
+    """Raised when a Daraja call fails after all retries."""
+
+
+class LatencyMetrics:
+    """Thread safe call count, error count and latency per endpoint, logged every log_interval seconds."""
+
+    def __init__(self, log_interval=DEFAULT_LOG_SECONDS):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+        self.log = PeriodicLog('daraja_latency', self.snapshot, log_interval)
+
+    def record(self, endpoint, seconds, failed=False):
+        with self.lock:
+            stats = self.endpoints.setdefault(endpoint, {"calls": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0})
+            ms = seconds * 1000
+            stats["calls"] += 1
+            stats["errors"] += int(failed)
+            stats["total_ms"] += ms
+            stats["max_ms"] = max(stats["max_ms"], ms)
+        self.log.maybe_log()
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: per endpoint calls, errors, average and maximum latency in ms
+        """
+        with self.lock:
+            return {
+                endpoint: {
+                    "calls": stats["calls"],
+                    "errors": stats["errors"],
+                    "avg_ms": round(stats["total_ms"] / stats["calls"], 2),
+                    "max_ms": round(stats["max_ms"], 2),
+                }
+                for endpoint, stats in self.endpoints.items()
+            }
+
+
+class AccessTokenCache:
+    """
+    Process wide cache of the Daraja OAuth access token.
+    Tokens are reused until refresh_margin seconds before they expire. Inside
+    that margin the first caller refreshes the token while everyone else keeps
+    using the current one; once it has expired callers wait for a single
+    refresh instead of each requesting their own token.
+    """
+    def __init__(self, fetch, refresh_margin=300):
+        self.fetch = fetch
+        self.refresh_margin = refresh_margin
+        self.lock = threading.Lock()
+        self.token = None
+        self.expires_at = 0.0
+    
+    def _refresh(self):
+        response = self.fetch()
+        token = response.get('access_token')
+        if not token:
+            raise ValueError(f"access token not found: {response}")
+        self.token = token
+        self.expires_at = time.monotonic() + int(response.get('expires_in', 3599))
+    
+    def get(self):
+        """
+        Returns:
+            str or None: a valid access token, None if one could not be obtained
+        """
+        token, expires_at = self.token, self.expires_at
+        now = time.monotonic()
+        if token and now < expires_at - self.refresh_margin:
+            return token
+        
+        if token and now < expires_at:
+            if self.lock.acquire(blocking=False):
+                try:
+                    self._refresh()
+                except Exception as e:
+                    logger.warning(f"proactive token refresh failed: {str(e)}")
+                finally:
+                    self.lock.release()
+            return self.token
+        
+        with self.lock:
+            if self.token and time.monotonic() < self.expires_at:
+                return self.token
+            try:
+                self._refresh()
+            except Exception as e:
+                logger.error(f"failed to fetch access token: {str(e)}")
+                return None
+            return self.token
+    
+    def invalidate(self):
+        """Drops the cached token, e.g. after Daraja rejects it."""
+        with self.lock:
+            self.token = None
+            self.expires_at = 0.0
+
+
+class DarajaClient:
+    """
+    Pooled, timeout bounded Daraja client.
+
+    Args:
+        base_url (str): Daraja host, the sandbox by default
+        consumer_key, consumer_secret (str): app credentials for the OAuth token
+        timeout (tuple): (connect, read) timeouts in seconds
+        max_retries (int): attempts for idempotent calls
+        metrics_log_seconds (int): seconds between latency log lines, 0 for none
+    """
+
+    def __init__(self, base_url, consumer_key, consumer_secret,
+                 timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), max_retries=MAX_RETRIES, pool_size=POOL_SIZE,
+                 metrics_log_seconds=DEFAULT_LOG_SECONDS):
+        self.base_url = base_url.rstrip('/')
+        self.consumer_key = consumer_key
+        self.consumer_secret = consumer_secret
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.metrics = LatencyMetrics(metrics_log_seconds)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.tokens = AccessTokenCache(self.fetch_token)
+
+    def request(self, method, path, idempotent=False, **kwargs):
+        """
+        Sends a request to Daraja.
+
+        Connection errors, timeouts and 5xx responses are retried with jittered
+        exponential backoff of at most MAX_BACKOFF_SECONDS, but only for
+        idempotent calls: a retried STK push could prompt the customer twice.
+        4xx responses are returned straight away.
+
+        Returns:
+            Response: the last response received
+
+        Raises:
+            DarajaError: if no response was received
+        """
+        attempts = self.max_retries if idempotent else 1
+        kwargs.setdefault('timeout', self.timeout)
+        for attempt in range(1, attempts + 1):
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, self.base_url + path, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.metrics.record(path, time.perf_counter() - started, failed=True)
+                if attempt == attempts:
+                    raise DarajaError(f"{method} {path} failed: {str(e)}") from e
+            else:
+                failed = response.status_code >= 500
+                self.metrics.record(path, time.perf_counter() - started, failed=failed)
+                if not failed or attempt == attempts:
+                    return response
+            time.sleep(random.uniform(0, min(MAX_BACKOFF_SECONDS, BACKOFF_SECONDS * 2 ** (attempt - 1))))
+
+    def fetch_token(self):
+        """
+        Requests a new OAuth access token.
+
+        Returns:
+            dict: the token response, with access_token and expires_in
+        """
+        credentials = f'{self.consumer_key}:{self.consumer_secret}'
+        encoded_credentials = base64.b64encode(credentials.encode('utf-8')).decode('utf-8')
+        response = self.request(
+            'GET', '/oauth/v1/generate', idempotent=True,
+            params={"grant_type": "client_credentials"},
+            headers={"Authorization": f"Basic {encoded_credentials}"}
+        )
+        return response.json()
+
+    def stk_push(self, request_body):
+        """
+        Initiates an M-Pesa express (STK push) payment. A push rejected with
+        401 was not processed, so it is sent once more with a new token.
+
+        Returns:
+            Response: Daraja's response, None if no access token was available
+        """
+        for _ in range(2):
+            token = self.tokens.get()
+            if not token:
+                return None
+            response = self.request(
+                'POST', '/mpesa/stkpush/v1/processrequest',
+                json=request_body,
+                headers={'Authorization': f'Bearer {token}'}
+            )
+            if response.status_code != 401:
+                break
+            self.tokens.invalidate()
+        return response
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def daraja_client():
+    """Returns the process wide Daraja client, configured from the environment."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = DarajaClient(
+                base_url=os.getenv('MPESA_BASE_URL', SANDBOX_URL),
+                consumer_key=os.getenv('CONSUMER_KEY'),
+                consumer_secret=os.getenv('CONSUMER_SECRET'),
+                timeout=(float(os.getenv('MPESA_CONNECT_TIMEOUT', CONNECT_TIMEOUT)),
+                         float(os.getenv('MPESA_READ_TIMEOUT', READ_TIMEOUT))),
+                metrics_log_seconds=int(os.getenv('METRICS_LOG_SECONDS', DEFAULT_LOG_SECONDS))
+            )
+        return _client
@@ -0,0 +1,142 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import dns.resolver
+from cachetools import TTLCache
+from email_validator import validate_email, EmailUndeliverableError
+from flask import current_app
+from .extensions import logger
+
+# Email addresses are only checked for syntax on the request path. Whether a
+# domain accepts mail is a DNS lookup, so when enabled it is done on a
+# background thread and remembered per domain for a while: once a domain is
+# known not to accept mail, addresses at it are rejected without another
+# lookup.
+#
+# EMAIL_DELIVERABILITY_CHECK selects the mode:
+#   'off'   syntax only (default)
+#   'async' look domains up in the background
+#   'sync'  look unknown domains up inline, then serve them from the cache
+
+DOMAIN_CACHE_SIZE = 10000
+DOMAIN_CACHE_TTL = 24 * 3600
+DNS_TIMEOUT = 5
+# answers that show a domain does not take mail, as opposed to a failed lookup
+NO_MAIL_ANSWERS = (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer)
+
+
+class EmailChecker:
+    """
+    Syntax checks addresses and tracks which domains accept mail.
+
+    Args:
+        cache_size (int): most domains remembered, least recently used go first
+        ttl (int): seconds a domain's result is remembered
+        timeout (int): DNS timeout of a deliverability lookup
+        resolver (dns.resolver.Resolver): resolver for the lookups, dnspython's
+                                          default one with `timeout` if None
+    """
+
+    def __init__(self, cache_size=DOMAIN_CACHE_SIZE, ttl=DOMAIN_CACHE_TTL, timeout=DNS_TIMEOUT, resolver=None):
+        self.domains = TTLCache(maxsize=cache_size, ttl=ttl)
+        self.timeout = timeout
+        self.resolver = resolver
+        self.lock = threading.Lock()
+        self.pending = set()
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='email-deliverability')
+
+    def deliverable(self, domain):
+        """
+        Returns:
+            bool or None: whether the domain accepts mail, None if not known
+        """
+        with self.lock:
+            return self.domains.get(domain)
+
+    def lookup(self, domain):
+        """
+        Looks up whether a domain accepts mail and caches the answer. Lookups
+        that time out or fail say nothing about the domain; they are not
+        cached, so the domain is asked about again later.
+
+        Returns:
+            bool or None: whether the domain accepts mail, None if not known
+        """
+        if self.resolver is not None:
+            options = {"dns_resolver": self.resolver}
+        else:
+            options = {"timeout": self.timeout}
+        try:
+            # email_validator reports timeouts as success without MX hosts,
+            # and wraps resolver errors in EmailUndeliverableError
+            found = validate_email(f'postmaster@{domain}', check_deliverability=True, **options)
+            if found.mx is None:
+                raise TimeoutError("no name server answered")
+            result = True
+        except EmailUndeliverableError as e:
+            if e.__cause__ is not None and not isinstance(e.__cause__, NO_MAIL_ANSWERS):
+                logger.warning(f"deliverability lookup for {domain} failed: {str(e)}")
+                return None
+            result = False
+        except Exception as e:
+            logger.warning(f"deliverability lookup for {domain} failed: {str(e)}")
+            return None
+        with self.lock:
+            self.domains[domain] = result
+        return result
+
+    def _lookup_later(self, domain):
+        with self.lock:
+            if domain in self.pending:
+                return
+            self.pending.add(domain)
+
+        def run():
+            try:
+                self.lookup(domain)
+            finally:
+                with self.lock:
+                    self.pending.discard(domain)
+        self.executor.submit(run)
+
+    def check(self, email, mode='async'):
+        """
+        Validates an address.
+
+        Returns:
+            str: the normalized address
+
+        Raises:
+            EmailNotValidError: if the syntax is invalid, or the domain is known
+                                not to accept mail
+        """
+        result = validate_email(email, check_deliverability=False)
+        if mode == 'off':
+            return result.normalized
+
+        domain = result.ascii_domain
+        deliverable = self.deliverable(domain)
+        if deliverable is None:
+            if mode == 'sync':
+                deliverable = self.lookup(domain)
+            else:
+                self._lookup_later(domain)
+        if deliverable is False:
+            raise EmailUndeliverableError(f"The domain name {result.domain} does not accept email.")
+        return result.normalized
+
+
+_checker = None
+_checker_lock = threading.Lock()
+
+def check_email(email):
+    """
+    Validates an address using the app's EMAIL_DELIVERABILITY_CHECK mode.
+
+    Raises:
+        EmailNotValidError: if the address is invalid or its domain does not accept mail
+    """
+    global _checker
+    with _checker_lock:
+        if _checker is None:
+            _checker = EmailChecker(ttl=current_app.config.get('EMAIL_DOMAIN_CACHE_TTL', DOMAIN_CACHE_TTL))
+    return _checker.check(email, mode=current_app.config.get('EMAIL_DELIVERABILITY_CHECK', 'off'))
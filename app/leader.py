@@ -0,0 +1,134 @@
+import os
+import tempfile
+import threading
+import zlib
+from sqlalchemy import text
+from .extensions import logger
+
+# Every gunicorn worker runs create_app(), but the scheduler must only run in
+# one of them. Workers compete for a lock held for the life of the process:
+# a postgres session level advisory lock, or an exclusive file lock when the
+# database is not postgres (sqlite in development and tests). Losers keep
+# retrying so that another worker takes over when the leader exits.
+
+LEADER_LOCK_NAME = 'invotrack-scheduler'
+RETRY_SECONDS = 30
+
+
+class AdvisoryLock:
+    """Postgres advisory lock held on a dedicated connection."""
+
+    def __init__(self, engine, name=LEADER_LOCK_NAME):
+        self.engine = engine
+        self.key = zlib.crc32(name.encode('utf-8'))
+        self.connection = None
+
+    def acquire(self):
+        connection = self.engine.connect()
+        try:
+            acquired = connection.execute(text('SELECT pg_try_advisory_lock(:key)'), {"key": self.key}).scalar()
+            # the lock belongs to the session, don't sit idle in a transaction
+            connection.commit()
+        except Exception:
+            connection.close()
+            raise
+        if not acquired:
+            connection.close()
+            return False
+        self.connection = connection
+        return True
+
+    def is_held(self):
+        try:
+            self.connection.execute(text('SELECT 1'))
+            self.connection.commit()
+            return True
+        except Exception:
+            return False
+
+    def release(self):
+        if self.connection is None:
+            return
+        try:
+            self.connection.execute(text('SELECT pg_advisory_unlock(:key)'), {"key": self.key})
+            self.connection.commit()
+        except Exception:
+            pass
+        finally:
+            self.connection.close()
+            self.connection = None
+
+
+class FileLock:
+    """Exclusive, non blocking lock on a file, released when the process exits."""
+
+    def __init__(self, path):
+        self.path = path
+        self.handle = None
+
+    def acquire(self):
+        import fcntl
+
+        handle = open(self.path, 'a')
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        self.handle = handle
+        return True
+
+    def is_held(self):
+        return self.handle is not None
+
+    def release(self):
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+
+
+def leader_lock(app, engine):
+    """Picks the lock implementation for the configured database."""
+    if engine.dialect.name == 'postgresql':
+        return AdvisoryLock(engine)
+    path = app.config.get('SCHEDULER_LOCK_FILE') or os.path.join(tempfile.gettempdir(), f'{LEADER_LOCK_NAME}.lock')
+    return FileLock(path)
+
+
+def start_leader_election(app, on_elected, on_demoted):
+    """
+    Starts a daemon thread that tries to become leader every
+    SCHEDULER_LEADER_RETRY_SECONDS, calling on_elected once it holds the lock
+    and on_demoted if the lock is lost (e.g. the database connection drops).
+
+    Returns:
+        threading.Event: set it to stop the election and release the lock
+    """
+    with app.app_context():
+        from .models import db
+        lock = leader_lock(app, db.engine)
+    interval = app.config.get('SCHEDULER_LEADER_RETRY_SECONDS', RETRY_SECONDS)
+    stopped = threading.Event()
+
+    def run():
+        leader = False
+        while not stopped.is_set():
+            try:
+                if not leader and lock.acquire():
+                    leader = True
+                    logger.info(f"process {os.getpid()} elected scheduler leader")
+                    on_elected()
+                elif leader and not lock.is_held():
+                    leader = False
+                    lock.release()
+                    logger.warning(f"process {os.getpid()} lost scheduler leadership")
+                    on_demoted()
+            except Exception as e:
+                logger.error(f"scheduler leader election failed: {str(e)}")
+            stopped.wait(interval)
+        if leader:
+            on_demoted()
+        lock.release()
+
+    threading.Thread(target=run, name='scheduler-leader-election', daemon=True).start()
+    return stopped
@@ -0,0 +1,43 @@
+import json
+import logging
+import threading
+import time
+
+# Process local counters (response cache hits, Daraja latencies) are written
+# to the app.metrics logger as one JSON line per counter set, on the first
+# update after each interval, so idle processes stay quiet. Every worker
+# process logs its own counters. The logger is at INFO so the lines are kept
+# under the ERROR root level set in extensions.py.
+
+DEFAULT_LOG_SECONDS = 300
+
+logger = logging.getLogger('app.metrics')
+logger.setLevel(logging.INFO)
+
+
+class PeriodicLog:
+    """
+    Logs a snapshot from whichever call to maybe_log comes due, no thread needed.
+
+    Args:
+        name (str): prefix of the log line
+        snapshot (callable): returns the JSON serializable counters
+        interval (float): seconds between lines, 0 turns logging off
+    """
+
+    def __init__(self, name, snapshot, interval=DEFAULT_LOG_SECONDS):
+        self.name = name
+        self.snapshot = snapshot
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.next_at = time.monotonic() + interval
+
+    def maybe_log(self):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        with self.lock:
+            if now < self.next_at:
+                return
+            self.next_at = now + self.interval
+        logger.info(f"{self.name} {json.dumps(self.snapshot(), sort_keys=True)}")
@@ -1,14 +1,53 @@
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy import Enum, Numeric, ForeignKey, func
+from sqlalchemy import Enum, ForeignKey, func
+from sqlalchemy.dialects import postgresql, sqlite
+import os
+import threading
+import time
 import uuid
 from werkzeug.security import generate_password_hash, check_password_hash
 
 # Initialize SQLAlchemy
 db = SQLAlchemy()
 
+INVOICE_STATUSES = ('pending', 'overdue', 'cancelled', 'paid')
+
+# money columns hold integer cents, see money.py
+Money = db.BigInteger
+
+def dialect_insert(bind):
+    """
+    Returns the insert() construct of the bind's dialect, which supports
+    ON CONFLICT upserts on both postgres and sqlite.
+    """
+    if bind.dialect.name == 'postgresql':
+        return postgresql.insert
+    return sqlite.insert
+
+_uuid7_lock = threading.Lock()
+_uuid7_last = 0
+
+def uuid7():
+    """
+    Generates a time ordered UUID (RFC 9562 version 7): a 48 bit millisecond
+    timestamp followed by random bits, so new rows land at the end of the
+    primary key index instead of anywhere in it. The 12 bits after the
+    timestamp hold the sub-millisecond fraction, and ids generated in this
+    process never go backwards.
+    """
+    global _uuid7_last
+    with _uuid7_lock:
+        # 48 bits of milliseconds and 12 bits of fraction, as one 60 bit value
+        timestamp = max(time.time_ns() * 4096 // 1_000_000, _uuid7_last + 1)
+        _uuid7_last = timestamp
+    value = (timestamp >> 12) << 80 | 0x7 << 76 | (timestamp & 0xFFF) << 64
+    value |= 0b10 << 62 | int.from_bytes(os.urandom(8), 'big') >> 2
+    return uuid.UUID(int=value)
+
 class BaseModel():
-    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # uuid7 ids are ordinary UUIDs, so rows created with uuid4 stay valid
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     created_at = db.Column(db.DateTime, default=func.now())
     updated_at = db.Column(db.DateTime, default=None, onupdate=func.now())
 
@@ -40,48 +79,95 @@ class Business(db.Model, BaseModel):
     email = db.Column(db.String(), nullable=False)
     
     invoices = db.relationship('Invoice', backref='business', lazy=True)
+    
+    __table_args__ = (
+        db.Index('ix_businesses_owner_id', 'owner_id'),
+    )
 
 class Invoice(db.Model, BaseModel):
     __tablename__ = 'invoices'
     
-    invoice_number = db.Column(db.String(50), unique=True, nullable=False)
-    issuer_id = db.Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=False)
+    # numbered per issuer, see invoice_numbers.py
+    invoice_number = db.Column(db.String(50), nullable=False)
+    # unique across issuers, the M-Pesa account reference of the invoice
+    payment_reference = db.Column(db.String(50), unique=True, nullable=False)
+    # issuer, status and amount keep their old value on change so the
+    # invoice summaries can be adjusted on flush
+    issuer_id = db.column_property(db.Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=False), active_history=True)
     business_id = db.Column(UUID(as_uuid=True), ForeignKey('businesses.id'), nullable=False)
-    status = db.Column(Enum('pending', 'overdue', 'cancelled', 'paid', name='invoice_status'), default='pending')
-    total_amount = db.Column(Numeric(10, 2), nullable=False)
+    status = db.column_property(db.Column(Enum(*INVOICE_STATUSES, name='invoice_status'), default='pending'), active_history=True)
+    total_amount = db.column_property(db.Column(Money, nullable=False), active_history=True)
     date_issued = db.Column(db.DateTime, default=func.now())
     due_date = db.Column(db.DateTime, nullable=False)
     
     items = db.relationship('InvoiceItem', backref='invoice', lazy=True, cascade='all, delete-orphan')
+    
+    __table_args__ = (
+        db.UniqueConstraint('issuer_id', 'invoice_number', name='uq_invoices_issuer_invoice_number'),
+        # listings filter on the issuer or business, optionally by status, and
+        # page through date_issued, id
+        db.Index('ix_invoices_issuer_date_issued', 'issuer_id', 'date_issued', 'id'),
+        db.Index('ix_invoices_issuer_status_date_issued', 'issuer_id', 'status', 'date_issued', 'id'),
+        db.Index('ix_invoices_business_date_issued', 'business_id', 'date_issued', 'id'),
+        db.Index('ix_invoices_business_status_date_issued', 'business_id', 'status', 'date_issued', 'id'),
+        # the overdue sweep only ever looks at pending invoices
+        db.Index(
+            'ix_invoices_pending_due_date', 'due_date',
+            postgresql_where=db.text("status = 'pending'"),
+            sqlite_where=db.text("status = 'pending'")
+        ),
+    )
     payments = db.relationship('Payment', backref='invoice', lazy=True)
 
 
+class InvoiceSummary(db.Model):
+    """Per issuer invoice counts and totals by status, maintained on flush."""
+    __tablename__ = 'invoice_summaries'
+    
+    issuer_id = db.Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    pending_count = db.Column(db.Integer, default=0, nullable=False)
+    pending_total = db.Column(Money, default=0, nullable=False)
+    overdue_count = db.Column(db.Integer, default=0, nullable=False)
+    overdue_total = db.Column(Money, default=0, nullable=False)
+    cancelled_count = db.Column(db.Integer, default=0, nullable=False)
+    cancelled_total = db.Column(Money, default=0, nullable=False)
+    paid_count = db.Column(db.Integer, default=0, nullable=False)
+    paid_total = db.Column(Money, default=0, nullable=False)
+
+
+class InvoiceSequence(db.Model):
+    """Next invoice number of each issuer, handed out in blocks."""
+    __tablename__ = 'invoice_sequences'
+    
+    issuer_id = db.Column(UUID(as_uuid=True), ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    next_value = db.Column(db.BigInteger, nullable=False)
+    # leads the payment reference of each of the issuer's invoices
+    reference_prefix = db.Column(db.String(10), unique=True, nullable=False)
+
+
+class CacheVersion(db.Model):
+    """Version of a cache scope, bumped by every write that touches it."""
+    __tablename__ = 'cache_versions'
+    
+    scope = db.Column(db.String(100), primary_key=True)
+    version = db.Column(db.BigInteger, default=0, nullable=False)
+
+
 class InvoiceItem(db.Model, BaseModel):
     __tablename__ = 'invoice_items'
     
     invoice_id = db.Column(UUID(as_uuid=True), ForeignKey('invoices.id', ondelete='CASCADE'), nullable=False)
     description = db.Column(db.Text, nullable=False)
     quantity = db.Column(db.Integer, default=1, nullable=False)
-    unit_price = db.Column(Numeric(10, 2), nullable=False)
-    subtotal = db.Column(Numeric(10, 2), nullable=False)
+    unit_price = db.Column(Money, nullable=False)
+    # generated by the database, never assigned
+    subtotal = db.Column(Money, db.Computed('quantity * unit_price', persisted=True))
     
-    def calculate_sub_total(self):
-        
-        if self.unit_price is not None and self.quantity is not None:
-            self.subtotal = self.unit_price * self.quantity
-            return self.subtotal
-        return None
-    
-    def __setattr__(self, name, value):
-        
-        super().__setattr__(name, value)
-        
-        if name in {'quantity', 'unit_price'} and name != 'subtotal':
-            # Check if both values exist before calculating
-            if hasattr(self, 'quantity') and hasattr(self, 'unit_price'):
-                if self.quantity is not None and self.unit_price is not None:
-                    self.calculate_sub_total()
-            
+    __table_args__ = (
+        db.Index('ix_invoice_items_invoice_id', 'invoice_id'),
+    )
+
+
 class Payment(db.Model, BaseModel):
     __tablename__ = 'payments'
     
@@ -89,11 +175,16 @@ class Payment(db.Model, BaseModel):
     payer_id = db.Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=False)
     payment_method = db.Column(Enum('credit_card', 'bank_transfer', 'paypal', 'mpesa', name='payment_methods'))
     transaction_code = db.Column(db.String(255), unique=True, nullable=False)
-    amount = db.Column(Numeric(10, 2), nullable=False)
+    amount = db.Column(Money, nullable=False)
     payment_date = db.Column(db.DateTime, default=func.now())
     status = db.Column(Enum('successful', 'failed', 'pending', name='payment_status'), default='successful')
     
     transactions = db.relationship('TransactionHistory', backref='payment', lazy=True)
+    
+    __table_args__ = (
+        db.Index('ix_payments_payer_payment_date', 'payer_id', 'payment_date'),
+        db.Index('ix_payments_invoice_id', 'invoice_id'),
+    )
 
 class TransactionHistory(db.Model, BaseModel):
     __tablename__ = 'transaction_history'
@@ -103,3 +194,44 @@ class TransactionHistory(db.Model, BaseModel):
     payment_id = db.Column(UUID(as_uuid=True), ForeignKey('payments.id'), nullable=True)
     action = db.Column(db.Text, nullable=False)
     timestamp = db.Column(db.DateTime, default=func.now())
+
+
+class OutboxMessage(db.Model, BaseModel):
+    """Email waiting to be delivered by the outbox worker."""
+    __tablename__ = 'outbox'
+    
+    dedup_key = db.Column(db.String(255), unique=True, nullable=False)
+    kind = db.Column(db.String(50), nullable=False)
+    invoice_id = db.Column(UUID(as_uuid=True), ForeignKey('invoices.id', ondelete='CASCADE'), nullable=True)
+    recipient = db.Column(db.String(255), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(Enum('pending', 'sending', 'sent', 'failed', name='outbox_status'), default='pending', nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=func.now(), nullable=False)
+    leased_until = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    sent_at = db.Column(db.DateTime, nullable=True)
+    
+    __table_args__ = (
+        db.Index('ix_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
+
+class MpesaCallback(db.Model, BaseModel):
+    """Raw STK push callback, stored on receipt and applied by the callback worker."""
+    __tablename__ = 'mpesa_callbacks'
+    
+    checkout_request_id = db.Column(db.String(100), unique=True, nullable=True)
+    # NULL when the invoice in the callback url does not exist
+    invoice_id = db.Column(UUID(as_uuid=True), ForeignKey('invoices.id', ondelete='CASCADE'), nullable=True)
+    payload = db.Column(db.Text, nullable=False)
+    status = db.Column(Enum('pending', 'processing', 'processed', 'failed', name='callback_status'), default='pending', nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    leased_until = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    processed_at = db.Column(db.DateTime, nullable=True)
+    
+    __table_args__ = (
+        db.Index('ix_mpesa_callbacks_status_created_at', 'status', 'created_at'),
+    )
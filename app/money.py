@@ -0,0 +1,73 @@
+import re
+from decimal import Decimal, InvalidOperation
+
+# Amounts are stored as integer cents in BIGINT columns. Parsing goes straight
+# from the client's text to an int and every sum after that is integer
+# arithmetic, so totals are exact and not capped by a NUMERIC precision.
+# Conversion back to major units only happens when rendering.
+
+CENTS_PER_UNIT = 100
+MAX_CENTS = 2 ** 63 - 1
+
+_AMOUNT = re.compile(r'([+-]?)(\d+)(?:\.(\d{0,2}))?')
+
+
+class MoneyError(ValueError):
+    """Raised for amounts that are not a number of whole cents."""
+
+
+def parse_cents(value):
+    """
+    Parses an amount in major units into integer cents.
+
+    Args:
+        value (str, int, float or Decimal): e.g. "1,250.50", 1250.5 or 1250
+
+    Returns:
+        int: the amount in cents
+
+    Raises:
+        MoneyError: if the value is not a number or has fractions of a cent
+    """
+    if isinstance(value, bool) or value is None:
+        raise MoneyError(f"invalid amount: {value}")
+    if isinstance(value, int):
+        cents = value * CENTS_PER_UNIT
+    else:
+        text = str(value).strip().replace(',', '')
+        match = _AMOUNT.fullmatch(text)
+        if match:
+            sign, whole, fraction = match.groups()
+            cents = int(whole) * CENTS_PER_UNIT + int((fraction or '').ljust(2, '0'))
+            if sign == '-':
+                cents = -cents
+        else:
+            # exponents and other forms Decimal understands
+            try:
+                amount = Decimal(text).scaleb(2)
+            except InvalidOperation:
+                raise MoneyError(f"invalid amount: {value}")
+            if not amount.is_finite() or amount != amount.to_integral_value():
+                raise MoneyError(f"amounts have at most two decimal places: {value}")
+            cents = int(amount)
+
+    if abs(cents) > MAX_CENTS:
+        raise MoneyError(f"amount out of range: {value}")
+    return cents
+
+
+def as_number(cents):
+    """Renders cents as a JSON number in major units, e.g. 125050 -> 1250.5."""
+    return cents / CENTS_PER_UNIT if cents is not None else None
+
+
+def format_amount(cents):
+    """Renders cents for people, e.g. 125050 -> '1,250.50'."""
+    sign = '-' if cents < 0 else ''
+    whole, fraction = divmod(abs(cents), CENTS_PER_UNIT)
+    return f"{sign}{whole:,}.{fraction:02d}"
+
+
+def whole_units(cents):
+    """Rounds cents up to whole major units, for APIs that only take those."""
+    return -(-cents // CENTS_PER_UNIT)
@@ -1,11 +1,13 @@
 import base64
-import requests
 from datetime import datetime
 from dotenv import load_dotenv
 import os
 import logging
-from flask import Blueprint, request, jsonify, session, redirect
-from .models import User, Payment, db, Invoice
+from flask import Blueprint, request, jsonify, session
+from .models import User, db, Invoice
+from .daraja import daraja_client, DarajaError
+from .money import whole_units
+from .mpesa_callbacks import enqueue_callback
 
 mpesa = Blueprint('mpesa', __name__)
 
@@ -17,77 +19,58 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def generate_access_token():
-    """
-    generates an access token for api authentication
-
-    Returns:
-        _Response in a json format
-    """
-    consumer_key = os.getenv('CONSUMER_KEY')
-    consumer_secret = os.getenv('CONSUMER_SECRET')
-    
-    credentials = f'{consumer_key}:{consumer_secret}'
-    encoded_credentials = base64.b64encode(credentials.encode('utf-8')).decode('utf-8')
-        
-    url = "https://sandbox.safaricom.co.ke/oauth/v1/generate"
-    querystring = {"grant_type":"client_credentials"}
-    headers = {
-        "Authorization": f"Basic {encoded_credentials}"
-    }
-    
-    response = requests.request("GET", url, headers=headers, params=querystring)
-    return response.json()
-
-@mpesa.route('/<int:invoice_id>/make_payment', methods=['POST'])
-def lipa_na_mpesa(id: int):
+@mpesa.route('/<uuid:invoice_id>/make_payment', methods=['POST'])
+def lipa_na_mpesa(invoice_id):
     """
     initializes an stk push for invoice payment
 
     Args:
-        id (int): invoice identifier
+        invoice_id (uuid): invoice identifier
 
     Returns:
-        redirects to the callback url
+        the checkout request id of the push; the payment is recorded when
+        Safaricom posts the result to the callback url
     """
     google_id = session.get('google_id')
     user = User.query.get_or_404(google_id)
-    invoice = Invoice.query.get_or_404(id)
-    
-    response = generate_access_token()
-    token = response.get('access_token')
-    if not token:
-        logger(f"access token not found: {response}")
-        return jsonify({"error": "no token for authorization"}), 403
+    invoice = Invoice.query.get_or_404(invoice_id)
     
-    timestamp = datetime.now().strftime('%H%M%S %Y%m%d')
+    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
     short_code = "174379"
     passkey = os.getenv('PASSKEY')
     
-    url = 'https://sandbox.safaricom.co.ke/mpesa/stkpush/v1/processrequest'
     stk_password = base64.b64encode((short_code + passkey + timestamp).encode('utf-8')).decode('utf-8')
     
-    headers = {
-        'Authorization': f'Bearer {token}',
-        'Content-Type': 'application/json'
-    }
     request_body = {
         "BusinessShortCode": short_code,
         "Password": stk_password,
         "Timestamp": timestamp,
         "TransactionType": "CustomerBuyGoodsOnline",
-        "Amount": int(invoice.amount),
+        "Amount": whole_units(invoice.total_amount),
         "PartyA": 254741644151, #change to invoice.customer.phone_number
         "PartyB": short_code,
         "PhoneNumber": 254741644151, #change to invoice.customer.phone_number
-        "CallbackURL": f"https://invotack-2.onrender.com/mpesa/mpesa_callback/{id}",
+        "CallbackURL": f"https://invotack-2.onrender.com/mpesa/mpesa_callback/{invoice_id}",
+        "AccountReference": invoice.payment_reference,
         "TransactionDesc": f'Payment for Invoice #{invoice.invoice_number}'        
     }
     
-    response = requests.post(url, headers=headers, json=request_body)
+    try:
+        response = daraja_client().stk_push(request_body)
+    except DarajaError as e:
+        logger.error(f"stk push failed: {str(e)}")
+        return jsonify({"error": "payment service unavailable"}), 503
+    if response is None:
+        return jsonify({"error": "no token for authorization"}), 403
     
     if response.status_code == 200:
-        return redirect('/mpesa_callback/<int:invoice_id>')
+        body = response.json()
+        return jsonify({
+            "success": True,
+            "checkout_request_id": body.get('CheckoutRequestID'),
+            "merchant_request_id": body.get('MerchantRequestID'),
+            "message": body.get('CustomerMessage')
+        }), 200
     else:
         return jsonify({
             "error": "failed to initialize stk push",
@@ -96,47 +79,34 @@ def lipa_na_mpesa(id: int):
         }), 400
         
 
-@mpesa.route('/mpesa_callback/<int:invoice_id>', methods=['POST'])
+@mpesa.route('/mpesa_callback/<uuid:invoice_id>', methods=['POST'])
 def callback(invoice_id):
+    """
+    Receives the STK push result from Safaricom.
+    The raw payload is stored and acknowledged immediately; the callback worker
+    applies the payment. Repeated deliveries of the same callback are
+    acknowledged without being stored again.
+
+    Args:
+        invoice_id (uuid): invoice the STK push was made for
+
+    Returns:
+        the acknowledgement Safaricom expects
+    """
     try:
-        callback_data = request.get_json()
-        google_id = session.get('google_id')
-        user = User.query.filter_by(google_id=google_id).first()
-        invoice = Invoice.query.get_or_404(invoice_id)
-        
-        result_code = callback_data['Body']['stkCallback']['ResultCode']
-        
-        if result_code != 0:
-            error_message = callback_data['Body']['stkCallback']['ResultDesc']
-            return jsonify({
-                'ResultCode': result_code,
-                'ResultDesc': error_message
-            }), 400
+        if not enqueue_callback(invoice_id, request.get_data(as_text=True)):
+            logger.info(f"duplicate mpesa callback for invoice {invoice_id}")
+        db.session.commit()
         
-        callback_metadata = callback_data['Body']['stkCallback']['CallbackMetadata']['Item']
-        amount = next((item['Value'] for item in callback_metadata if item['Name'] == 'Amount'), None)
-        transaction_code = next((item['Value'] for item in callback_metadata if item['Name'] == 'MpesaReceiptNumber'), None)
-        
-        if amount and transaction_code:
-            new_payment = Payment(
-                user_id=user.id,
-                invoice_id=invoice_id,
-                amount=amount,
-                transaction_code=transaction_code,
-                payment_method="Mpesa",
-                payment_date=datetime.now()
-            )
-            db.session.add(new_payment)
-            invoice.status = 'paid'
-            db.session.commit()
-            
-            return jsonify({
-                'ResultCode': 0,
-                'ResultDesc': 'Success'
-            })
+        return jsonify({
+            'ResultCode': 0,
+            'ResultDesc': 'Accepted'
+        })
             
     except Exception as e:
+        logger.error(f"failed to store mpesa callback: {str(e)}")
+        db.session.rollback()
         return jsonify({
             'ResultCode': 1,
-            'ResultDesc': f'Error: {str(e)}'
+            'ResultDesc': 'Error: callback not stored'
         }), 500
@@ -0,0 +1,180 @@
+import json
+import time
+import click
+from datetime import datetime, timedelta
+from flask.cli import with_appcontext
+from sqlalchemy import and_, or_, select, update
+from .models import db, dialect_insert, Business, Invoice, MpesaCallback, Payment
+from .money import parse_cents
+from .cache import mark_stale
+
+# STK push callbacks are stored as received and acknowledged straight away;
+# they are applied later by the process_mpesa_callbacks scheduled job or by
+# `flask mpesa-callback-worker` running as its own process. Safaricom retries
+# a callback until it is acknowledged, so both steps are idempotent: a
+# repeated delivery of the same CheckoutRequestID is not stored twice, and a
+# payment is only inserted once per MpesaReceiptNumber.
+
+CLAIM_BATCH_SIZE = 100
+LEASE_SECONDS = 120
+MAX_ATTEMPTS = 5
+
+
+def enqueue_callback(invoice_id, raw_payload):
+    """
+    Stores a callback for the worker. The caller commits. A callback for an
+    invoice that does not exist (any more) is stored as failed, without an
+    invoice, so it is still acknowledged and kept for inspection.
+
+    Args:
+        invoice_id (UUID): invoice the STK push was made for
+        raw_payload (str): request body as sent by Safaricom
+
+    Returns:
+        bool: False if this callback had already been received
+    """
+    try:
+        checkout_request_id = json.loads(raw_payload)['Body']['stkCallback'].get('CheckoutRequestID')
+    except (ValueError, KeyError, TypeError, AttributeError):
+        # keep malformed payloads for inspection, the worker marks them failed
+        checkout_request_id = None
+
+    values = {"checkout_request_id": checkout_request_id, "invoice_id": invoice_id, "payload": raw_payload}
+    if db.session.get(Invoice, invoice_id) is None:
+        values.update(invoice_id=None, status='failed', last_error=f"invoice {invoice_id} not found")
+
+    table = MpesaCallback.__table__
+    insert = dialect_insert(db.session.get_bind())
+    stmt = (insert(table)
+            .values(**values)
+            .on_conflict_do_nothing(index_elements=[table.c.checkout_request_id])
+            .returning(table.c.id))
+    return db.session.execute(stmt).first() is not None
+
+
+def claim_callbacks(limit=CLAIM_BATCH_SIZE, lease_seconds=LEASE_SECONDS):
+    """
+    Leases up to `limit` unprocessed callbacks to the calling worker and commits.
+
+    Returns:
+        list: rows with id, invoice_id, payload and attempts
+    """
+    table = MpesaCallback.__table__
+    now = datetime.now()
+    due = or_(
+        table.c.status == 'pending',
+        and_(table.c.status == 'processing', table.c.leased_until < now)
+    )
+    candidates = select(table.c.id).where(due).order_by(table.c.created_at).limit(limit)
+    if db.session.get_bind().dialect.name == 'postgresql':
+        candidates = candidates.with_for_update(skip_locked=True)
+
+    try:
+        rows = db.session.execute(
+            update(table)
+            .where(table.c.id.in_(candidates), due)
+            .values(status='processing', leased_until=now + timedelta(seconds=lease_seconds), attempts=table.c.attempts + 1)
+            .returning(table.c.id, table.c.invoice_id, table.c.payload, table.c.attempts)
+        ).all()
+        db.session.commit()
+        return rows
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def apply_callback(invoice_id, payload):
+    """
+    Records the payment carried by a successful callback and marks the
+    invoice paid. The caller commits.
+
+    Returns:
+        bool: True if a new payment was recorded
+    """
+    callback = json.loads(payload)['Body']['stkCallback']
+    if int(callback['ResultCode']) != 0:
+        return False
+
+    metadata = {item['Name']: item.get('Value') for item in callback['CallbackMetadata']['Item']}
+    receipt_number = metadata.get('MpesaReceiptNumber')
+    amount = metadata.get('Amount')
+    if not receipt_number or amount is None:
+        raise ValueError("callback has no receipt number or amount")
+
+    invoice = db.session.get(Invoice, invoice_id)
+    if invoice is None:
+        raise ValueError(f"invoice {invoice_id} not found")
+    payer_id = db.session.query(Business.owner_id).filter(Business.id == invoice.business_id).scalar()
+
+    table = Payment.__table__
+    insert = dialect_insert(db.session.get_bind())
+    inserted = db.session.execute(
+        insert(table)
+        .values(
+            invoice_id=invoice_id,
+            payer_id=payer_id,
+            payment_method='mpesa',
+            transaction_code=receipt_number,
+            amount=parse_cents(amount),
+            payment_date=datetime.now(),
+            status='successful'
+        )
+        .on_conflict_do_nothing(index_elements=[table.c.transaction_code])
+        .returning(table.c.id)
+    ).first()
+    if inserted is None:
+        return False
+    mark_stale(f'payer:{payer_id}', f'invoice:{invoice_id}')
+
+    if invoice.status in ('pending', 'overdue'):
+        invoice.status = 'paid'
+    return True
+
+
+def process_pending_callbacks(limit=CLAIM_BATCH_SIZE, max_attempts=MAX_ATTEMPTS):
+    """
+    Claims a batch of stored callbacks and applies each in its own transaction.
+
+    Returns:
+        dict: number of callbacks processed, payments recorded and failures
+    """
+    table = MpesaCallback.__table__
+    report = {"processed": 0, "payments": 0, "failed": 0}
+
+    for row in claim_callbacks(limit=limit):
+        try:
+            if apply_callback(row.invoice_id, row.payload):
+                report["payments"] += 1
+            db.session.execute(
+                update(table).where(table.c.id == row.id)
+                .values(status='processed', processed_at=datetime.now(), leased_until=None, last_error=None)
+            )
+            db.session.commit()
+            report["processed"] += 1
+        except Exception as e:
+            db.session.rollback()
+            db.session.execute(
+                update(table).where(table.c.id == row.id)
+                .values(status='failed' if row.attempts >= max_attempts else 'pending',
+                        leased_until=None, last_error=str(e))
+            )
+            db.session.commit()
+            report["failed"] += 1
+
+    return report
+
+
+@click.command('mpesa-callback-worker')
+@click.option('--interval', default=2.0, help='seconds to sleep when no callbacks are waiting')
+@click.option('--once', is_flag=True, help='process one batch and exit')
+@with_appcontext
+def mpesa_callback_worker_command(interval, once):
+    """Apply stored M-Pesa callbacks until interrupted."""
+    while True:
+        report = process_pending_callbacks()
+        if report["processed"] or report["failed"]:
+            click.echo(f"processed {report['processed']}, payments {report['payments']}, failed {report['failed']}")
+        if once:
+            return
+        if not report["processed"] and not report["failed"]:
+            time.sleep(interval)
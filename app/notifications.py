@@ -0,0 +1,147 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask_mail import Message
+from . import mail
+from .models import db, Invoice, Business
+from .money import format_amount
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_RATE_LIMIT = 10
+
+REMINDER_TEMPLATE = """
+Dear {name},
+
+This is a reminder that invoice {invoice_number}
+is due on {due_date:%d-%m-%Y}.
+
+Amount Due: {amount}
+
+Please ensure timely payment to avoid late fees.
+
+Best regards,
+Invotrack
+"""
+
+
+class RateLimiter:
+    """Spaces out sends so that at most `rate` messages per second go to a provider."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.lock = threading.Lock()
+        self.next_slot = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def provider_limiter(server, rate):
+    """Returns the rate limiter shared by every batch sent through `server`."""
+    with _limiters_lock:
+        limiter = _limiters.get(server)
+        if limiter is None or limiter.interval != (1.0 / rate if rate else 0):
+            limiter = _limiters[server] = RateLimiter(rate)
+        return limiter
+
+
+def render_due_reminders(sender, days=3, now=None):
+    """
+    Renders reminder emails for every pending invoice due within `days` days.
+    Recipients are read with a single joined query.
+
+    Args:
+        sender (str): address the reminders are sent from
+        days (int): how far ahead to look for due invoices
+        now (datetime): start of the window, defaults to the start of today
+
+    Returns:
+        list: (invoice_id, Message) pairs
+    """
+    if now is None:
+        now = datetime.combine(datetime.now().date(), datetime.min.time())
+
+    rows = (db.session.query(
+                Invoice.id, Invoice.invoice_number, Invoice.due_date, Invoice.total_amount,
+                Business.name, Business.email)
+            .join(Business, Business.id == Invoice.business_id)
+            .filter(
+                Invoice.due_date >= now,
+                Invoice.due_date <= now + timedelta(days=days),
+                Invoice.status == 'pending')
+            .all())
+
+    messages = []
+    for invoice_id, invoice_number, due_date, amount, name, email in rows:
+        message = Message(subject="Invoice Due Reminder", sender=sender, recipients=[email])
+        message.body = REMINDER_TEMPLATE.format(
+            name=name, invoice_number=invoice_number, due_date=due_date, amount=format_amount(amount)
+        )
+        messages.append((invoice_id, message))
+    return messages
+
+
+def _send_batch(app, batch, limiter):
+    outcomes = []
+    with app.app_context():
+        try:
+            with mail.connect() as connection:
+                for key, message in batch:
+                    limiter.wait()
+                    try:
+                        connection.send(message)
+                        outcomes.append({"key": key, "recipients": message.recipients, "status": "sent", "error": None})
+                    except Exception as e:
+                        outcomes.append({"key": key, "recipients": message.recipients, "status": "failed", "error": str(e)})
+        except Exception as e:
+            # the connection could not be opened or dropped mid batch
+            done = {outcome["key"] for outcome in outcomes}
+            outcomes.extend(
+                {"key": key, "recipients": message.recipients, "status": "failed", "error": str(e)}
+                for key, message in batch if key not in done
+            )
+    return outcomes
+
+
+def deliver_messages(app, messages):
+    """
+    Sends messages in batches, each batch over one authenticated SMTP
+    connection, spread across a bounded pool of worker threads. Sends to the
+    configured mail server are rate limited across all workers.
+
+    Configured with MAIL_BATCH_SIZE, MAIL_MAX_WORKERS and MAIL_RATE_LIMIT
+    (messages per second, 0 for no limit).
+
+    Args:
+        app (Flask): the application, pushed as context in every worker
+        messages (list): (key, Message) pairs
+
+    Returns:
+        list: one outcome per message with its key, recipients, status
+              ('sent' or 'failed') and error
+    """
+    if not messages:
+        return []
+
+    batch_size = app.config.get('MAIL_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    max_workers = app.config.get('MAIL_MAX_WORKERS', DEFAULT_MAX_WORKERS)
+    limiter = provider_limiter(app.config.get('MAIL_SERVER'), app.config.get('MAIL_RATE_LIMIT', DEFAULT_RATE_LIMIT))
+
+    batches = [messages[i:i + batch_size] for i in range(0, len(messages), batch_size)]
+    outcomes = []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as pool:
+        for result in pool.map(lambda batch: _send_batch(app, batch, limiter), batches):
+            outcomes.extend(result)
+    return outcomes
@@ -0,0 +1,170 @@
+import random
+import time
+import click
+from datetime import datetime, timedelta
+from flask import current_app
+from flask.cli import with_appcontext
+from flask_mail import Message
+from sqlalchemy import and_, bindparam, or_, select, update
+from .models import db, dialect_insert, OutboxMessage
+from .notifications import deliver_messages
+
+# Mail goes through the outbox table: producers insert rows in their own
+# transaction and return, and the delivery worker claims due rows under a
+# lease, sends them and records the outcome. Rows whose lease expired (the
+# worker died mid batch) are claimed again.
+
+CLAIM_BATCH_SIZE = 200
+LEASE_SECONDS = 300
+MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 60
+BACKOFF_MAX_SECONDS = 3600
+
+
+def reminder_key(kind, invoice_id, day):
+    """Deduplication key allowing one message of a kind per invoice and day."""
+    return f"{kind}:{invoice_id}:{day:%Y-%m-%d}"
+
+
+def enqueue(kind, messages, day=None):
+    """
+    Adds messages to the outbox, skipping those already queued for the same
+    invoice, kind and day. The caller commits.
+
+    Args:
+        kind (str): reminder kind, e.g. 'due_reminder'
+        messages (list): (invoice_id, Message) pairs
+        day (date): day the messages belong to, defaults to today
+
+    Returns:
+        int: number of messages queued
+    """
+    if not messages:
+        return 0
+    day = day or datetime.now().date()
+    table = OutboxMessage.__table__
+    rows = [{
+        "dedup_key": reminder_key(kind, invoice_id, day),
+        "kind": kind,
+        "invoice_id": invoice_id,
+        "recipient": message.recipients[0],
+        "subject": message.subject,
+        "body": message.body,
+    } for invoice_id, message in messages]
+
+    insert = dialect_insert(db.session.get_bind())
+    stmt = insert(table).on_conflict_do_nothing(index_elements=[table.c.dedup_key]).returning(table.c.id)
+    return len(db.session.execute(stmt, rows).all())
+
+
+def backoff(attempts):
+    """Exponential backoff with jitter for the given number of failed attempts."""
+    delay = min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def claim_batch(limit=CLAIM_BATCH_SIZE, lease_seconds=LEASE_SECONDS):
+    """
+    Leases up to `limit` due messages to the calling worker and commits.
+    On postgres rows locked by other workers are skipped.
+
+    Returns:
+        list: rows with id, recipient, subject, body and attempts
+    """
+    table = OutboxMessage.__table__
+    now = datetime.now()
+    due = or_(
+        and_(table.c.status == 'pending', table.c.next_attempt_at <= now),
+        and_(table.c.status == 'sending', table.c.leased_until < now)
+    )
+    candidates = select(table.c.id).where(due).order_by(table.c.next_attempt_at).limit(limit)
+    if db.session.get_bind().dialect.name == 'postgresql':
+        candidates = candidates.with_for_update(skip_locked=True)
+
+    try:
+        rows = db.session.execute(
+            update(table)
+            .where(table.c.id.in_(candidates), due)
+            .values(status='sending', leased_until=now + timedelta(seconds=lease_seconds), attempts=table.c.attempts + 1)
+            .returning(table.c.id, table.c.recipient, table.c.subject, table.c.body, table.c.attempts)
+        ).all()
+        db.session.commit()
+        return rows
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def record_outcomes(claimed, outcomes, max_attempts=MAX_ATTEMPTS):
+    """Marks sent messages, and reschedules or gives up on failed ones."""
+    table = OutboxMessage.__table__
+    attempts = {row.id: row.attempts for row in claimed}
+    now = datetime.now()
+    sent, retry = [], []
+    for outcome in outcomes:
+        if outcome["status"] == "sent":
+            sent.append({"b_id": outcome["key"], "b_sent_at": now})
+        else:
+            count = attempts[outcome["key"]]
+            retry.append({
+                "b_id": outcome["key"],
+                "b_status": 'failed' if count >= max_attempts else 'pending',
+                "b_next_attempt_at": now + backoff(count),
+                "b_last_error": outcome["error"],
+            })
+
+    try:
+        if sent:
+            db.session.execute(
+                update(table).where(table.c.id == bindparam('b_id'))
+                .values(status='sent', sent_at=bindparam('b_sent_at'), leased_until=None, last_error=None),
+                sent
+            )
+        if retry:
+            db.session.execute(
+                update(table).where(table.c.id == bindparam('b_id'))
+                .values(status=bindparam('b_status'), next_attempt_at=bindparam('b_next_attempt_at'),
+                        last_error=bindparam('b_last_error'), leased_until=None),
+                retry
+            )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(sent), len(retry)
+
+
+def deliver_pending(app):
+    """
+    Claims one batch of due outbox messages and delivers it.
+
+    Returns:
+        tuple: (number sent, number failed)
+    """
+    claimed = claim_batch(limit=app.config.get('OUTBOX_BATCH_SIZE', CLAIM_BATCH_SIZE))
+    if not claimed:
+        return 0, 0
+
+    sender = app.config.get('MAIL_DEFAULT_SENDER') or app.config.get('MAIL_USERNAME')
+    messages = []
+    for row in claimed:
+        message = Message(subject=row.subject, sender=sender, recipients=[row.recipient])
+        message.body = row.body
+        messages.append((row.id, message))
+
+    outcomes = deliver_messages(app, messages)
+    return record_outcomes(claimed, outcomes, app.config.get('OUTBOX_MAX_ATTEMPTS', MAX_ATTEMPTS))
+
+
+@click.command('outbox-worker')
+@click.option('--interval', default=5.0, help='seconds to sleep when the outbox is empty')
+@with_appcontext
+def outbox_worker_command(interval):
+    """Deliver outbox messages until interrupted."""
+    app = current_app._get_current_object()
+    while True:
+        sent, failed = deliver_pending(app)
+        if sent or failed:
+            click.echo(f"sent {sent}, failed {failed}")
+        else:
+            time.sleep(interval)
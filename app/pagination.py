@@ -0,0 +1,148 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from uuid import UUID
+from flask import Response, stream_with_context
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+STREAM_CHUNK_SIZE = 500
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+class PaginationError(ValueError):
+    """Raised when the limit or cursor query parameters are invalid."""
+
+
+def encode_cursor(sort_value, row_id):
+    """
+    Encodes the keyset position of the last row of a page into an opaque cursor.
+
+    Args:
+        sort_value (datetime or str): value of the primary sort column of the row
+        row_id (UUID): id of the row, used as the tie breaker
+
+    Returns:
+        str: url safe cursor string
+    """
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, str(row_id)], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor, parse=datetime.fromisoformat):
+    """
+    Decodes a cursor produced by encode_cursor.
+
+    Args:
+        cursor (str): the cursor sent by the client
+        parse (callable): converts the stored sort value back to its column type
+
+    Returns:
+        tuple: (sort_value, UUID)
+
+    Raises:
+        PaginationError: if the cursor is malformed
+    """
+    try:
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return parse(sort_value), UUID(row_id)
+    except (binascii.Error, UnicodeError, ValueError, TypeError):
+        raise PaginationError("invalid cursor")
+
+
+def parse_page_args(args, parse=datetime.fromisoformat):
+    """
+    Reads the `limit` and `cursor` query parameters of a listing request.
+
+    Args:
+        args (MultiDict): request.args
+        parse (callable): converts the cursor sort value back to its column type
+
+    Returns:
+        tuple: (limit, decoded cursor or None)
+
+    Raises:
+        PaginationError: if either parameter is invalid
+    """
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise PaginationError("limit must be an integer")
+    if limit <= 0 or limit > MAX_PAGE_SIZE:
+        raise PaginationError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+    cursor = args.get('cursor')
+    return limit, decode_cursor(cursor, parse) if cursor else None
+
+
+def keyset_filter(query, sort_column, id_column, cursor, descending=True):
+    """
+    Orders a query on (sort_column, id_column), newest first unless descending
+    is False, and restricts it to the rows that come after the cursor position.
+    """
+    if descending:
+        if cursor is not None:
+            query = query.filter(tuple_(sort_column, id_column) < tuple_(*cursor))
+        return query.order_by(sort_column.desc(), id_column.desc())
+    if cursor is not None:
+        query = query.filter(tuple_(sort_column, id_column) > tuple_(*cursor))
+    return query.order_by(sort_column, id_column)
+
+
+def keyset_page(query, sort_column, id_column, limit, cursor, sort_key, id_key='id', descending=True):
+    """
+    Fetches one page of a keyset paginated query.
+
+    One extra row is requested to find out whether another page exists, so no
+    COUNT query is needed.
+
+    Args:
+        query (Query): the filtered listing query
+        sort_column, id_column: columns the listing is ordered on
+        limit (int): page size
+        cursor (tuple or None): decoded cursor of the previous page
+        sort_key (str): attribute holding the sort value on the returned rows
+        id_key (str): attribute holding the id on the returned rows
+        descending (bool): whether the listing is ordered newest first
+
+    Returns:
+        tuple: (rows, next_cursor) where next_cursor is None on the last page
+    """
+    rows = keyset_filter(query, sort_column, id_column, cursor, descending).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, sort_key), getattr(last, id_key))
+
+
+def wants_stream(request):
+    """Streaming is opt-in, either with ?stream=ndjson or an ndjson Accept header."""
+    if request.args.get('stream') in ('1', 'true', 'ndjson'):
+        return True
+    return request.accept_mimetypes.best == NDJSON_MIMETYPE
+
+
+def stream_ndjson(query, serialize):
+    """
+    Streams every row of a query as newline delimited JSON.
+
+    Rows are pulled in chunks through a server side cursor (yield_per enables
+    stream_results), so memory use does not grow with the size of the result.
+
+    Args:
+        query (Query): the ordered listing query
+        serialize (callable): turns a row into a JSON serializable dict
+
+    Returns:
+        Response: a streaming response
+    """
+    def generate():
+        for row in query.yield_per(STREAM_CHUNK_SIZE):
+            yield json.dumps(serialize(row), default=str) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
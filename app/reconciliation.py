@@ -0,0 +1,329 @@
+import csv
+import json
+import re
+import uuid
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime, timedelta
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, update
+from .models import db, dialect_insert, Business, Invoice, Payment, User
+from .money import format_amount, parse_cents
+from .summaries import record_transition
+from .cache import mark_invoices_changed, mark_stale
+
+# Reconciles an M-Pesa transaction statement against recorded payments.
+# Existing payments for the statement period are loaded once into hash
+# indexes (by receipt number, and by amount and phone number), every statement
+# row is matched in memory, and the payments that are missing are inserted in
+# one batch.
+
+DEFAULT_WINDOW_MINUTES = 10
+
+FIELD_ALIASES = {
+    "receipt": ('Receipt No.', 'Receipt No', 'ReceiptNo', 'TransID', 'MpesaReceiptNumber', 'receipt'),
+    "amount": ('Paid In', 'Amount', 'TransAmount', 'amount'),
+    "phone": ('MSISDN', 'PhoneNumber', 'Other Party Info', 'phone'),
+    "time": ('Completion Time', 'TransTime', 'TransactionDate', 'time'),
+    "reference": ('A/C No.', 'BillRefNumber', 'AccountReference', 'reference'),
+}
+TIME_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y%m%d%H%M%S', '%d/%m/%Y %H:%M:%S', '%d-%m-%Y %H:%M:%S')
+
+
+def _field(record, name):
+    for alias in FIELD_ALIASES[name]:
+        value = record.get(alias)
+        if value not in (None, ''):
+            return value
+    return None
+
+
+def normalize_phone(value):
+    """Reduces a phone number to its 2547XXXXXXXX form, None if it has too few digits."""
+    digits = re.sub(r'\D', '', str(value or ''))[:12]
+    return '254' + digits[-9:] if len(digits) >= 9 else None
+
+
+def _parse_time(value):
+    for fmt in TIME_FORMATS:
+        try:
+            return datetime.strptime(str(value).strip(), fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"unrecognised time: {value}")
+
+
+def load_statement(path):
+    """
+    Reads a statement exported as CSV or JSON (a list of transactions, or an
+    object with them under 'transactions').
+
+    Returns:
+        tuple: (entries, errors) where entries are dicts with receipt, amount,
+               phone, time and reference, and errors describe unreadable rows
+    """
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        if path.lower().endswith('.json'):
+            records = json.load(f)
+            if isinstance(records, dict):
+                records = records.get('transactions', [])
+        else:
+            records = list(csv.DictReader(f))
+
+    entries, errors = [], []
+    for line, record in enumerate(records, start=1):
+        try:
+            receipt = _field(record, 'receipt')
+            if not receipt:
+                raise ValueError("missing receipt number")
+            entries.append({
+                "line": line,
+                "receipt": str(receipt).strip(),
+                "amount": parse_cents(_field(record, 'amount')),
+                "phone": normalize_phone(_field(record, 'phone')),
+                "time": _parse_time(_field(record, 'time')),
+                "reference": (str(_field(record, 'reference') or '').strip() or None),
+            })
+        except (ValueError, TypeError) as e:
+            errors.append({"line": line, "issue": "unreadable", "detail": str(e)})
+    return entries, errors
+
+
+def _payment_indexes(start, end):
+    """Loads recorded M-Pesa payments between start and end into lookup tables."""
+    rows = (db.session.query(Payment.id, Payment.transaction_code, Payment.amount, Payment.payment_date, User.phone_number)
+            .outerjoin(User, User.id == Payment.payer_id)
+            .filter(Payment.payment_method == 'mpesa', Payment.payment_date.between(start, end))
+            .all())
+
+    by_receipt = {}
+    by_amount_phone = defaultdict(list)
+    for payment_id, code, amount, paid_at, phone in rows:
+        by_receipt[code] = (payment_id, amount)
+        by_amount_phone[(amount, normalize_phone(phone))].append((paid_at, payment_id))
+    for candidates in by_amount_phone.values():
+        candidates.sort()
+    return by_receipt, by_amount_phone
+
+
+def _chunks(values, size=1000):
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def _receipts_on_record(receipts):
+    """Receipt numbers that already have a payment, whatever its date."""
+    found = set()
+    for chunk in _chunks(receipts):
+        found.update(code for (code,) in db.session.query(Payment.transaction_code)
+                     .filter(Payment.transaction_code.in_(chunk)))
+    return found
+
+
+def _resolve_invoices(references):
+    """
+    Maps statement account references (payment references or invoice ids) to
+    the invoices they name.
+    """
+    codes, ids = set(), set()
+    for reference in references:
+        try:
+            ids.add(uuid.UUID(reference))
+        except ValueError:
+            codes.add(reference)
+
+    columns = (Invoice.id, Invoice.payment_reference, Invoice.status, Invoice.total_amount, Business.owner_id)
+    query = db.session.query(*columns).join(Business, Business.id == Invoice.business_id)
+    resolved = {}
+    for chunk in _chunks(codes):
+        for row in query.filter(Invoice.payment_reference.in_(chunk)):
+            resolved[row.payment_reference] = row
+    for chunk in _chunks(ids):
+        for row in query.filter(Invoice.id.in_(chunk)):
+            resolved[str(row.id)] = row
+    return resolved
+
+
+def _amounts_paid(invoice_ids):
+    """Sum of the successful payments recorded against each invoice."""
+    paid = defaultdict(int)
+    for chunk in _chunks(invoice_ids):
+        paid.update(db.session.query(Payment.invoice_id, func.sum(Payment.amount))
+                    .filter(Payment.invoice_id.in_(chunk), Payment.status == 'successful')
+                    .group_by(Payment.invoice_id))
+    return paid
+
+
+def reconcile(entries, window_minutes=DEFAULT_WINDOW_MINUTES, dry_run=False):
+    """
+    Matches statement entries against recorded payments.
+
+    An entry matches when a payment with its receipt number exists. An entry
+    whose receipt is unknown, but for which a payment of the same amount from
+    the same phone number was recorded within the time window, is flagged as a
+    receipt mismatch; such pairs are made closest in time first. Remaining
+    entries are inserted as payments against the invoice named by their
+    account reference. An invoice is marked paid once its payments cover its
+    total; a shortfall or an excess is flagged as an amount mismatch.
+
+    Args:
+        entries (list): statement entries from load_statement
+        window_minutes (int): tolerance between statement and payment times
+        dry_run (bool): report what would change without writing
+
+    Returns:
+        dict: counts per outcome and the list of flagged entries
+    """
+    report = {"entries": len(entries), "matched": 0, "inserted": 0, "flagged": []}
+    if not entries:
+        return report
+
+    window = timedelta(minutes=window_minutes)
+    start = min(entry["time"] for entry in entries) - window
+    end = max(entry["time"] for entry in entries) + window
+    by_receipt, by_amount_phone = _payment_indexes(start, end)
+    outside_window = _receipts_on_record({e["receipt"] for e in entries if e["receipt"] not in by_receipt})
+
+    # exact receipt matches first, so fuzzy matching only sees payments that
+    # no statement entry claims by receipt
+    claimed = set()
+    unmatched = []
+    for entry in entries:
+        found = by_receipt.get(entry["receipt"])
+        if found is None:
+            if entry["receipt"] in outside_window:
+                report["matched"] += 1
+            else:
+                unmatched.append(entry)
+            continue
+        payment_id, amount = found
+        claimed.add(payment_id)
+        if amount == entry["amount"]:
+            report["matched"] += 1
+        else:
+            report["flagged"].append({"line": entry["line"], "receipt": entry["receipt"], "issue": "amount_mismatch",
+                                      "detail": f"statement {format_amount(entry['amount'])}, recorded {format_amount(amount)}"})
+
+    # pair the remaining entries with unclaimed payments of the same amount and
+    # phone, closest in time first
+    pairs = []
+    for index, entry in enumerate(unmatched):
+        candidates = by_amount_phone.get((entry["amount"], entry["phone"]), [])
+        i = bisect_left(candidates, (entry["time"] - window,))
+        while i < len(candidates) and candidates[i][0] <= entry["time"] + window:
+            paid_at, payment_id = candidates[i]
+            if payment_id not in claimed:
+                pairs.append((abs(paid_at - entry["time"]), index, payment_id))
+            i += 1
+    pairs.sort(key=lambda pair: (pair[0], pair[1]))
+
+    fuzzy = {}
+    for _, index, payment_id in pairs:
+        if index not in fuzzy and payment_id not in claimed:
+            fuzzy[index] = payment_id
+            claimed.add(payment_id)
+
+    missing = []
+    for index, entry in enumerate(unmatched):
+        if index not in fuzzy:
+            missing.append(entry)
+            continue
+        report["flagged"].append({"line": entry["line"], "receipt": entry["receipt"], "issue": "receipt_mismatch",
+                                  "detail": f"matches payment {fuzzy[index]} by amount, phone and time"})
+
+    invoices = _resolve_invoices({entry["reference"] for entry in missing if entry["reference"]})
+    payments = []
+    seen = set()
+    # per invoice, what the statement pays and the entry paying it last
+    statement_paid, last_entry = defaultdict(int), {}
+    for entry in missing:
+        invoice = invoices.get(entry["reference"])
+        if invoice is None:
+            report["flagged"].append({"line": entry["line"], "receipt": entry["receipt"], "issue": "unknown_invoice",
+                                      "detail": f"no invoice for reference {entry['reference']}"})
+            continue
+        if entry["receipt"] in seen:
+            report["flagged"].append({"line": entry["line"], "receipt": entry["receipt"], "issue": "duplicate_receipt",
+                                      "detail": "receipt appears more than once in the statement"})
+            continue
+        seen.add(entry["receipt"])
+        statement_paid[invoice.id] += entry["amount"]
+        last_entry[invoice.id] = entry
+        payments.append({
+            "invoice_id": invoice.id,
+            "payer_id": invoice.owner_id,
+            "payment_method": 'mpesa',
+            "transaction_code": entry["receipt"],
+            "amount": entry["amount"],
+            "payment_date": entry["time"],
+            "status": 'successful',
+        })
+
+    report["to_insert"] = len(payments)
+
+    # counting the payments already recorded, partial payments add up
+    covered = set()
+    recorded = _amounts_paid(last_entry)
+    for invoice_id, entry in last_entry.items():
+        invoice, paid = invoices[entry["reference"]], recorded[invoice_id] + statement_paid[invoice_id]
+        if paid >= invoice.total_amount:
+            covered.add(invoice_id)
+        if paid != invoice.total_amount:
+            kind = "under" if paid < invoice.total_amount else "over"
+            report["flagged"].append({"line": entry["line"], "receipt": entry["receipt"], "issue": "amount_mismatch",
+                                      "detail": f"invoice {invoice.payment_reference} {kind}paid: "
+                                                f"{format_amount(paid)} of {format_amount(invoice.total_amount)}"})
+
+    if dry_run or not payments:
+        return report
+
+    try:
+        table = Payment.__table__
+        insert = dialect_insert(db.session.get_bind())
+        inserted = db.session.execute(
+            insert(table).on_conflict_do_nothing(index_elements=[table.c.transaction_code]).returning(table.c.invoice_id, table.c.payer_id),
+            payments
+        ).all()
+        report["inserted"] = len(inserted)
+        mark_stale(*{f'payer:{payer_id}' for _, payer_id in inserted})
+
+        paid = {invoice_id for invoice_id, _ in inserted}
+        invoice_table = Invoice.__table__
+        for from_status in ('pending', 'overdue'):
+            rows = db.session.execute(
+                update(invoice_table)
+                .where(invoice_table.c.id.in_(paid & covered), invoice_table.c.status == from_status)
+                .values(status='paid')
+                .returning(invoice_table.c.issuer_id, invoice_table.c.business_id, invoice_table.c.total_amount)
+            ).all()
+            record_transition(db.session.connection(), [(row.issuer_id, row.total_amount) for row in rows],
+                              from_status, 'paid')
+            mark_invoices_changed(issuer_ids={row.issuer_id for row in rows},
+                                  business_ids={row.business_id for row in rows})
+        mark_stale(*{f'invoice:{invoice_id}' for invoice_id in paid})
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return report
+
+
+@click.command('reconcile-mpesa')
+@click.argument('statement', type=click.Path(exists=True, dir_okay=False))
+@click.option('--window-minutes', default=DEFAULT_WINDOW_MINUTES, help='time tolerance for fuzzy matches')
+@click.option('--dry-run', is_flag=True, help='report without inserting payments')
+@click.option('--output', type=click.Path(dir_okay=False), help='write flagged entries to this JSON file')
+@with_appcontext
+def reconcile_mpesa_command(statement, window_minutes, dry_run, output):
+    """Reconcile an M-Pesa statement (CSV or JSON) against recorded payments."""
+    entries, errors = load_statement(statement)
+    report = reconcile(entries, window_minutes=window_minutes, dry_run=dry_run)
+    report["flagged"] = errors + report["flagged"]
+
+    inserted = f"{report['to_insert']} to insert" if dry_run else f"{report['inserted']} inserted"
+    click.echo(f"{report['entries']} entries: {report['matched']} matched, {inserted}, {len(report['flagged'])} flagged")
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report["flagged"], f, indent=2, default=str)
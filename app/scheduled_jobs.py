@@ -0,0 +1,134 @@
+import time
+from datetime import datetime
+from sqlalchemy import select, update
+from . import db, scheduler
+
+# Job functions are module level so the persistent job store can reference
+# them by name. They run in the scheduler's thread pool and push the
+# application context themselves.
+
+OVERDUE_SWEEP_CHUNK_SIZE = 5000
+
+def sweep_overdue_invoices(now=None, chunk_size=OVERDUE_SWEEP_CHUNK_SIZE):
+    """
+    Marks pending invoices that are past their due date as overdue.
+    The update runs as set based UPDATE statements over chunks of at most
+    chunk_size rows, each committed on its own, so row locks are held briefly
+    and the sweep never loads invoices into the session. Candidate rows come
+    from the partial index on pending due dates.
+    Args:
+        now (datetime): invoices due before this are overdue, defaults to the start of today
+        chunk_size (int): maximum number of invoices updated per statement
+    Returns:
+        dict: number of invoices updated, chunks run and duration in milliseconds
+    """
+    from .models import Invoice
+    from .summaries import record_transition
+    from .cache import mark_invoices_changed
+    
+    if now is None:
+        now = datetime.combine(datetime.now().date(), datetime.min.time())
+    
+    table = Invoice.__table__
+    started = time.perf_counter()
+    updated = 0
+    chunks = 0
+    
+    while True:
+        candidates = (
+            select(table.c.id)
+            .where(table.c.due_date < now, table.c.status == 'pending')
+            .limit(chunk_size)
+        )
+        if db.session.get_bind().dialect.name == 'postgresql':
+            candidates = candidates.with_for_update(skip_locked=True)
+        
+        try:
+            rows = db.session.execute(
+                update(table)
+                .where(table.c.id.in_(candidates))
+                .values(status='overdue')
+                .returning(table.c.id, table.c.issuer_id, table.c.business_id, table.c.total_amount)
+            ).all()
+            record_transition(db.session.connection(), [(row.issuer_id, row.total_amount) for row in rows],
+                              'pending', 'overdue')
+            mark_invoices_changed(issuer_ids={row.issuer_id for row in rows},
+                                  business_ids={row.business_id for row in rows},
+                                  invoice_ids=[row.id for row in rows])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        
+        updated += len(rows)
+        chunks += 1
+        if len(rows) < chunk_size:
+            break
+    
+    return {
+        "updated": updated,
+        "chunks": chunks,
+        "duration_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
+
+def update_invoice_status():
+    """Update overdue invoices."""
+    app = scheduler.app
+    with app.app_context():
+        try:
+            chunk_size = app.config.get('OVERDUE_SWEEP_CHUNK_SIZE', OVERDUE_SWEEP_CHUNK_SIZE)
+            report = sweep_overdue_invoices(chunk_size=chunk_size)
+            app.logger.info(
+                f"Updated {report['updated']} overdue invoices in {report['chunks']} chunks "
+                f"({report['duration_ms']}ms)"
+            )
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Error updating invoice status: {str(e)}")
+
+def send_due_notifications():
+    """Queue reminders for invoices due soon."""
+    from .notifications import render_due_reminders
+    from .outbox import enqueue
+    
+    app = scheduler.app
+    with app.app_context():
+        try:
+            messages = render_due_reminders(sender=app.config['MAIL_USERNAME'])
+            queued = enqueue('due_reminder', messages)
+            db.session.commit()
+            app.logger.info(f"Queued {queued} of {len(messages)} invoice reminders")
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Error queueing notifications: {str(e)}")
+
+def deliver_outbox():
+    """Deliver a batch of queued emails."""
+    from .outbox import deliver_pending
+    
+    app = scheduler.app
+    with app.app_context():
+        try:
+            sent, failed = deliver_pending(app)
+            if sent or failed:
+                app.logger.info(f"Delivered {sent} outbox messages, {failed} failed")
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Error delivering outbox: {str(e)}")
+
+def process_mpesa_callbacks():
+    """Apply stored M-Pesa callbacks."""
+    from .mpesa_callbacks import process_pending_callbacks
+    
+    app = scheduler.app
+    with app.app_context():
+        try:
+            report = process_pending_callbacks()
+            if report['processed'] or report['failed']:
+                app.logger.info(
+                    f"Processed {report['processed']} mpesa callbacks, recorded {report['payments']} payments, "
+                    f"{report['failed']} failed"
+                )
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Error processing mpesa callbacks: {str(e)}")
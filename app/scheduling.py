@@ -0,0 +1,81 @@
+import time
+import click
+from apscheduler.schedulers.base import STATE_PAUSED, STATE_STOPPED
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from flask import current_app
+from flask.cli import with_appcontext
+from .leader import start_leader_election
+from . import scheduler
+
+# Jobs are kept in the scheduler_jobs table. A job that is already stored
+# keeps its next run time when the leader starts, so runs missed while no
+# process was leader are caught up (within the misfire grace time) instead
+# of being pushed to the next trigger time. Only a job's trigger or function
+# is updated if it changed in code or config.
+
+
+def _jobs(app):
+    """
+    Returns:
+        list: (id, func, trigger) of every scheduled job
+    """
+    timezone = scheduler.scheduler.timezone
+    return [
+        ('update_overdue_invoices', 'app.scheduled_jobs:update_invoice_status',
+         CronTrigger(hour=0, minute=0, timezone=timezone)),
+        ('send_due_invoice_notifications', 'app.scheduled_jobs:send_due_notifications',
+         CronTrigger(hour=20, minute=30, timezone=timezone)),
+        ('deliver_outbox', 'app.scheduled_jobs:deliver_outbox',
+         IntervalTrigger(seconds=app.config.get('OUTBOX_POLL_SECONDS', 60), timezone=timezone)),
+        ('process_mpesa_callbacks', 'app.scheduled_jobs:process_mpesa_callbacks',
+         IntervalTrigger(seconds=app.config.get('MPESA_CALLBACK_POLL_SECONDS', 10), timezone=timezone)),
+    ]
+
+
+def register_jobs(app):
+    """Adds the jobs missing from the job store and updates changed ones, keeping their next run time."""
+    for job_id, func, trigger in _jobs(app):
+        job = scheduler.get_job(job_id)
+        if job is None:
+            scheduler.add_job(id=job_id, func=func, trigger=trigger)
+            continue
+        changes = {}
+        if str(job.trigger) != str(trigger):
+            changes["trigger"] = trigger
+        if job.func_ref != func:
+            changes["func"] = func
+        if changes:
+            # the apscheduler method; Flask-APScheduler's reschedules on a trigger change
+            scheduler.scheduler.modify_job(job_id, **changes)
+
+
+def _elect(app):
+    def on_elected():
+        if scheduler.state == STATE_STOPPED:
+            # the job store is only opened once the scheduler starts
+            scheduler.start(paused=True)
+        register_jobs(app)
+        if scheduler.state == STATE_PAUSED:
+            scheduler.resume()
+    return on_elected
+
+
+def init_scheduler(app):
+    """
+    Starts the scheduler, with the scheduled jobs, in whichever process wins
+    the leader election, so every job runs once across all workers.
+
+    Returns:
+        threading.Event: set it to stop the election
+    """
+    return start_leader_election(app, on_elected=_elect(app), on_demoted=scheduler.pause)
+
+
+@click.command('scheduler')
+@with_appcontext
+def scheduler_command():
+    """Run the scheduled jobs in this process (when elected leader) until interrupted."""
+    init_scheduler(current_app._get_current_object())
+    while True:
+        time.sleep(60)
@@ -0,0 +1,141 @@
+import logging
+import re
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import DDL, event, func, select, text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from .models import db, Business
+
+logger = logging.getLogger(__name__)
+
+# Business name search for the typeahead. A LIKE '%name%' filter cannot use
+# a B-tree index, so every keystroke scanned the whole businesses table.
+#
+# On postgres names are indexed by trigram (pg_trgm GIN index). A name
+# matches if it contains the query or is a close spelling of one of its
+# words, and results are ranked by word similarity.
+#
+# On sqlite names are kept in an FTS5 table, in sync through triggers. A
+# name matches if each word of the query is the start of one of its words,
+# and results are ranked by bm25. There is no fuzzy matching on sqlite.
+#
+# The index is created by the 0011_business_name_search migration, and along
+# with the businesses table by create_all. `flask build-business-search`
+# creates and fills it on a database that has neither. Without the index (or
+# without pg_trgm) searches fall back to a LIKE filter and log a warning.
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+_POSTGRES_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_businesses_name_trgm ON businesses USING gin (name gin_trgm_ops)",
+)
+
+_SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS businesses_fts USING fts5("
+    "name, content='businesses', content_rowid='rowid', tokenize='unicode61', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS businesses_fts_insert AFTER INSERT ON businesses BEGIN "
+    "INSERT INTO businesses_fts(rowid, name) VALUES (new.rowid, new.name); END",
+    "CREATE TRIGGER IF NOT EXISTS businesses_fts_delete AFTER DELETE ON businesses BEGIN "
+    "INSERT INTO businesses_fts(businesses_fts, rowid, name) VALUES ('delete', old.rowid, old.name); END",
+    "CREATE TRIGGER IF NOT EXISTS businesses_fts_update AFTER UPDATE OF name ON businesses BEGIN "
+    "INSERT INTO businesses_fts(businesses_fts, rowid, name) VALUES ('delete', old.rowid, old.name); "
+    "INSERT INTO businesses_fts(rowid, name) VALUES (new.rowid, new.name); END",
+)
+
+for _statement in _POSTGRES_DDL:
+    event.listen(Business.__table__, 'after_create', DDL(_statement).execute_if(dialect='postgresql'))
+for _statement in _SQLITE_DDL:
+    event.listen(Business.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+event.listen(Business.__table__, 'before_drop', DDL("DROP TABLE IF EXISTS businesses_fts").execute_if(dialect='sqlite'))
+
+
+def _like_pattern(query):
+    escaped = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def _fts_query(query):
+    # every word as a quoted prefix term, so FTS5 operators in the input are plain text
+    words = re.findall(r'\w+', query)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_businesses(query, limit=DEFAULT_LIMIT):
+    """
+    Finds businesses by name, best matches first.
+
+    Args:
+        query (str): text typed by the user
+        limit (int): most results returned, capped at MAX_LIMIT
+
+    Returns:
+        list: ids of the matching businesses, best match first
+    """
+    query = query.strip()
+    limit = max(1, min(limit, MAX_LIMIT))
+    if not query:
+        return []
+
+    try:
+        # in a savepoint, so a failed search leaves the transaction usable on postgres
+        with db.session.begin_nested():
+            return _indexed_search(query, limit)
+    except (OperationalError, ProgrammingError) as e:
+        logger.warning(f"business search index unavailable, run `flask build-business-search`: {str(e)}")
+        return _like_search(query, limit)
+
+
+def _indexed_search(query, limit):
+    if db.session.get_bind().dialect.name == 'postgresql':
+        stmt = (
+            select(Business.id)
+            .where(Business.name.ilike(_like_pattern(query), escape='\\') | Business.name.op('%>')(query))
+            .order_by(func.word_similarity(query, Business.name).desc(), Business.name)
+            .limit(limit)
+        )
+        return db.session.execute(stmt).scalars().all()
+
+    match = _fts_query(query)
+    if not match:
+        return []
+    stmt = text(
+        "SELECT businesses.id FROM businesses_fts "
+        "JOIN businesses ON businesses.rowid = businesses_fts.rowid "
+        "WHERE businesses_fts MATCH :match "
+        "ORDER BY businesses_fts.rank, businesses.name LIMIT :limit"
+    ).columns(Business.id)
+    return db.session.execute(stmt, {"match": match, "limit": limit}).scalars().all()
+
+
+def _like_search(query, limit):
+    # scans the businesses table, only used while the index is missing
+    stmt = (
+        select(Business.id)
+        .where(Business.name.ilike(_like_pattern(query), escape='\\'))
+        .order_by(Business.name)
+        .limit(limit)
+    )
+    return db.session.execute(stmt).scalars().all()
+
+
+def build_search_index():
+    """Creates the business name index if it is missing and fills it."""
+    connection = db.session.connection()
+    if connection.dialect.name == 'postgresql':
+        for statement in _POSTGRES_DDL:
+            connection.execute(text(statement))
+    else:
+        for statement in _SQLITE_DDL:
+            connection.execute(text(statement))
+        connection.execute(text("INSERT INTO businesses_fts(businesses_fts) VALUES ('rebuild')"))
+    db.session.commit()
+
+
+@click.command('build-business-search')
+@with_appcontext
+def build_search_index_command():
+    """Create and fill the business name search index."""
+    build_search_index()
+    click.echo("business search index is up to date")
@@ -0,0 +1,169 @@
+from sqlalchemy.orm import aliased
+from .models import db, Invoice, InvoiceItem, Business, User, Payment
+from .money import as_number
+
+# Read models for the listing endpoints. Each field maps to the column it is
+# read from and how it is rendered, so a listing selects exactly the columns it
+# returns and joins the related tables once instead of lazy loading
+# invoice.business / invoice.issuer / payment.payer for every row.
+
+Issuer = aliased(User, name='issuer_user')
+Recipient = aliased(Business, name='recipient_business')
+Payer = aliased(User, name='payer_user')
+Owner = aliased(User, name='owner_user')
+
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+
+def _str(value):
+    return str(value) if value is not None else None
+
+
+INVOICE_FIELDS = {
+    "id": (Invoice.id, _str),
+    "invoice_number": (Invoice.invoice_number, None),
+    "issuer": (Issuer.name, None),
+    "recipient": (Recipient.name, None),
+    "amount": (Invoice.total_amount, as_number),
+    "status": (Invoice.status, None),
+    "date_issued": (Invoice.date_issued, _iso),
+    "due_date": (Invoice.due_date, _iso),
+}
+
+INVOICE_ITEM_FIELDS = {
+    "id": (InvoiceItem.id, _str),
+    "service": (InvoiceItem.description, None),
+    "quantity": (InvoiceItem.quantity, None),
+    "unit_price": (InvoiceItem.unit_price, as_number),
+    "subtotal": (InvoiceItem.subtotal, as_number),
+}
+
+PAYMENT_FIELDS = {
+    "id": (Payment.id, _str),
+    "amount": (Payment.amount, as_number),
+    "payment_method": (Payment.payment_method, None),
+    "transaction_code": (Payment.transaction_code, None),
+    "payer": (Payer.name, None),
+    "payment_date": (Payment.payment_date, _iso),
+    "invoice_id": (Payment.invoice_id, _str),
+}
+
+BUSINESS_FIELDS = {
+    "id": (Business.id, _str),
+    "name": (Business.name, None),
+    "owner": (Owner.name, None),
+    "email": (Business.email, None),
+    "phone_number": (Business.phone_number, None),
+}
+
+
+
+def _select(field_map, fields, extra=()):
+    """Labels each projected column with the name of the field it renders."""
+    names = list(dict.fromkeys(list(fields) + list(extra)))
+    return [field_map[name][0].label(name) for name in names]
+
+
+def _serializer(field_map, fields):
+    converters = [(name, field_map[name][1]) for name in fields]
+
+    def serialize(row):
+        values = row._mapping
+        return {
+            name: convert(values[name]) if convert else values[name]
+            for name, convert in converters
+        }
+    return serialize
+
+
+def invoice_listing(fields, *criteria, recipient_owner_id=None):
+    """
+    Builds a projected invoice query and the serializer for its rows.
+
+    Issuer and recipient names are fetched with outer joins only when they are
+    requested, so every listing costs a single query regardless of row count.
+    `id` and `date_issued` are always selected since listings paginate on them.
+
+    Args:
+        fields (list): names from INVOICE_FIELDS to return, in output order
+        *criteria: filter expressions applied to the query
+        recipient_owner_id (UUID): only the invoices received by businesses of
+                                   this user, selected with an inner join
+
+    Returns:
+        tuple: (query, serialize)
+    """
+    query = db.session.query(*_select(INVOICE_FIELDS, fields, extra=('id', 'date_issued')))
+    query = query.select_from(Invoice)
+    if 'issuer' in fields:
+        query = query.outerjoin(Issuer, Issuer.id == Invoice.issuer_id)
+    if recipient_owner_id is not None:
+        query = query.join(Recipient, (Recipient.id == Invoice.business_id) & (Recipient.owner_id == recipient_owner_id))
+    elif 'recipient' in fields:
+        query = query.outerjoin(Recipient, Recipient.id == Invoice.business_id)
+    return query.filter(*criteria), _serializer(INVOICE_FIELDS, fields)
+
+
+def invoice_detail(invoice_id):
+    """
+    Loads a single invoice with its line items in two queries.
+
+    Args:
+        invoice_id (UUID): the invoice to load
+
+    Returns:
+        dict or None: the serialized invoice, None if it does not exist
+    """
+    fields = ['id', 'invoice_number', 'issuer', 'recipient', 'amount', 'date_issued', 'due_date', 'status']
+    query, serialize = invoice_listing(fields, Invoice.id == invoice_id)
+    row = query.first()
+    if row is None:
+        return None
+
+    item_fields = list(INVOICE_ITEM_FIELDS)
+    serialize_item = _serializer(INVOICE_ITEM_FIELDS, item_fields)
+    items = (db.session.query(*_select(INVOICE_ITEM_FIELDS, item_fields))
+             .filter(InvoiceItem.invoice_id == invoice_id)
+             .order_by(InvoiceItem.id)
+             .all())
+
+    invoice = serialize(row)
+    invoice["details"] = [serialize_item(item) for item in items]
+    return invoice
+
+
+def payment_listing(*criteria):
+    """
+    Builds a projected payment query, joined to the payer, and its serializer.
+
+    Returns:
+        tuple: (query, serialize)
+    """
+    fields = list(PAYMENT_FIELDS)
+    query = (db.session.query(*_select(PAYMENT_FIELDS, fields))
+             .select_from(Payment)
+             .outerjoin(Payer, Payer.id == Payment.payer_id))
+    return query.filter(*criteria), _serializer(PAYMENT_FIELDS, fields)
+
+
+def business_listing(fields, *criteria):
+    """
+    Builds a projected business query and the serializer for its rows.
+
+    The owner's name is fetched with an outer join only when it is requested.
+    `id` and `name` are always selected since the directory paginates on them.
+
+    Args:
+        fields (list): names from BUSINESS_FIELDS to return, in output order
+        *criteria: filter expressions applied to the query
+
+    Returns:
+        tuple: (query, serialize)
+    """
+    query = db.session.query(*_select(BUSINESS_FIELDS, fields, extra=('id', 'name')))
+    query = query.select_from(Business)
+    if 'owner' in fields:
+        query = query.outerjoin(Owner, Owner.id == Business.owner_id)
+    return query.filter(*criteria), _serializer(BUSINESS_FIELDS, fields)
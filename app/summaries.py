@@ -0,0 +1,138 @@
+import click
+from collections import defaultdict
+from flask.cli import with_appcontext
+from sqlalchemy import case, delete, event, func, inspect, select
+from .models import db, dialect_insert, Invoice, InvoiceSummary, INVOICE_STATUSES
+
+# The invoice summaries hold, per issuer, the number of invoices and their total
+# amount in every status. They are adjusted in the same transaction as the
+# invoice writes that change them, so the dashboard reads a single row.
+
+
+def _amount(value):
+    return int(value) if value is not None else 0
+
+
+def _old_value(state, key):
+    history = state.attrs[key].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return None
+
+
+def _add(deltas, issuer_id, status, count, amount):
+    if issuer_id is None or status is None:
+        return
+    entry = deltas[issuer_id][status]
+    entry[0] += count
+    entry[1] += _amount(amount) * count
+
+
+def _new_deltas():
+    return defaultdict(lambda: defaultdict(lambda: [0, 0]))
+
+
+def apply_deltas(connection, deltas):
+    """
+    Adds count and amount deltas to the summaries of the given issuers,
+    creating missing summary rows.
+
+    Args:
+        connection (Connection): connection of the transaction making the change
+        deltas (dict): {issuer_id: {status: [count, amount]}}
+    """
+    table = InvoiceSummary.__table__
+    insert = dialect_insert(connection)
+    for issuer_id, changes in deltas.items():
+        values = {}
+        for status, (count, amount) in changes.items():
+            if count or amount:
+                values[f'{status}_count'] = count
+                values[f'{status}_total'] = amount
+        if not values:
+            continue
+        stmt = insert(table).values(issuer_id=issuer_id, **values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.issuer_id],
+            set_={name: table.c[name] + stmt.excluded[name] for name in values}
+        )
+        connection.execute(stmt)
+
+
+def record_transition(connection, rows, from_status, to_status):
+    """
+    Moves invoices between statuses in the summaries, for bulk UPDATE statements
+    that bypass the ORM.
+
+    Args:
+        connection (Connection): connection of the transaction making the change
+        rows (iterable): (issuer_id, total_amount) of every invoice moved
+        from_status (str): status the invoices had
+        to_status (str): status the invoices have now
+    """
+    deltas = _new_deltas()
+    for issuer_id, amount in rows:
+        _add(deltas, issuer_id, from_status, -1, amount)
+        _add(deltas, issuer_id, to_status, 1, amount)
+    apply_deltas(connection, deltas)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _update_summaries(session, flush_context):
+    deltas = _new_deltas()
+
+    for obj in session.new:
+        if isinstance(obj, Invoice):
+            _add(deltas, obj.issuer_id, obj.status, 1, obj.total_amount)
+
+    for obj in session.deleted:
+        if isinstance(obj, Invoice):
+            state = inspect(obj)
+            _add(deltas, _old_value(state, 'issuer_id'), _old_value(state, 'status'), -1, _old_value(state, 'total_amount'))
+
+    for obj in session.dirty:
+        if not isinstance(obj, Invoice) or obj in session.deleted:
+            continue
+        state = inspect(obj)
+        if not any(state.attrs[key].history.has_changes() for key in ('issuer_id', 'status', 'total_amount')):
+            continue
+        _add(deltas, _old_value(state, 'issuer_id'), _old_value(state, 'status'), -1, _old_value(state, 'total_amount'))
+        _add(deltas, obj.issuer_id, obj.status, 1, obj.total_amount)
+
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+
+def rebuild_summaries():
+    """
+    Recomputes every invoice summary from the invoices table.
+
+    Returns:
+        int: number of summary rows written
+    """
+    table = InvoiceSummary.__table__
+    columns = [Invoice.issuer_id]
+    names = ['issuer_id']
+    for status in INVOICE_STATUSES:
+        columns.append(func.coalesce(func.sum(case((Invoice.status == status, 1), else_=0)), 0))
+        columns.append(func.coalesce(func.sum(case((Invoice.status == status, Invoice.total_amount), else_=0)), 0))
+        names += [f'{status}_count', f'{status}_total']
+
+    try:
+        db.session.execute(delete(table))
+        result = db.session.execute(table.insert().from_select(names, select(*columns).group_by(Invoice.issuer_id)))
+        db.session.commit()
+        return result.rowcount
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+@click.command('rebuild-invoice-summaries')
+@with_appcontext
+def rebuild_summaries_command():
+    """Recompute the per issuer invoice summaries from scratch."""
+    count = rebuild_summaries()
+    click.echo(f"rebuilt {count} invoice summaries")
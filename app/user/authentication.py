@@ -2,7 +2,8 @@ from flask import (Blueprint, session, request, jsonify, redirect)
 from functools import wraps
 from flask_jwt_extended import create_access_token, create_refresh_token, get_jwt_identity, jwt_required
 from ..extensions import logger, validate_password, flow, GOOGLE_CLIENT_ID, validate_phone_number
-from email_validator  import validate_email, EmailNotValidError
+from email_validator import EmailNotValidError
+from ..email_checks import check_email
 from ..models import User, db
 from datetime import timedelta
 from sqlalchemy.exc import SQLAlchemyError
@@ -36,7 +37,7 @@ def signup_user():
             return jsonify({"error": "all fields are required"}), 400
         
         try:
-            validate_email(email)
+            check_email(email)
         except EmailNotValidError:
             return jsonify({"error": "invalid email format"}), 400
         
@@ -2,7 +2,11 @@ from flask import Blueprint, request, jsonify
 from ..extensions import logger, validate_phone_number
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..models import Business, db
-from email_validator import validate_email, EmailNotValidError
+from email_validator import EmailNotValidError
+from ..email_checks import check_email
+from ..search import search_businesses, DEFAULT_LIMIT
+from ..serializers import business_listing, BUSINESS_FIELDS
+from ..pagination import PaginationError, parse_page_args, keyset_page
 from sqlalchemy.exc import SQLAlchemyError
 from uuid import UUID
 
@@ -40,7 +44,7 @@ def register_business():
             return jsonify({"Error": "name of business already exists"}), 400
         
         try:
-            validate_email(email)
+            check_email(email)
         except EmailNotValidError as e:
             return jsonify({"error": "invalid email format"}), 400
         
@@ -73,14 +77,19 @@ def register_business():
 def view_businesses():
     """
     Fetches and returns a list of businesses based on the provided query parameters.
-    If a 'name' query parameter is provided, it filters businesses whose names contain the given value.
-    Otherwise, it returns all businesses.
+    If a 'name' query parameter is provided, it returns the best matching businesses
+    from the name search index, at most 'limit' of them (see search.py).
+    Otherwise, it returns one page of the directory, ordered by name. Pages are keyset
+    paginated with the 'limit' and 'cursor' query parameters; the cursor of the next
+    page is returned in the X-Next-Cursor header, which is absent on the last page.
+    A 'fields' query parameter (e.g. fields=id,name) selects the fields returned.
     Returns:
         tuple: A tuple containing a JSON response with business details and an HTTP status code.
             - On success: (jsonify(business_details), 200)
+            - On invalid query parameters: (jsonify({"error": ...}), 400)
             - On failure: (jsonify({"error": "internal server error"}), 500)
-    Business details include:
-        - id (int): The unique identifier of the business.
+    Business details include, unless narrowed down with 'fields':
+        - id (str): The unique identifier of the business.
         - name (str): The name of the business.
         - owner (str or None): The name of the business owner, if available.
         - email (str): The email address of the business.
@@ -89,21 +98,37 @@ def view_businesses():
         Logs any exceptions that occur during the execution of the function.
     """
     try:
+        fields = list(BUSINESS_FIELDS)
+        if request.args.get('fields'):
+            fields = list(dict.fromkeys(field.strip() for field in request.args['fields'].split(',')))
+            unknown = [field for field in fields if field not in BUSINESS_FIELDS]
+            if unknown:
+                return jsonify({"error": f"unknown fields: {', '.join(unknown)}"}), 400
+        
         name = request.args.get('name')
         if name:
-            businesses = Business.query.filter(Business.name.like('%' + name + '%')).all()
-        else:
-            businesses = Business.query.all()
+            try:
+                limit = int(request.args.get('limit', DEFAULT_LIMIT))
+            except ValueError:
+                return jsonify({"error": "limit must be an integer"}), 400
+            
+            ids = search_businesses(name, limit)
+            query, serialize = business_listing(fields, Business.id.in_(ids))
+            rows = {row.id: row for row in query.all()} if ids else {}
+            return jsonify([serialize(rows[id]) for id in ids if id in rows]), 200
         
-        business_details = [{
-            "id": business.id,
-            "name": business.name,
-            "owner": business.owner.name if business.owner else None,
-            "email": business.email,
-            "phone_number": business.phone_number
-        } for business in businesses]
+        try:
+            limit, cursor = parse_page_args(request.args, parse=str)
+        except PaginationError as e:
+            return jsonify({"error": str(e)}), 400
         
-        return jsonify(business_details), 200
+        query, serialize = business_listing(fields)
+        page, next_cursor = keyset_page(query, Business.name, Business.id, limit, cursor, sort_key='name', descending=False)
+        
+        response = jsonify([serialize(row) for row in page])
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response, 200
    
     except Exception as e:
         logger.error(f"endpoint error: {str(e)}")
@@ -227,7 +252,7 @@ def update_business(id):
                 business.name = data['name'].strip()
             if 'email' in data:
                 try:
-                    validate_email(data['email'])
+                    check_email(data['email'])
                     business.email = data['email']
                 except EmailNotValidError as e:
                     return jsonify({"error": "invalid email format"}), 400
@@ -0,0 +1,34 @@
+from flask import Blueprint, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from ..models import db, InvoiceSummary
+from ..money import as_number
+from ..cache import cached_response
+from uuid import UUID
+
+dashboard = Blueprint('dashboard', __name__)
+
+@dashboard.route('/dashboard', methods=['GET'])
+@jwt_required()
+@cached_response(lambda user_id, **_: [f'issuer:{user_id}'])
+def dashboard_totals():
+    """
+    Returns the number of outstanding invoices of the current user and the
+    totals paid and unpaid, read from the user's invoice summary row.
+    """
+    user_id = UUID(get_jwt_identity())
+    
+    summary = db.session.get(InvoiceSummary, user_id)
+    if summary:
+        outstanding_invoices = summary.pending_count + summary.overdue_count + summary.cancelled_count
+        total_paid = as_number(summary.paid_total)
+        total_unpaid = as_number(summary.pending_total + summary.overdue_total + summary.cancelled_total)
+    else:
+        outstanding_invoices, total_paid, total_unpaid = 0, 0, 0
+    
+    response = jsonify({
+        "success": True,
+        "outstanding_invoices": outstanding_invoices,
+        "total_paid": total_paid,
+        "total_unpaid": total_unpaid
+    })
+    return response, 200
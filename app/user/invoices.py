@@ -1,13 +1,54 @@
 from flask import Blueprint, request, jsonify
-from ..models import db, Invoice, InvoiceItem, Business
+from ..models import db, Invoice, InvoiceItem, INVOICE_STATUSES
 from ..extensions import logger
+from ..money import as_number
+from ..validation import ValidationError, INVOICE_CREATE, INVOICE_UPDATE
+from ..serializers import invoice_listing, invoice_detail
+from ..pagination import PaginationError, parse_page_args, keyset_filter, keyset_page, wants_stream, stream_ndjson, NDJSON_MIMETYPE
+from ..bulk_invoices import BulkInvoiceError, read_documents, create_invoices
+from ..invoice_numbers import next_invoice_numbers
+from ..cache import cached_response, mark_stale
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime
+from sqlalchemy import delete, insert, update
 from sqlalchemy.exc import SQLAlchemyError
 import uuid
 
 invoices = Blueprint('invoices', __name__)
 
+def _invoice_listing(fields, criteria, empty_message, **listing):
+    """
+    Builds the response of an invoice listing endpoint.
+    Listings are keyset paginated on (date_issued, id), newest first, using the
+    `limit` and `cursor` query parameters. Clients can opt into an NDJSON stream
+    of the whole listing with ?stream=ndjson.
+    Args:
+        fields (list): invoice fields returned for each row
+        criteria (list): filter expressions selecting the invoices
+        empty_message (str): message returned when the first page is empty
+        **listing: passed on to invoice_listing
+    Returns:
+        tuple: A tuple containing a response and an HTTP status code.
+    """
+    try:
+        limit, cursor = parse_page_args(request.args)
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
+
+    query, serialize = invoice_listing(fields, *criteria, **listing)
+    if wants_stream(request):
+        return stream_ndjson(keyset_filter(query, Invoice.date_issued, Invoice.id, cursor), serialize), 200
+
+    page, next_cursor = keyset_page(query, Invoice.date_issued, Invoice.id, limit, cursor, sort_key='date_issued')
+    if not page and cursor is None:
+        return jsonify({"message": empty_message}), 404
+
+    return jsonify({
+        "success": True,
+        "invoices": [serialize(invoice) for invoice in page],
+        "next_cursor": next_cursor
+    }), 200
+
 @invoices.route('/api/v1/invoices/create', methods=['POST'])
 @jwt_required()
 def create_invoice():
@@ -17,107 +58,33 @@ def create_invoice():
         except ValueError:
             return jsonify({"error": "invalid user ID format"}), 400
 
-        data = request.get_json()
+        data = request.get_json(silent=True)
         if not data:
             return jsonify({"error": "no data provided"}), 400
 
-        required_fields = ['business_id', 'due_date', 'items']
-        if not all(field in data for field in required_fields):
-            return jsonify({"error": f"missing required fields: {', '.join(required_fields)}"}), 400
-
         try:
-            business_id = uuid.UUID(data['business_id'])
-        except ValueError:
-            return jsonify({"error": "invalid business ID format"}), 400
-
-        invoice_number = f"INV-{uuid.uuid4().hex[:8].upper()}"
-
-        try:
-            due_date = datetime.strptime(data['due_date'], '%d-%m-%Y')
-        except ValueError:
-            return jsonify({"error": "invalid date format. Use DD-MM-YYYY"}), 400
-        try:
-            new_invoice = Invoice(
-                invoice_number=invoice_number,
-                issuer_id=user_id,
-                business_id=business_id,
-                status='pending',
-                total_amount=0,
-                date_issued=datetime.now(),
-                due_date=due_date
-            )
-            db.session.add(new_invoice)
-            db.session.flush()
-        except SQLAlchemyError as e:
-            logger.error(f"failed to initialize invoice creation: {str(e)}")
-            db.session.rollback()
-            return jsonify({"message": "failed to initialize invoice creation"}), 400
-
-        total_amount = 0
-        invoice_items = []
-
-        items = data['items'] if isinstance(data['items'], list) else [data['items']]
-
-        for item in items:
-            if not isinstance(item, dict):
-                db.session.rollback()
-                return jsonify({"error": "invalid item format - must be an object"}), 400
-
-            required_item_fields = ['description', 'quantity', 'unit_price']
-            if not all(field in item for field in required_item_fields):
-                db.session.rollback()
-                missing = [f for f in required_item_fields if f not in item]
-                return jsonify({"error": f"missing required fields in item: {', '.join(missing)}"}), 400
-
-            if item['description'] is None or item['quantity'] is None or item['unit_price'] is None:
-                db.session.rollback()
-                return jsonify({"error": "description, quantity and unit_price cannot be null"}), 400
-
-            try:
-                try:
-                    quantity = int(str(item['quantity']).strip().replace(',', ''))
-                    if quantity <= 0:
-                        raise ValueError("quantity must be greater than 0")
-                except (ValueError, TypeError, AttributeError):
-                    raise ValueError(f"invalid quantity value: {item['quantity']}")
+            payload = INVOICE_CREATE.validate(data)
+        except ValidationError as e:
+            return jsonify({"error": "invalid invoice data", "errors": e.errors}), 400
 
-                try:
-                    unit_price = float(str(item['unit_price']).strip().replace(',', ''))
-                    if unit_price <= 0:
-                        raise ValueError("unit price must be greater than 0")
-                except (ValueError, TypeError, AttributeError):
-                    raise ValueError(f"invalid unit price value: {item['unit_price']}")
+        invoice_items = [InvoiceItem(**item) for item in payload['items']]
+        total_amount = sum(item['quantity'] * item['unit_price'] for item in payload['items'])
 
-                try:
-                    description = str(item['description']).strip()
-                    if not description:
-                        raise ValueError("description cannot be empty")
-                except (ValueError, TypeError, AttributeError):
-                    raise ValueError(f"invalid description value: {item['description']}")
-
-                sub_total = quantity * unit_price
-
-                logger.info(f"Processing item: description={description}, quantity={quantity}, unit_price={unit_price}, subtotal={sub_total}")
-
-            except ValueError as e:
-                db.session.rollback()
-                return jsonify({"error": "invalid item data"}), 400
-
-            invoice_item = InvoiceItem(
-                invoice_id=new_invoice.id,
-                description=description,
-                quantity=quantity,
-                unit_price=unit_price,
-                subtotal=sub_total
-            )
-            
-            invoice_items.append(invoice_item)
-            total_amount += sub_total
-        
-        new_invoice.total_amount = total_amount
+        invoice_number, payment_reference = next_invoice_numbers(user_id)[0]
+        new_invoice = Invoice(
+            invoice_number=invoice_number,
+            payment_reference=payment_reference,
+            issuer_id=user_id,
+            business_id=payload['business_id'],
+            status='pending',
+            total_amount=total_amount,
+            date_issued=datetime.now(),
+            due_date=payload['due_date'],
+            items=invoice_items
+        )
 
         try:
-            db.session.add_all(invoice_items)
+            db.session.add(new_invoice)
             db.session.commit()
 
             return jsonify({
@@ -125,7 +92,8 @@ def create_invoice():
                 "message": "invoice created successfully",
                 "invoice_id": str(new_invoice.id),
                 "invoice_number": invoice_number,
-                "total_amount": float(total_amount)
+                "payment_reference": payment_reference,
+                "total_amount": as_number(total_amount)
             }), 201
 
         except SQLAlchemyError as e:
@@ -138,8 +106,68 @@ def create_invoice():
         return jsonify({"message": "internal server error"}), 500
     
                   
+@invoices.route('/api/v1/invoices/bulk', methods=['POST'])
+@jwt_required()
+def create_invoices_bulk():
+    """
+    Create many invoices in one request.
+    The body is a JSON array of invoices in the create_invoice format, or one
+    invoice per line with Content-Type application/x-ndjson. All invoices are
+    validated first and the valid ones are inserted in a single transaction.
+    Returns:
+        tuple: A tuple containing a JSON response and an HTTP status code.
+            - 201 if every invoice was created, 207 if only some were, and 400
+              if none were. The body holds a result per submitted invoice:
+                {"index": int, "invoice_id": str, "invoice_number": str, "payment_reference": str,
+                 "total_amount": float}
+              or
+                {"index": int, "error": str, "errors": [{"loc": str, "message": str}, ...]}
+    """
+    try:
+        try:
+            user_id = uuid.UUID(get_jwt_identity())
+        except ValueError:
+            return jsonify({"error": "invalid user ID format"}), 400
+
+        try:
+            documents = read_documents(request, NDJSON_MIMETYPE)
+        except BulkInvoiceError as e:
+            return jsonify({"error": str(e)}), 400
+
+        try:
+            results = create_invoices(user_id, documents)
+        except SQLAlchemyError as e:
+            logger.error(f"failed to commit bulk invoice creation: {str(e)}")
+            return jsonify({"message": "failed to create invoices"}), 400
+
+        created = 0
+        for result in results:
+            if "invoice_id" in result:
+                created += 1
+                result["invoice_id"] = str(result["invoice_id"])
+                result["total_amount"] = as_number(result["total_amount"])
+
+        if created == len(results):
+            status_code = 201
+        elif created:
+            status_code = 207
+        else:
+            status_code = 400
+        return jsonify({
+            "success": created > 0,
+            "created": created,
+            "failed": len(results) - created,
+            "results": results
+        }), status_code
+
+    except Exception as e:
+        logger.error(f"endpoint error: {str(e)}")
+        return jsonify({"message": "internal server error"}), 500
+
+
 @invoices.route('/api/v1/invoices', methods=['GET'])
 @jwt_required()
+@cached_response(lambda user_id, **_: [f'issuer:{user_id}'])
 def get_user_invoices():
     """
     Retrieve invoices associated with the current user.
@@ -162,8 +190,11 @@ def get_user_invoices():
                             "status": str
                         },
                         ...
-                    ]
+                    ],
+                    "next_cursor": str or None
                 }
+              Pass next_cursor back as ?cursor= to fetch the next page, or
+              ?stream=ndjson to stream every invoice.
             - On failure (404):
                 {
                     "message": "no invoices found associated with your user id"
@@ -176,24 +207,11 @@ def get_user_invoices():
     try:
         user_id = uuid.UUID(get_jwt_identity())
         
-        user_invoices = Invoice.query.filter_by(issuer_id=user_id).all()
-        if not user_invoices:
-            return jsonify({"message": "no invoices found associated with your user id"}), 404
-        
-        invoices_list = [{
-            "id": str(invoice.id),
-            "invoice_number": invoice.invoice_number,
-            "recipient": invoice.business.name if invoice.business else None,
-            "amount": float(invoice.total_amount),
-            "date_issued": invoice.date_issued.isoformat(),
-            "due_date": invoice.due_date.isoformat(),
-            "status": invoice.status
-        } for invoice in user_invoices]
-        
-        return jsonify({
-            "success": True,
-            "invoices": invoices_list
-        }), 200
+        return _invoice_listing(
+            ["id", "invoice_number", "recipient", "amount", "date_issued", "due_date", "status"],
+            [Invoice.issuer_id == user_id],
+            "no invoices found associated with your user id"
+        )
         
     except Exception as e:
         logger.error(f"endpoint error: {str(e)}")
@@ -203,6 +221,7 @@ def get_user_invoices():
         
 @invoices.route('/api/v1/invoices/business/<uuid:business_id>', methods=['GET'])
 @jwt_required()
+@cached_response(lambda business_id, **_: [f'business:{business_id}'])
 def get_business_invoices(business_id):
     """
     Retrieve all invoices associated with a specific business.
@@ -229,24 +248,11 @@ def get_business_invoices(business_id):
         - status (str): The status of the invoice.
     """
     try:
-        business_invoices = Invoice.query.filter_by(business_id=business_id).all()
-        if not business_invoices:
-            return jsonify({"message": "no invoices found associated with this business"}), 404
-        
-        invoices_list = [{
-            "id": str(invoice.id),
-            "invoice_number": invoice.invoice_number,
-            "issuer": invoice.issuer.name if invoice.issuer else None,
-            "amount": float(invoice.total_amount),
-            "date_issued": invoice.date_issued.isoformat(),
-            "due_date": invoice.due_date.isoformat(),
-            "status": invoice.status
-        } for invoice in business_invoices]
-        
-        return jsonify({
-            "success": True,
-            "invoices": invoices_list
-        }), 200
+        return _invoice_listing(
+            ["id", "invoice_number", "issuer", "amount", "date_issued", "due_date", "status"],
+            [Invoice.business_id == business_id],
+            "no invoices found associated with this business"
+        )
         
     except Exception as e:
         logger.error(f"endpoint error: {str(e)}")
@@ -257,12 +263,13 @@ def get_business_invoices(business_id):
 
 @invoices.route('/api/v1/invoices/received', methods=['GET'])
 @jwt_required()
+@cached_response(lambda user_id, **_: [f'owner:{user_id}'])
 def get_received_invoices():
     """
-    Retrieves all invoices received by the authenticated user's businesses.
-    This function fetches all invoices where the user's businesses are recipients. It first gets all
-    businesses owned by the authenticated user, then finds all invoices where these businesses are
-    recipients.
+    Retrieves the invoices received by the authenticated user's businesses.
+    The invoices are selected by joining them to the businesses owned by the user, in a single
+    query. Listings are paginated like the other invoice listings and can be narrowed down to one
+    status with the `status` query parameter.
     Returns:
         tuple: A tuple containing:
             - A JSON response with:
@@ -279,38 +286,27 @@ def get_received_invoices():
             - HTTP status code (int)
     Raises:
         500: If there's any error during the process
-        404: If no businesses are associated with the user
+        400: If the status filter is invalid
+        404: If the user's businesses have not received any invoices
     Requires:
         JWT authentication token in the request
     """
     try:
         user_id = uuid.UUID(get_jwt_identity())
         
-        #retrieve all businesses related to the user
-        businesses = Business.query.filter_by(owner_id=user_id).all()
-        if not businesses:
-            return jsonify({"message": "no businesses associated with this user"}), 404
-        
-        business_ids = [business.id for business in businesses]
-        
-        invoices = Invoice.query.filter(Invoice.business_id.in_(business_ids)).all()
-        invoice_list = [{
-            "id": str(invoice.id),
-            "invoice_number": invoice.invoice_number,
-            "issuer": invoice.issuer.name if invoice.issuer else None,
-            "recipient": invoice.business.name if invoice.business else None,
-            "amount": float(invoice.total_amount),
-            "status": invoice.status,
-            "date_issued": invoice.date_issued.isoformat(),
-            "due_date": invoice.due_date.isoformat()
-        } for invoice in invoices]
-        
-        response = jsonify({
-            "success": True,
-            "invoices": invoice_list
-        })
-        
-        return response, 200
+        criteria = []
+        status = request.args.get('status')
+        if status:
+            if status not in INVOICE_STATUSES:
+                return jsonify({"error": f"invalid status. Must be one of: {', '.join(INVOICE_STATUSES)}"}), 400
+            criteria.append(Invoice.status == status)
+        
+        return _invoice_listing(
+            ["id", "invoice_number", "issuer", "recipient", "amount", "status", "date_issued", "due_date"],
+            criteria,
+            f"no {status} invoices received by your businesses" if status else "no invoices received by your businesses",
+            recipient_owner_id=user_id
+        )
     
     except Exception as e:
         logger.error(f"endpoint error: {str(e)}")
@@ -320,6 +316,7 @@ def get_received_invoices():
         
 @invoices.route('/api/v1/invoices/<uuid:invoice_id>', methods=['GET'])
 @jwt_required()
+@cached_response(lambda invoice_id, **_: [f'invoice:{invoice_id}'])
 def get_single_invoice(invoice_id):
     """
     Retrieve a single invoice by its ID.
@@ -336,8 +333,10 @@ def get_single_invoice(invoice_id):
                         "recipient": str or None,
                         "details": [
                             {
+                                "id": str,
                                 "service": str,
                                 "quantity": int,
+                                "unit_price": float,
                                 "subtotal": float
                             },
                             ...
@@ -353,26 +352,9 @@ def get_single_invoice(invoice_id):
         Exception: If there is an error retrieving the invoice or its items.
     """
     try:
-        invoice = Invoice.query.get_or_404(invoice_id)
-        
-        items = InvoiceItem.query.filter_by(invoice_id=invoice_id).all()
-        invoice_items = [{
-            "service": item.description,
-            "quantity": item.quantity,
-            "subtotal": float(item.subtotal)
-        } for item in items]
-        
-        invoice_details = {
-            "id": str(invoice_id),
-            "invoice_number": invoice.invoice_number,
-            "issuer": invoice.issuer.name if invoice.issuer else None,
-            "recipient": invoice.business.name if invoice.business else None,
-            "details": invoice_items,
-            "amount": float(invoice.total_amount),
-            "date_issued": invoice.date_issued.isoformat(),
-            "due_date": invoice.due_date.isoformat(),
-            "status": invoice.status
-        }
+        invoice_details = invoice_detail(invoice_id)
+        if invoice_details is None:
+            return jsonify({"error": "invoice not found"}), 404
         
         return jsonify({
             "success": True,
@@ -478,13 +460,19 @@ def cancel_invoice(invoice_id):
 def update_invoice(invoice_id):
     """
     Update the details of an invoice with the given ID.
+    Items carrying the `id` of one of the invoice's items update that item,
+    items without an `id` are added and existing items left out of the payload
+    are removed. Only items that actually changed are written, and the invoice
+    total is adjusted by the difference.
     Args:
         invoice_id (uuid): The ID of the invoice to be updated.
     Returns:
         Response: A JSON response indicating the success or failure of the update operation.
-            - On success: Returns a JSON response with a success message and HTTP status code 200.
+            - On success: Returns a JSON response with a success message, the new total and
+              the number of items added, updated and removed, with HTTP status code 200.
             - On failure: Returns a JSON response with an error message and appropriate HTTP status code.
                 - If the invoice is not found: Returns a 404 status code.
+                - If an item id does not belong to the invoice: Returns a 400 status code.
                 - If there is a database error: Returns a 400 status code.
                 - If there is an internal server error: Returns a 500 status code.
     Raises:
@@ -493,64 +481,73 @@ def update_invoice(invoice_id):
     try:
         user_id = uuid.UUID(get_jwt_identity())
         
-        invoice = Invoice.query.get_or_404(invoice_id)
+        # the row stays locked until commit, so concurrent updates read the
+        # items and total one after another and neither adjustment is lost
+        invoice = db.session.get(Invoice, invoice_id, with_for_update=True)
         if not invoice:
             return jsonify({"error": "invoice not found"}), 404
         
         if invoice.issuer_id != user_id:
             return jsonify({"error": "unauthorized access"}), 403
         
-        data = request.get_json()
+        data = request.get_json(silent=True)
         if not data or not data.get('items'):
             return jsonify({"error": "no data or no items provided"}), 400
         
         try:
-            InvoiceItem.query.filter_by(invoice_id=invoice_id).delete()
-            
-            total_amount = 0
-            items = data['items'] if isinstance(data['items'], list) else [data['items']]
-            
-            for item in items:
-                if not isinstance(item, dict):
-                    db.session.rollback()
-                    return jsonify({"error": "invalid item format - must be an object"}), 400
-
-                required_item_fields = ['description', 'quantity', 'unit_price']
-                if not all(field in item for field in required_item_fields):
-                    db.session.rollback()
-                    missing = [f for f in required_item_fields if f not in item]
-                    return jsonify({"error": f"missing required fields in item: {', '.join(missing)}"}), 400
-                
-                description = str(item['description']).strip()
-                quantity = int(str(item['quantity']).strip().replace(',', ''))
-                unit_price = float(str(item['unit_price']).strip().replace(',', ''))
-                sub_total = quantity * unit_price
-                
-                invoice_item = InvoiceItem(
-                    invoice_id=invoice_id,
-                    description=description,
-                    quantity=quantity,
-                    unit_price=unit_price,
-                    subtotal=sub_total
-                )
-                
-                db.session.add(invoice_item)
-                total_amount += sub_total
+            payload = INVOICE_UPDATE.validate(data)
+        except ValidationError as e:
+            return jsonify({"error": "invalid invoice data", "errors": e.errors}), 400
+        due_date = payload.get('due_date')
+        
+        existing = {
+            row.id: row for row in db.session.query(
+                InvoiceItem.id, InvoiceItem.description, InvoiceItem.quantity, InvoiceItem.unit_price
+            ).filter(InvoiceItem.invoice_id == invoice_id)
+        }
+        
+        inserts, updates, kept = [], [], set()
+        total_amount = invoice.total_amount
+        for item in payload['items']:
+            item_id, description, quantity, unit_price = (
+                item.get('id'), item['description'], item['quantity'], item['unit_price'])
+            if item_id is None:
+                inserts.append({"invoice_id": invoice_id, "description": description,
+                                "quantity": quantity, "unit_price": unit_price})
+                total_amount += quantity * unit_price
+                continue
+            current = existing.get(item_id)
+            if current is None or item_id in kept:
+                return jsonify({"error": f"item {item_id} does not belong to this invoice"}), 400
+            kept.add(item_id)
+            if (current.description, current.quantity, current.unit_price) != (description, quantity, unit_price):
+                updates.append({"id": item_id, "description": description,
+                                "quantity": quantity, "unit_price": unit_price})
+                total_amount += quantity * unit_price - current.quantity * current.unit_price
+        
+        removed = [item_id for item_id in existing if item_id not in kept]
+        total_amount -= sum(existing[item_id].quantity * existing[item_id].unit_price for item_id in removed)
+        
+        try:
+            if removed:
+                db.session.execute(delete(InvoiceItem).where(InvoiceItem.id.in_(removed)))
+            if updates:
+                db.session.execute(update(InvoiceItem), updates)
+            if inserts:
+                db.session.execute(insert(InvoiceItem), inserts)
+            if removed or updates or inserts:
+                mark_stale(f'invoice:{invoice_id}')
             
             invoice.total_amount = total_amount
-            
-            if 'due_date' in data:
-                try:
-                    invoice.due_date = datetime.strptime(data['due_date'], '%d-%m-%Y')
-                except ValueError:
-                    return jsonify({"error": "invalid date format. Use DD-MM-YYYY"}), 400
-            
+            if due_date is not None:
+                invoice.due_date = due_date
                 
             db.session.commit()
             return jsonify({
                 "success": True,
                 "message": "invoice has been updated",
-                "total_amount": float(total_amount)
+                "total_amount": as_number(total_amount),
+                "items": {"added": len(inserts), "updated": len(updates), "removed": len(removed)}
             }), 200
             
         except SQLAlchemyError as e:
@@ -568,6 +565,7 @@ def update_invoice(invoice_id):
  
 @invoices.route('/api/v1/invoices/status/<string:status>', methods=['GET'])
 @jwt_required()
+@cached_response(lambda user_id, **_: [f'issuer:{user_id}'])
 def get_invoice_by_status(status: str):
     """
     Retrieve invoices by their status for the current authenticated user.
@@ -588,24 +586,11 @@ def get_invoice_by_status(status: str):
         if status not in valid_statuses:
             return jsonify({"error": f"invalid status. Must be one of: {', '.join(valid_statuses)}"}), 400
         
-        invoices = Invoice.query.filter_by(status=status, issuer_id=user_id).all()
-        
-        if not invoices:
-            return jsonify({"message": f"no {status} invoices available"}), 404
-        
-        invoices_list = [{
-            "id": str(invoice.id),
-            "invoice_number": invoice.invoice_number,
-            "recipient": invoice.business.name if invoice.business else None,
-            "amount": float(invoice.total_amount),
-            "date_issued": invoice.date_issued.isoformat(),
-            "due_date": invoice.due_date.isoformat()
-        } for invoice in invoices]
-        
-        return jsonify({
-            "success": True,
-            "invoices": invoices_list
-        }), 200
+        return _invoice_listing(
+            ["id", "invoice_number", "recipient", "amount", "date_issued", "due_date"],
+            [Invoice.status == status, Invoice.issuer_id == user_id],
+            f"no {status} invoices available"
+        )
         
     except Exception as e:
         logger.error(f"endpoint error: {str(e)}")
@@ -615,6 +600,7 @@ def get_invoice_by_status(status: str):
         
 @invoices.route('/api/v1/invoices/business/<uuid:business_id>/status/<string:status>', methods=['GET'])
 @jwt_required()
+@cached_response(lambda business_id, **_: [f'business:{business_id}'])
 def get_business_invoices_by_status(business_id, status: str):
     """
     Retrieve invoices for a specific business based on their status.
@@ -637,23 +623,11 @@ def get_business_invoices_by_status(business_id, status: str):
         if status not in valid_statuses:
             return jsonify({"error": f"invalid status. Must be one of: {', '.join(valid_statuses)}"}), 400
             
-        invoices = Invoice.query.filter_by(status=status, business_id=business_id).all()
-        if not invoices:
-            return jsonify({"message": f"no {status} invoices found for this business"}), 404
-        
-        invoices_list = [{
-            "id": str(invoice.id),
-            "invoice_number": invoice.invoice_number,
-            "issuer": invoice.issuer.name if invoice.issuer else None,
-            "amount": float(invoice.total_amount),
-            "date_issued": invoice.date_issued.isoformat(),
-            "due_date": invoice.due_date.isoformat()
-        } for invoice in invoices]
-        
-        return jsonify({
-            "success": True,
-            "invoices": invoices_list
-        }), 200
+        return _invoice_listing(
+            ["id", "invoice_number", "issuer", "amount", "date_issued", "due_date"],
+            [Invoice.status == status, Invoice.business_id == business_id],
+            f"no {status} invoices found for this business"
+        )
         
     except Exception as e:
         logger.error(f"endpoint error: {str(e)}")
@@ -1,12 +1,16 @@
 from flask import Blueprint, jsonify, request
-from ..models import db, Payment, User
+from ..models import Payment
+from ..serializers import payment_listing
+from ..cache import cached_response
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..extensions import logger
+from uuid import UUID
 
 payments = Blueprint('payments', __name__)
 
 @payments.route('/api/v1/payments/', methods=['GET'])
 @jwt_required()
+@cached_response(lambda user_id, **_: [f'payer:{user_id}'])
 def get_payments():
     """
     Retrieve the list of payments made by the current user.
@@ -22,21 +26,14 @@ def get_payments():
             - error (str): The error message in case of an exception.
     """
     try:
-        user_id = get_jwt_identity()
+        user_id = UUID(get_jwt_identity())
         
-        payments = Payment.query.filter_by(payer_id=user_id).all()
+        query, serialize = payment_listing(Payment.payer_id == user_id)
+        payments = query.order_by(Payment.payment_date.desc()).all()
         if not payments:
             return jsonify({"error": "no payments have been made by this user"}), 400
         
-        payment_list = [{
-            "id": payment.id,
-            "amount": float(payment.amount),
-            "payment_method": payment.payment_method,
-            "transaction_code": payment.transaction_code,
-            "payer": payment.payer.name if payment.payer else None,
-            "payment_date": payment.payment_date.isoformat(),
-            "invoice_id": payment.invoice_id,
-        } for payment in payments]
+        payment_list = [serialize(payment) for payment in payments]
         
         return jsonify({
             "success": True,
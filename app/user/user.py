@@ -1,7 +1,8 @@
 from flask import Blueprint, request, jsonify, session
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from ..extensions import logger
-from email_validator import validate_email, EmailNotValidError
+from email_validator import EmailNotValidError
+from ..email_checks import check_email
 from ..models import db, User
 from sqlalchemy.exc import SQLAlchemyError
 from uuid import UUID
@@ -71,7 +72,7 @@ def update_user():
             if 'email' in data:
                 try:
                     email = data['email']
-                    validate_email(email)
+                    check_email(email)
                     user.email = email
                 except EmailNotValidError:
                     return jsonify({"Error": "invalid email"}), 400
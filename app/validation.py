@@ -0,0 +1,190 @@
+import uuid
+from datetime import datetime
+from .money import MoneyError, parse_cents
+
+# Request payload validation. A schema is compiled once, at import, into a
+# tuple of per field checkers, so validating a payload is a single pass over
+# its fields and items. Every problem is collected with its location in the
+# payload (e.g. "items[3].unit_price") instead of stopping at the first one.
+
+DATE_FORMAT = '%d-%m-%Y'
+
+_INVALID = object()
+
+
+class ValidationError(ValueError):
+    """
+    Raised when a payload does not match its schema.
+
+    Attributes:
+        errors (list): {"loc": str, "message": str} for every problem found
+    """
+
+    def __init__(self, errors):
+        first = errors[0]
+        super().__init__(f"{first['loc']}: {first['message']}" if first['loc'] else first['message'])
+        self.errors = errors
+
+
+# field parsers: take the raw value, return the parsed one or raise ValueError
+
+def text(value):
+    value = str(value).strip()
+    if not value:
+        raise ValueError("cannot be empty")
+    return value
+
+
+def positive_int(value):
+    if isinstance(value, bool):
+        raise ValueError(f"invalid integer: {value}")
+    if not isinstance(value, int):
+        try:
+            value = int(str(value).strip().replace(',', ''))
+        except ValueError:
+            raise ValueError(f"invalid integer: {value}")
+    if value <= 0:
+        raise ValueError("must be greater than 0")
+    return value
+
+
+def positive_cents(value):
+    try:
+        cents = parse_cents(value)
+    except MoneyError as e:
+        raise ValueError(str(e))
+    if cents <= 0:
+        raise ValueError("must be greater than 0")
+    return cents
+
+
+def uuid_value(value):
+    if isinstance(value, uuid.UUID):
+        return value
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        raise ValueError(f"invalid id: {value}")
+
+
+def date_value(value):
+    try:
+        return datetime.strptime(str(value), DATE_FORMAT)
+    except ValueError:
+        raise ValueError("invalid date format. Use DD-MM-YYYY")
+
+
+class optional:
+    """Marks a schema field as optional."""
+
+    def __init__(self, parse):
+        self.parse = parse
+
+
+def _path(parent, name):
+    return f"{parent}.{name}" if parent else name
+
+
+def _compile(parse):
+    """Turns a parser, Schema or ListOf into a check(value, loc, errors) callable."""
+    if isinstance(parse, (Schema, ListOf)):
+        return parse.check
+
+    def check(value, loc, errors):
+        try:
+            return parse(value)
+        except (ValueError, TypeError) as e:
+            errors.append({"loc": loc, "message": str(e)})
+            return _INVALID
+    return check
+
+
+class Schema:
+    """
+    An object with named fields.
+
+    Args:
+        fields (dict): field name to a parser, a nested Schema or ListOf, or
+                       optional(...) of one of those
+    """
+
+    def __init__(self, fields):
+        compiled = []
+        for name, parse in fields.items():
+            required = not isinstance(parse, optional)
+            compiled.append((name, _compile(parse if required else parse.parse), required))
+        self.fields = tuple(compiled)
+
+    def check(self, data, loc, errors):
+        if not isinstance(data, dict):
+            errors.append({"loc": loc, "message": "must be an object"})
+            return _INVALID
+        result = {}
+        for name, check, required in self.fields:
+            value = data.get(name)
+            if value is None:
+                if required:
+                    errors.append({"loc": _path(loc, name), "message": "is required"})
+                continue
+            result[name] = check(value, _path(loc, name), errors)
+        return result
+
+    def validate(self, data):
+        """
+        Returns:
+            dict: the parsed fields; optional fields that were not given are left out
+
+        Raises:
+            ValidationError: listing every problem in the payload
+        """
+        errors = []
+        result = self.check(data, '', errors)
+        if errors:
+            raise ValidationError(errors)
+        return result
+
+
+class ListOf:
+    """
+    A list of values of one schema. A single object is accepted as a list of one.
+
+    Args:
+        schema: parser or Schema of the elements
+        min_items (int): fewest elements allowed
+    """
+
+    def __init__(self, schema, min_items=0):
+        self.element = _compile(schema)
+        self.min_items = min_items
+
+    def check(self, values, loc, errors):
+        if not isinstance(values, list):
+            values = [values]
+        if len(values) < self.min_items:
+            errors.append({"loc": loc, "message": f"needs at least {self.min_items} item(s)"})
+            return _INVALID
+        element = self.element
+        return [element(value, f"{loc}[{index}]", errors) for index, value in enumerate(values)]
+
+
+INVOICE_ITEM = Schema({
+    "description": text,
+    "quantity": positive_int,
+    "unit_price": positive_cents,
+})
+
+INVOICE_CREATE = Schema({
+    "business_id": uuid_value,
+    "due_date": date_value,
+    "items": ListOf(INVOICE_ITEM, min_items=1),
+})
+
+INVOICE_UPDATE = Schema({
+    "due_date": optional(date_value),
+    "items": ListOf(Schema({
+        "id": optional(uuid_value),
+        "description": text,
+        "quantity": positive_int,
+        "unit_price": positive_cents,
+    }), min_items=1),
+})
@@ -0,0 +1,34 @@
+"""
+Compares creating invoices one request at a time with one bulk request.
+
+    python -m benchmarks.bulk_invoices [invoices]
+"""
+import sys
+from flask_jwt_extended import create_access_token
+from .common import bench_app, issuer_and_business, timed
+
+
+def documents(business_id, count):
+    return [{"business_id": str(business_id), "due_date": '31-01-2030',
+             "items": [{"description": f'line {line}', "quantity": 2, "unit_price": '12.50'} for line in range(3)]}
+            for _ in range(count)]
+
+
+def main(count=2000):
+    with bench_app() as app:
+        issuer, business = issuer_and_business()
+        client = app.test_client()
+        headers = {"Authorization": f"Bearer {create_access_token(identity=str(issuer.id))}"}
+        singles = max(count // 10, 1)
+
+        with timed('POST /api/v1/invoices/create', singles, 'invoices'):
+            for document in documents(business.id, singles):
+                assert client.post('/api/v1/invoices/create', json=document, headers=headers).status_code == 201
+
+        with timed('POST /api/v1/invoices/bulk', count, 'invoices'):
+            response = client.post('/api/v1/invoices/bulk', json=documents(business.id, count), headers=headers)
+        assert response.status_code == 201, response.get_json()
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
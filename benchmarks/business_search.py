@@ -0,0 +1,58 @@
+"""
+Times typeahead searches over a large businesses table through the search
+index, against the LIKE '%name%' scan it replaced. The index is the FTS5
+table on sqlite and the pg_trgm GIN index on postgres.
+
+Queries are timed in two groups. Common words match a large share of the
+table: LIKE stops after the first page of matches in name order, while
+ranking has to score every match. Selective queries and misses are where
+LIKE scans the whole table.
+
+    python -m benchmarks.business_search [businesses] [queries]
+"""
+import random
+import sys
+from app.models import db, uuid7, Business, User
+from app.search import _like_search, search_businesses
+from .common import bench_app, timed
+
+BATCH_SIZE = 10_000
+WORDS = ['mama', 'mboga', 'kiosk', 'nairobi', 'hardware', 'traders', 'supplies', 'pharmacy', 'salon', 'garage',
+         'bakery', 'butchery', 'electronics', 'agrovet', 'mombasa', 'kisumu', 'nakuru', 'eldoret', 'wholesale',
+         'textiles', 'motors', 'logistics', 'studio', 'clinic', 'academy', 'farm', 'dairy', 'hotel', 'cafe']
+# what a user has typed after a few keystrokes
+QUERIES = {
+    'common words': ['ma', 'kio', 'pharm', 'agro', 'whole', 'dai'],
+    'selective': ['nairobi hard', 'kisumu ba', 'salon 12', 'garage mot', '99999', 'hardwre', 'zzz'],
+}
+
+
+def fill(count):
+    owner = User(name='owner', email='owner@invotrack.test', phone_number='0700000001', password_hash='x')
+    db.session.add(owner)
+    db.session.commit()
+    rng = random.Random(7)
+    for start in range(0, count, BATCH_SIZE):
+        db.session.execute(Business.__table__.insert(), [
+            {"id": uuid7(), "owner_id": owner.id, "phone_number": '0712345678', "email": 'shop@invotrack.test',
+             "name": f"{' '.join(rng.sample(WORDS, 3)).title()} {n}"}
+            for n in range(start, min(start + BATCH_SIZE, count))
+        ])
+        db.session.commit()
+
+
+def main(count=1_000_000, queries=200):
+    with bench_app():
+        with timed('insert businesses', count):
+            fill(count)
+
+        for group, typed in QUERIES.items():
+            typed = [typed[n % len(typed)] for n in range(queries)]
+            for label, search in (('indexed search', search_businesses), ('LIKE scan', _like_search)):
+                with timed(f'{group}, {label}', queries, 'queries'):
+                    for query in typed:
+                        search(query, 20)
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
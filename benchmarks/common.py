@@ -0,0 +1,62 @@
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+# Benchmarks run against BENCH_DATABASE_URI, or a throwaway sqlite file when
+# it is not set. The tables are created from the models and dropped again.
+
+os.environ.setdefault('CLIENT_SECRETS', json.dumps({
+    "web": {
+        "client_id": "bench-client",
+        "client_secret": "bench-secret",
+        "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+        "token_uri": "https://oauth2.googleapis.com/token",
+    }
+}))
+
+from app import create_app
+from app.models import db, Business, User
+
+
+@contextmanager
+def bench_app():
+    """Yields an app, inside its app context, on a freshly created schema."""
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_app({
+            "SQLALCHEMY_DATABASE_URI": os.getenv('BENCH_DATABASE_URI') or f"sqlite:///{directory}/bench.db",
+            "SECRET_KEY": "benchmark-secret-key-that-is-long-enough",
+            "SCHEDULER_AUTOSTART": False,
+            "METRICS_LOG_SECONDS": 0,
+        })
+        with app.app_context():
+            db.create_all()
+            try:
+                yield app
+            finally:
+                db.session.remove()
+                db.drop_all()
+                db.engine.dispose()
+
+
+def issuer_and_business():
+    """Creates an issuing user and a business owned by another user."""
+    issuer = User(name='issuer', email='issuer@invotrack.test', phone_number='0700000001', password_hash='x')
+    owner = User(name='owner', email='owner@invotrack.test', phone_number='0700000002', password_hash='x')
+    db.session.add_all([issuer, owner])
+    db.session.flush()
+    business = Business(owner_id=owner.id, name='Bench Traders', phone_number='0712345678',
+                        email='bench@invotrack.test')
+    db.session.add(business)
+    db.session.commit()
+    return issuer, business
+
+
+@contextmanager
+def timed(label, count, unit='rows'):
+    """Prints how long the block took and its throughput."""
+    started = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - started
+    print(f"{label}: {count} {unit} in {elapsed:.2f}s ({count / elapsed:,.0f} {unit}/s)")
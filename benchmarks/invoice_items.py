@@ -0,0 +1,81 @@
+"""
+Times constructing and loading invoice items with the database generated
+subtotal, against a copy of the model as it was when a __setattr__ hook
+kept the subtotal up to date in Python. Loading fills instances without
+going through __setattr__, so the hook only ever cost on construction.
+
+    python -m benchmarks.invoice_items [items]
+"""
+import sys
+from datetime import datetime
+from sqlalchemy import BigInteger, Column, Integer, Text
+from sqlalchemy.orm import declarative_base
+from app.models import db, uuid7, Invoice, InvoiceItem
+from .common import bench_app, issuer_and_business, timed
+
+Legacy = declarative_base()
+
+
+class LegacyInvoiceItem(Legacy):
+    """invoice_items before the subtotal was generated, hook included."""
+    __tablename__ = 'bench_legacy_invoice_items'
+
+    id = Column(db.Uuid, primary_key=True, default=uuid7)
+    invoice_id = Column(db.Uuid, nullable=False)
+    description = Column(Text, nullable=False)
+    quantity = Column(Integer, default=1, nullable=False)
+    unit_price = Column(BigInteger, nullable=False)
+    subtotal = Column(BigInteger, nullable=False)
+
+    def calculate_sub_total(self):
+        if self.unit_price is not None and self.quantity is not None:
+            self.subtotal = self.unit_price * self.quantity
+            return self.subtotal
+        return None
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name in {'quantity', 'unit_price'} and name != 'subtotal':
+            if hasattr(self, 'quantity') and hasattr(self, 'unit_price'):
+                if self.quantity is not None and self.unit_price is not None:
+                    self.calculate_sub_total()
+
+
+def construct(model, invoice_id, count):
+    return [model(invoice_id=invoice_id, description=f'line {n}', quantity=n % 7 + 1, unit_price=1250)
+            for n in range(count)]
+
+
+def measure(label, model, invoice_id, count):
+    with timed(f'{label} construct', count, 'items'):
+        items = construct(model, invoice_id, count)
+    db.session.add_all(items)
+    db.session.commit()
+    db.session.expunge_all()
+
+    with timed(f'{label} load', count, 'items'):
+        loaded = db.session.query(model).all()
+    assert len(loaded) == count
+    db.session.expunge_all()
+
+
+def main(count=100_000):
+    with bench_app():
+        issuer, business = issuer_and_business()
+        invoice = Invoice(invoice_number='BENCH-1', payment_reference='BENCH1', issuer_id=issuer.id,
+                          business_id=business.id, total_amount=0, due_date=datetime(2030, 1, 31))
+        db.session.add(invoice)
+        db.session.commit()
+        invoice_id = invoice.id
+
+        Legacy.metadata.create_all(db.engine)
+        try:
+            measure('__setattr__ hook', LegacyInvoiceItem, invoice_id, count)
+            measure('generated column', InvoiceItem, invoice_id, count)
+        finally:
+            db.session.remove()
+            Legacy.metadata.drop_all(db.engine)
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,45 @@
+"""
+Compares insert throughput into a table keyed by uuid4 with one keyed by
+uuid7 as the table grows. Each key kind gets its own table and the rate of
+every slice of inserts is printed, so the slowdown of random keys once the
+index outgrows the cache shows up in the later slices.
+
+    python -m benchmarks.uuid_keys [rows] [slices]
+"""
+import sys
+import uuid
+from sqlalchemy import Column, MetaData, String, Table
+from sqlalchemy.dialects.postgresql import UUID
+from app.models import db, uuid7
+from .common import bench_app, timed
+
+BATCH_SIZE = 10_000
+
+
+def insert_rows(table, generate, rows, slices):
+    per_slice = rows // slices
+    for n in range(slices):
+        with timed(f'{table.name} rows {n * per_slice:,}-{(n + 1) * per_slice:,}', per_slice):
+            for _ in range(per_slice // BATCH_SIZE):
+                db.session.execute(table.insert(),
+                                   [{"id": generate(), "payload": 'x' * 64} for _ in range(BATCH_SIZE)])
+                db.session.commit()
+
+
+def main(rows=2_000_000, slices=4):
+    with bench_app():
+        metadata = MetaData()
+        tables = [(Table(f'bench_{generate.__name__}', metadata,
+                         Column('id', UUID(as_uuid=True), primary_key=True),
+                         Column('payload', String(64), nullable=False)), generate)
+                  for generate in (uuid.uuid4, uuid7)]
+        metadata.create_all(db.engine)
+        try:
+            for table, generate in tables:
+                insert_rows(table, generate, rows, slices)
+        finally:
+            metadata.drop_all(db.engine)
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
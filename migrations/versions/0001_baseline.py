@@ -0,0 +1,114 @@
+"""baseline schema
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-17 20:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_baseline'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('users',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('name', sa.String(length=255), nullable=False),
+        sa.Column('email', sa.String(length=255), nullable=False),
+        sa.Column('phone_number', sa.String(length=10), nullable=False),
+        sa.Column('password_hash', sa.String(length=255), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email', name='users_email_key'),
+        sa.UniqueConstraint('phone_number', name='users_phone_number_key')
+    )
+    op.create_table('businesses',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('owner_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('name', sa.String(length=255), nullable=False),
+        sa.Column('phone_number', sa.String(length=10), nullable=False),
+        sa.Column('email', sa.String(), nullable=False),
+        sa.ForeignKeyConstraint(['owner_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name', name='businesses_name_key')
+    )
+    op.create_table('invoices',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('invoice_number', sa.String(length=50), nullable=False),
+        sa.Column('issuer_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('business_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('status', sa.Enum('pending', 'overdue', 'cancelled', 'paid', name='invoice_status'), nullable=True),
+        sa.Column('total_amount', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('date_issued', sa.DateTime(), nullable=True),
+        sa.Column('due_date', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['business_id'], ['businesses.id']),
+        sa.ForeignKeyConstraint(['issuer_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('invoice_number', name='invoices_invoice_number_key')
+    )
+    op.create_table('invoice_items',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('invoice_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('description', sa.Text(), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('unit_price', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('subtotal', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.ForeignKeyConstraint(['invoice_id'], ['invoices.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('payments',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('invoice_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('payer_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('payment_method', sa.Enum('credit_card', 'bank_transfer', 'paypal', 'mpesa', name='payment_methods'), nullable=True),
+        sa.Column('transaction_code', sa.String(length=255), nullable=False),
+        sa.Column('amount', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column('payment_date', sa.DateTime(), nullable=True),
+        sa.Column('status', sa.Enum('successful', 'failed', 'pending', name='payment_status'), nullable=True),
+        sa.ForeignKeyConstraint(['invoice_id'], ['invoices.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['payer_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('transaction_code', name='payments_transaction_code_key')
+    )
+    op.create_table('transaction_history',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('invoice_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('payment_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('action', sa.Text(), nullable=False),
+        sa.Column('timestamp', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['invoice_id'], ['invoices.id']),
+        sa.ForeignKeyConstraint(['payment_id'], ['payments.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('transaction_history')
+    op.drop_table('payments')
+    op.drop_table('invoice_items')
+    op.drop_table('invoices')
+    op.drop_table('businesses')
+    op.drop_table('users')
+    sa.Enum(name='payment_status').drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name='payment_methods').drop(op.get_bind(), checkfirst=True)
+    sa.Enum(name='invoice_status').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,47 @@
+"""invoice summaries
+
+Adds invoice_summaries, the per issuer invoice counts and totals by status
+the dashboard reads, and fills it from the invoices.
+
+Revision ID: 0002_invoice_summaries
+Revises: 0001_baseline
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_invoice_summaries'
+down_revision = '0001_baseline'
+branch_labels = None
+depends_on = None
+
+INVOICE_STATUSES = ('pending', 'overdue', 'cancelled', 'paid')
+
+
+def upgrade():
+    summaries = op.create_table('invoice_summaries',
+        sa.Column('issuer_id', postgresql.UUID(as_uuid=True), nullable=False),
+        *[column
+          for status in INVOICE_STATUSES
+          for column in (sa.Column(f'{status}_count', sa.Integer(), nullable=False),
+                         sa.Column(f'{status}_total', sa.Numeric(precision=14, scale=2), nullable=False))],
+        sa.ForeignKeyConstraint(['issuer_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('issuer_id')
+    )
+    invoices = sa.table('invoices', sa.column('issuer_id'), sa.column('status'), sa.column('total_amount'))
+    columns = [invoices.c.issuer_id]
+    for status in INVOICE_STATUSES:
+        columns.append(sa.func.coalesce(sa.func.sum(sa.case((invoices.c.status == status, 1), else_=0)), 0))
+        columns.append(sa.func.coalesce(sa.func.sum(sa.case((invoices.c.status == status, invoices.c.total_amount), else_=0)), 0))
+    op.execute(summaries.insert().from_select(
+        [column.name for column in summaries.columns],
+        sa.select(*columns).group_by(invoices.c.issuer_id)
+    ))
+
+
+def downgrade():
+    op.drop_table('invoice_summaries')
@@ -0,0 +1,29 @@
+"""partial index on the due dates of pending invoices
+
+The overdue sweep selects pending invoices by due date in chunks; the index
+only holds pending rows, so it stays small as invoices are paid.
+
+Revision ID: 0003_pending_due_date_index
+Revises: 0002_invoice_summaries
+Create Date: 2026-10-18 09:01:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_pending_due_date_index'
+down_revision = '0002_invoice_summaries'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_invoices_pending_due_date', 'invoices', ['due_date'],
+                    postgresql_where=sa.text("status = 'pending'"),
+                    sqlite_where=sa.text("status = 'pending'"))
+
+
+def downgrade():
+    op.drop_index('ix_invoices_pending_due_date', table_name='invoices')
@@ -0,0 +1,50 @@
+"""email outbox
+
+Adds the outbox table: reminder mail is queued in the same transaction as
+the invoice change that causes it, and delivered by the outbox worker.
+
+Revision ID: 0004_outbox
+Revises: 0003_pending_due_date_index
+Create Date: 2026-10-18 09:02:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_outbox'
+down_revision = '0003_pending_due_date_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('outbox',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('dedup_key', sa.String(length=255), nullable=False),
+        sa.Column('kind', sa.String(length=50), nullable=False),
+        sa.Column('invoice_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('recipient', sa.String(length=255), nullable=False),
+        sa.Column('subject', sa.String(length=255), nullable=False),
+        sa.Column('body', sa.Text(), nullable=False),
+        sa.Column('status', sa.Enum('pending', 'sending', 'sent', 'failed', name='outbox_status'), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('leased_until', sa.DateTime(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['invoice_id'], ['invoices.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('dedup_key', name='outbox_dedup_key_key')
+    )
+    op.create_index('ix_outbox_status_next_attempt_at', 'outbox', ['status', 'next_attempt_at'])
+
+
+def downgrade():
+    op.drop_index('ix_outbox_status_next_attempt_at', table_name='outbox')
+    op.drop_table('outbox')
+    sa.Enum(name='outbox_status').drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,47 @@
+"""stored M-Pesa callbacks
+
+Adds mpesa_callbacks: STK push callbacks are stored as received and applied
+by the callback worker. The unique checkout request id makes a redelivered
+callback a no-op.
+
+Revision ID: 0005_mpesa_callbacks
+Revises: 0004_outbox
+Create Date: 2026-10-18 09:03:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_mpesa_callbacks'
+down_revision = '0004_outbox'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('mpesa_callbacks',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('checkout_request_id', sa.String(length=100), nullable=True),
+        sa.Column('invoice_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('status', sa.Enum('pending', 'processing', 'processed', 'failed', name='callback_status'), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('leased_until', sa.DateTime(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('processed_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['invoice_id'], ['invoices.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('checkout_request_id', name='mpesa_callbacks_checkout_request_id_key')
+    )
+    op.create_index('ix_mpesa_callbacks_status_created_at', 'mpesa_callbacks', ['status', 'created_at'])
+
+
+def downgrade():
+    op.drop_index('ix_mpesa_callbacks_status_created_at', table_name='mpesa_callbacks')
+    op.drop_table('mpesa_callbacks')
+    sa.Enum(name='callback_status').drop(op.get_bind(), checkfirst=True)
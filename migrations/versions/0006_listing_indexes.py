@@ -0,0 +1,45 @@
+"""listing indexes
+
+Indexes the columns the listings filter and sort on: invoices by issuer or
+business (optionally by status) in date order, items and payments by
+invoice, payments by payer and businesses by owner.
+
+Revision ID: 0006_listing_indexes
+Revises: 0005_mpesa_callbacks
+Create Date: 2026-10-17 20:31:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_listing_indexes'
+down_revision = '0005_mpesa_callbacks'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_businesses_owner_id', 'businesses', ['owner_id'])
+
+    op.create_index('ix_invoices_issuer_date_issued', 'invoices', ['issuer_id', 'date_issued', 'id'])
+    op.create_index('ix_invoices_issuer_status_date_issued', 'invoices', ['issuer_id', 'status', 'date_issued', 'id'])
+    op.create_index('ix_invoices_business_date_issued', 'invoices', ['business_id', 'date_issued', 'id'])
+    op.create_index('ix_invoices_business_status_date_issued', 'invoices', ['business_id', 'status', 'date_issued', 'id'])
+
+    op.create_index('ix_invoice_items_invoice_id', 'invoice_items', ['invoice_id'])
+    op.create_index('ix_payments_payer_payment_date', 'payments', ['payer_id', 'payment_date'])
+    op.create_index('ix_payments_invoice_id', 'payments', ['invoice_id'])
+
+
+def downgrade():
+    op.drop_index('ix_payments_invoice_id', table_name='payments')
+    op.drop_index('ix_payments_payer_payment_date', table_name='payments')
+    op.drop_index('ix_invoice_items_invoice_id', table_name='invoice_items')
+
+    op.drop_index('ix_invoices_business_status_date_issued', table_name='invoices')
+    op.drop_index('ix_invoices_business_date_issued', table_name='invoices')
+    op.drop_index('ix_invoices_issuer_status_date_issued', table_name='invoices')
+    op.drop_index('ix_invoices_issuer_date_issued', table_name='invoices')
+
+    op.drop_index('ix_businesses_owner_id', table_name='businesses')
@@ -0,0 +1,91 @@
+"""money columns hold integer cents
+
+Converts every money column from NUMERIC shillings to BIGINT cents,
+rounding to the nearest cent: 1250.50 becomes 125050. The models store
+cents (see app/money.py), so on a database left on NUMERIC every amount
+reads a hundred times too small.
+
+Revision ID: 0007_money_in_cents
+Revises: 0006_listing_indexes
+Create Date: 2026-10-17 20:32:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_money_in_cents'
+down_revision = '0006_listing_indexes'
+branch_labels = None
+depends_on = None
+
+
+def _uuid(name, *args, **kwargs):
+    return sa.Column(name, postgresql.UUID(as_uuid=True), *args, **kwargs)
+
+
+# table -> (money columns, their NUMERIC type, UUID columns to keep when sqlite rebuilds the table)
+MONEY_COLUMNS = {
+    'invoices': (
+        ('total_amount',),
+        sa.Numeric(precision=10, scale=2),
+        lambda: [
+            _uuid('id', primary_key=True),
+            _uuid('issuer_id', sa.ForeignKey('users.id'), nullable=False),
+            _uuid('business_id', sa.ForeignKey('businesses.id'), nullable=False),
+        ],
+    ),
+    'invoice_items': (
+        ('unit_price', 'subtotal'),
+        sa.Numeric(precision=10, scale=2),
+        lambda: [
+            _uuid('id', primary_key=True),
+            _uuid('invoice_id', sa.ForeignKey('invoices.id', ondelete='CASCADE'), nullable=False),
+        ],
+    ),
+    'payments': (
+        ('amount',),
+        sa.Numeric(precision=10, scale=2),
+        lambda: [
+            _uuid('id', primary_key=True),
+            _uuid('invoice_id', sa.ForeignKey('invoices.id', ondelete='CASCADE'), nullable=False),
+            _uuid('payer_id', sa.ForeignKey('users.id'), nullable=False),
+        ],
+    ),
+    'invoice_summaries': (
+        ('pending_total', 'overdue_total', 'cancelled_total', 'paid_total'),
+        sa.Numeric(precision=14, scale=2),
+        lambda: [
+            _uuid('issuer_id', sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        ],
+    ),
+}
+
+
+def upgrade():
+    postgres = op.get_bind().dialect.name == 'postgresql'
+    for table, (columns, numeric, uuid_columns) in MONEY_COLUMNS.items():
+        if not postgres:
+            # sqlite copies the rows with CAST(... AS BIGINT), which truncates; round first
+            op.execute(f"UPDATE {table} SET " + ", ".join(
+                f"{column} = CAST(round({column} * 100) AS INTEGER)" for column in columns))
+        with op.batch_alter_table(table, reflect_args=uuid_columns()) as batch_op:
+            for column in columns:
+                batch_op.alter_column(column, type_=sa.BigInteger(), existing_type=numeric,
+                                      existing_nullable=False,
+                                      postgresql_using=f'round({column} * 100)::bigint')
+
+
+def downgrade():
+    postgres = op.get_bind().dialect.name == 'postgresql'
+    for table, (columns, numeric, uuid_columns) in reversed(list(MONEY_COLUMNS.items())):
+        with op.batch_alter_table(table, reflect_args=uuid_columns()) as batch_op:
+            for column in columns:
+                batch_op.alter_column(column, type_=numeric, existing_type=sa.BigInteger(),
+                                      existing_nullable=False,
+                                      postgresql_using=f'({column} / 100.0)::numeric({numeric.precision}, {numeric.scale})')
+        if not postgres:
+            op.execute(f"UPDATE {table} SET " + ", ".join(
+                f"{column} = {column} / 100.0" for column in columns))
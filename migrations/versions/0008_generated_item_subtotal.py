@@ -0,0 +1,47 @@
+"""invoice item subtotal generated by the database
+
+The subtotal of an item is computed by the database from its quantity and
+unit price, and the models never assign it. The column is dropped and added
+back as GENERATED ALWAYS AS (quantity * unit_price) STORED, which fills it
+for the existing rows.
+
+Revision ID: 0008_generated_item_subtotal
+Revises: 0007_money_in_cents
+Create Date: 2026-10-17 20:33:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0008_generated_item_subtotal'
+down_revision = '0007_money_in_cents'
+branch_labels = None
+depends_on = None
+
+
+def _item_uuid_columns():
+    # sqlite reflects UUID columns as NUMERIC, keep their type when a batch rebuilds the table
+    return [
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('invoice_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('invoices.id', ondelete='CASCADE'),
+                  nullable=False),
+    ]
+
+
+def upgrade():
+    # sqlite cannot add a stored generated column in place, the batch rebuilds the table
+    with op.batch_alter_table('invoice_items', reflect_args=_item_uuid_columns()) as batch_op:
+        batch_op.drop_column('subtotal')
+        batch_op.add_column(sa.Column('subtotal', sa.BigInteger(), sa.Computed('quantity * unit_price', persisted=True)))
+
+
+def downgrade():
+    with op.batch_alter_table('invoice_items', reflect_args=_item_uuid_columns()) as batch_op:
+        batch_op.drop_column('subtotal')
+        batch_op.add_column(sa.Column('subtotal', sa.BigInteger(), nullable=True))
+    op.execute("UPDATE invoice_items SET subtotal = quantity * unit_price")
+    with op.batch_alter_table('invoice_items', reflect_args=_item_uuid_columns()) as batch_op:
+        batch_op.alter_column('subtotal', existing_type=sa.BigInteger(), nullable=False)
@@ -0,0 +1,61 @@
+"""per issuer invoice numbers
+
+Adds invoice_sequences, the per issuer counters invoice numbers are
+allocated from, and makes invoice numbers unique per issuer instead of
+globally. Invoices get a payment reference that stays unique across
+issuers; existing invoices keep their globally unique number as reference.
+
+Revision ID: 0009_invoice_sequences
+Revises: 0008_generated_item_subtotal
+Create Date: 2026-10-18 09:04:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0009_invoice_sequences'
+down_revision = '0008_generated_item_subtotal'
+branch_labels = None
+depends_on = None
+
+
+def _invoice_uuid_columns():
+    # sqlite reflects UUID columns as NUMERIC, keep their type when a batch rebuilds the table
+    return [
+        sa.Column('id', postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column('issuer_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('business_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('businesses.id'), nullable=False),
+    ]
+
+
+def upgrade():
+    op.create_table('invoice_sequences',
+        sa.Column('issuer_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('next_value', sa.BigInteger(), nullable=False),
+        sa.Column('reference_prefix', sa.String(length=10), nullable=False),
+        sa.ForeignKeyConstraint(['issuer_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('issuer_id'),
+        sa.UniqueConstraint('reference_prefix', name='invoice_sequences_reference_prefix_key')
+    )
+
+    op.add_column('invoices', sa.Column('payment_reference', sa.String(length=50), nullable=True))
+    op.execute("UPDATE invoices SET payment_reference = invoice_number")
+    with op.batch_alter_table('invoices', reflect_args=_invoice_uuid_columns()) as batch_op:
+        batch_op.alter_column('payment_reference', existing_type=sa.String(length=50), nullable=False)
+        batch_op.create_unique_constraint('invoices_payment_reference_key', ['payment_reference'])
+        batch_op.drop_constraint('invoices_invoice_number_key', type_='unique')
+        batch_op.create_unique_constraint('uq_invoices_issuer_invoice_number', ['issuer_id', 'invoice_number'])
+
+
+def downgrade():
+    # fails if an invoice number has since been reused by another issuer
+    with op.batch_alter_table('invoices', reflect_args=_invoice_uuid_columns()) as batch_op:
+        batch_op.drop_constraint('uq_invoices_issuer_invoice_number', type_='unique')
+        batch_op.create_unique_constraint('invoices_invoice_number_key', ['invoice_number'])
+        batch_op.drop_constraint('invoices_payment_reference_key', type_='unique')
+        batch_op.drop_column('payment_reference')
+
+    op.drop_table('invoice_sequences')
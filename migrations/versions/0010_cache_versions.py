@@ -0,0 +1,32 @@
+"""cache versions
+
+Adds cache_versions, the version of every response cache scope. ETags and
+cache keys are derived from these versions, which are bumped in the same
+transaction as the writes that change a scope.
+
+Revision ID: 0010_cache_versions
+Revises: 0009_invoice_sequences
+Create Date: 2026-10-18 09:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0010_cache_versions'
+down_revision = '0009_invoice_sequences'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('cache_versions',
+        sa.Column('scope', sa.String(length=100), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('scope')
+    )
+
+
+def downgrade():
+    op.drop_table('cache_versions')
@@ -0,0 +1,59 @@
+"""business name search index
+
+Indexes business names for the typeahead search in app/search.py: a pg_trgm
+GIN index on postgres, an FTS5 table kept in sync by triggers on sqlite. The
+FTS5 table is filled from the existing businesses.
+
+Creating the pg_trgm extension needs a role allowed to create extensions.
+
+Revision ID: 0011_business_name_search
+Revises: 0010_cache_versions
+Create Date: 2026-10-17 20:34:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0011_business_name_search'
+down_revision = '0010_cache_versions'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute("CREATE INDEX IF NOT EXISTS ix_businesses_name_trgm ON businesses USING gin (name gin_trgm_ops)")
+        return
+
+    op.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS businesses_fts USING fts5("
+        "name, content='businesses', content_rowid='rowid', tokenize='unicode61', prefix='2 3')"
+    )
+    op.execute(
+        "CREATE TRIGGER IF NOT EXISTS businesses_fts_insert AFTER INSERT ON businesses BEGIN "
+        "INSERT INTO businesses_fts(rowid, name) VALUES (new.rowid, new.name); END"
+    )
+    op.execute(
+        "CREATE TRIGGER IF NOT EXISTS businesses_fts_delete AFTER DELETE ON businesses BEGIN "
+        "INSERT INTO businesses_fts(businesses_fts, rowid, name) VALUES ('delete', old.rowid, old.name); END"
+    )
+    op.execute(
+        "CREATE TRIGGER IF NOT EXISTS businesses_fts_update AFTER UPDATE OF name ON businesses BEGIN "
+        "INSERT INTO businesses_fts(businesses_fts, rowid, name) VALUES ('delete', old.rowid, old.name); "
+        "INSERT INTO businesses_fts(rowid, name) VALUES (new.rowid, new.name); END"
+    )
+    op.execute("INSERT INTO businesses_fts(businesses_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        # the extension stays, other objects may depend on it
+        op.execute("DROP INDEX IF EXISTS ix_businesses_name_trgm")
+        return
+
+    op.execute("DROP TRIGGER IF EXISTS businesses_fts_update")
+    op.execute("DROP TRIGGER IF EXISTS businesses_fts_delete")
+    op.execute("DROP TRIGGER IF EXISTS businesses_fts_insert")
+    op.execute("DROP TABLE IF EXISTS businesses_fts")
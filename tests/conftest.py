@@ -0,0 +1,158 @@
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from flask_jwt_extended import create_access_token
+from flask_migrate import upgrade
+from sqlalchemy import event
+
+# app.extensions builds the Google OAuth flow at import time
+os.environ.setdefault('CLIENT_SECRETS', json.dumps({
+    "web": {
+        "client_id": "test-client",
+        "client_secret": "test-secret",
+        "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+        "token_uri": "https://oauth2.googleapis.com/token",
+    }
+}))
+
+from app import create_app
+from app.models import db, Business, Invoice, InvoiceItem, Payment, User
+
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'migrations')
+
+
+def make_app(tmp_path, database_uri=None):
+    return create_app({
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": database_uri or f"sqlite:///{tmp_path / 'invotrack.db'}",
+        "SECRET_KEY": "test-secret-key-that-is-long-enough",
+        "MAIL_USERNAME": "billing@invotrack.test",
+        "MAIL_SUPPRESS_SEND": True,
+        "SCHEDULER_AUTOSTART": False,
+    })
+
+
+def _enforce_foreign_keys(dbapi_connection, connection_record):
+    # off by default in sqlite; postgres always enforces them
+    dbapi_connection.execute('PRAGMA foreign_keys=ON')
+
+
+@pytest.fixture
+def app(tmp_path):
+    """App on a database created from the models, with foreign keys enforced."""
+    app = make_app(tmp_path)
+    with app.app_context():
+        event.listen(db.engine, 'connect', _enforce_foreign_keys)
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def migrated_app(tmp_path):
+    """App on a database created by running every migration."""
+    app = make_app(tmp_path)
+    with app.app_context():
+        upgrade(directory=MIGRATIONS)
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def postgres_app(tmp_path):
+    """App on the postgres database at TEST_POSTGRES_URI, skipped when it is not set."""
+    database_uri = os.getenv('TEST_POSTGRES_URI')
+    if not database_uri:
+        pytest.skip("TEST_POSTGRES_URI is not set")
+    app = make_app(tmp_path, database_uri)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def auth_headers(user_id):
+    return {"Authorization": f"Bearer {create_access_token(identity=str(user_id))}"}
+
+
+@contextmanager
+def count_queries():
+    """Collects the SQL statements run on the engine inside the block."""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+
+class Seeder:
+    """Creates users, businesses, invoices and payments for a test."""
+
+    def __init__(self):
+        self.counter = 0
+
+    def _next(self):
+        self.counter += 1
+        return self.counter
+
+    def user(self, name='user'):
+        n = self._next()
+        user = User(name=f'{name} {n}', email=f'{name}{n}@invotrack.test',
+                    phone_number=f'07{n:08d}', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        return user
+
+    def business(self, owner, name='business'):
+        n = self._next()
+        business = Business(owner_id=owner.id, name=f'{name} {n}', phone_number='0712345678',
+                            email=f'{name}{n}@invotrack.test')
+        db.session.add(business)
+        db.session.commit()
+        return business
+
+    def invoices(self, issuer, business, count, status='pending', unit_price=1250, payer=None):
+        issued = datetime(2024, 1, 1)
+        created = []
+        for _ in range(count):
+            n = self._next()
+            invoice = Invoice(invoice_number=f'T-{n:06d}', payment_reference=f'T{n:06d}',
+                              issuer_id=issuer.id, business_id=business.id,
+                              status=status, total_amount=unit_price * 2,
+                              date_issued=issued + timedelta(minutes=n), due_date=issued + timedelta(days=30),
+                              items=[InvoiceItem(description='service', quantity=2, unit_price=unit_price)])
+            db.session.add(invoice)
+            created.append(invoice)
+        db.session.flush()
+        if payer is not None:
+            for invoice in created:
+                db.session.add(Payment(invoice_id=invoice.id, payer_id=payer.id, payment_method='mpesa',
+                                       transaction_code=f'TX{self._next()}', amount=invoice.total_amount,
+                                       payment_date=invoice.date_issued))
+        db.session.commit()
+        return created
+
+
+@pytest.fixture
+def seed():
+    return Seeder()
@@ -0,0 +1,116 @@
+import json
+from uuid import uuid4
+
+import pytest
+from app import bulk_invoices
+from app.models import db, Invoice, InvoiceItem, InvoiceSummary
+from app.pagination import NDJSON_MIMETYPE
+from conftest import auth_headers
+
+URL = '/api/v1/invoices/bulk'
+
+
+def document(business_id, *prices, due_date='31-01-2025'):
+    return {"business_id": str(business_id), "due_date": due_date,
+            "items": [{"description": f'item {i}', "quantity": 2, "unit_price": price} for i, price in enumerate(prices)]}
+
+
+@pytest.fixture
+def parties(app, seed):
+    issuer, owner = seed.user('issuer'), seed.user('owner')
+    return issuer, owner, seed.business(owner)
+
+
+def test_all_valid_invoices_are_created_in_order(client, parties):
+    issuer, _, business = parties
+    documents = [document(business.id, '10.00'), document(business.id, '2.50', '1.00'), document(business.id, '7')]
+
+    response = client.post(URL, json=documents, headers=auth_headers(issuer.id))
+
+    assert response.status_code == 201
+    body = response.get_json()
+    assert (body["created"], body["failed"]) == (3, 0)
+    assert [result["index"] for result in body["results"]] == [0, 1, 2]
+    assert [result["invoice_number"] for result in body["results"]] == ['INV-000001', 'INV-000002', 'INV-000003']
+    assert [result["total_amount"] for result in body["results"]] == [20.0, 7.0, 14.0]
+    invoices = {str(invoice.id): invoice for invoice in Invoice.query}
+    assert [invoices[result["invoice_id"]].payment_reference for result in body["results"]] == [
+        result["payment_reference"] for result in body["results"]]
+    assert InvoiceItem.query.count() == 4
+
+
+def test_partial_failure_reports_each_invalid_invoice(client, parties):
+    issuer, _, business = parties
+    documents = [document(business.id, '10.00'), document(business.id, '-1'), document(uuid4(), '5.00'),
+                 {"business_id": str(business.id)}, document(business.id, '3.00')]
+
+    response = client.post(URL, json={"invoices": documents}, headers=auth_headers(issuer.id))
+
+    assert response.status_code == 207
+    body = response.get_json()
+    assert (body["created"], body["failed"]) == (2, 3)
+    results = body["results"]
+    assert results[1]["errors"] == [{"loc": "items[0].unit_price", "message": "must be greater than 0"}]
+    assert results[2] == {"index": 2, "error": "business not found"}
+    assert {error["loc"] for error in results[3]["errors"]} == {"due_date", "items"}
+    # numbers are only taken by the invoices that are created
+    assert [results[i]["invoice_number"] for i in (0, 4)] == ['INV-000001', 'INV-000002']
+    assert Invoice.query.count() == 2
+
+
+def test_no_valid_invoice_is_a_bad_request(client, parties):
+    issuer, _, business = parties
+
+    response = client.post(URL, json=[document(business.id, '0')], headers=auth_headers(issuer.id))
+
+    assert response.status_code == 400
+    assert response.get_json()["created"] == 0
+    assert Invoice.query.count() == 0
+
+
+def test_ndjson_body_is_inserted_in_batches(client, parties, monkeypatch):
+    issuer, _, business = parties
+    monkeypatch.setattr(bulk_invoices, 'INSERT_BATCH_SIZE', 2)
+    lines = '\n'.join(json.dumps(document(business.id, f'{n}.00')) for n in range(1, 6))
+
+    response = client.post(URL, data=lines + '\n\n', content_type=NDJSON_MIMETYPE, headers=auth_headers(issuer.id))
+
+    assert response.status_code == 201
+    assert sorted(invoice.total_amount for invoice in Invoice.query) == [200, 400, 600, 800, 1000]
+    assert InvoiceItem.query.count() == 5
+
+
+@pytest.mark.parametrize('body, content_type, error', [
+    ('[]', 'application/json', "no invoices provided"),
+    ('{"invoices": 3}', 'application/json', "expected a JSON array of invoices"),
+    ('{}\nnot json\n', NDJSON_MIMETYPE, "invalid JSON on line 2"),
+    ('[{}, {}, {}]', 'application/json', "at most 2 invoices per request"),
+])
+def test_unreadable_or_oversized_bodies_are_rejected(client, parties, monkeypatch, body, content_type, error):
+    issuer, _, _ = parties
+    monkeypatch.setattr(bulk_invoices, 'MAX_BULK_INVOICES', 2)
+
+    response = client.post(URL, data=body, content_type=content_type, headers=auth_headers(issuer.id))
+
+    assert response.status_code == 400
+    assert response.get_json() == {"error": error}
+
+
+def test_summary_and_cached_listings_follow_the_batch(client, parties):
+    issuer, owner, business = parties
+    listings = [(issuer, '/api/v1/invoices'), (owner, '/api/v1/invoices/received'),
+                (owner, f'/api/v1/invoices/business/{business.id}')]
+    seeded = client.post(URL, json=[document(business.id, '1.00')], headers=auth_headers(issuer.id))
+    assert seeded.status_code == 201
+    etags = [client.get(url, headers=auth_headers(user.id)).headers['ETag'] for user, url in listings]
+
+    response = client.post(URL, json=[document(business.id, '10.00'), document(business.id, '2.50')],
+                           headers=auth_headers(issuer.id))
+
+    assert response.status_code == 201
+    summary = db.session.get(InvoiceSummary, issuer.id)
+    assert (summary.pending_count, summary.pending_total) == (3, 200 + 2000 + 500)
+    for (user, url), etag in zip(listings, etags):
+        fresh = client.get(url, headers={**auth_headers(user.id), 'If-None-Match': etag})
+        assert fresh.status_code == 200
+        assert len(fresh.get_json()["invoices"]) == 3
@@ -0,0 +1,77 @@
+import json
+import time
+
+from app.cache import CacheMetrics
+from app.models import db
+from app.pagination import NDJSON_MIMETYPE
+from conftest import auth_headers
+
+
+def test_streamed_listing_bypasses_cache_and_etag(client, seed):
+    issuer = seed.user()
+    seed.invoices(issuer, seed.business(seed.user()), 3)
+    headers = auth_headers(issuer.id)
+
+    first = client.get('/api/v1/invoices', headers=headers)
+    assert first.status_code == 200
+    assert first.headers['X-Cache'] == 'MISS'
+    assert 'Accept' in first.vary
+    etag = first.headers['ETag']
+
+    streamed = client.get('/api/v1/invoices',
+                          headers={**headers, 'Accept': NDJSON_MIMETYPE, 'If-None-Match': etag})
+    assert streamed.status_code == 200
+    assert streamed.mimetype == NDJSON_MIMETYPE
+    assert len(streamed.get_data(as_text=True).splitlines()) == 3
+    assert 'ETag' not in streamed.headers
+    assert 'X-Cache' not in streamed.headers
+
+    again = client.get('/api/v1/invoices', headers={**headers, 'If-None-Match': etag})
+    assert again.status_code == 304
+    assert 'Accept' in again.vary
+
+
+def test_cache_metrics_are_logged(caplog):
+    metrics = CacheMetrics(log_interval=0.001)
+    time.sleep(0.002)
+    metrics.record("misses")
+    metrics.record("hits")
+
+    [record] = [record for record in caplog.records if record.name == 'app.metrics']
+    assert record.getMessage() == 'response_cache ' + json.dumps(
+        {"hits": 0, "hit_ratio": 0.0, "misses": 1, "not_modified": 0, "stores": 0}, sort_keys=True)
+
+
+def test_renames_invalidate_the_listings_showing_the_name(client, seed):
+    issuer, owner = seed.user('issuer'), seed.user('owner')
+    business = seed.business(owner)
+    [invoice] = seed.invoices(issuer, business, 1)
+    views = [(issuer, '/api/v1/invoices'), (owner, '/api/v1/invoices/received'),
+             (owner, f'/api/v1/invoices/business/{business.id}'), (owner, f'/api/v1/invoices/{invoice.id}')]
+
+    def fetch_all(etags=None):
+        responses = []
+        for i, (user, url) in enumerate(views):
+            headers = auth_headers(user.id)
+            if etags:
+                headers['If-None-Match'] = etags[i]
+            responses.append(client.get(url, headers=headers))
+        return responses
+
+    etags = [response.headers['ETag'] for response in fetch_all()]
+
+    business.name = 'Renamed Traders'
+    db.session.commit()
+    renamed = fetch_all(etags)
+    assert [response.status_code for response in renamed] == [200, 200, 200, 200]
+    assert all(response.headers['X-Cache'] == 'MISS' for response in renamed)
+    assert 'Renamed Traders' in renamed[0].get_data(as_text=True)
+    assert 'Renamed Traders' in renamed[3].get_data(as_text=True)
+
+    etags = [response.headers['ETag'] for response in renamed]
+    response = client.put('/api/v1/user/update', json={"name": 'Renamed Issuer'}, headers=auth_headers(issuer.id))
+    assert response.status_code == 200
+    renamed = fetch_all(etags)
+    # the issuer's own listing only shows recipients
+    assert [response.status_code for response in renamed] == [304, 200, 200, 200]
+    assert all('Renamed Issuer' in response.get_data(as_text=True) for response in renamed[1:])
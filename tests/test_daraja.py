@@ -0,0 +1,214 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from app import daraja
+from app.daraja import AccessTokenCache, DarajaClient, DarajaError, LatencyMetrics
+
+TOKEN_PATH = '/oauth/v1/generate'
+STK_PATH = '/mpesa/stkpush/v1/processrequest'
+
+
+class StubDaraja(ThreadingHTTPServer):
+    """Answers each path with its scripted (status, body, delay) responses in order, recording the requests."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.routes = {}
+        self.requests = []
+
+    def script(self, path, *responses):
+        self.routes.setdefault(path, []).extend(responses)
+
+    def calls(self, path):
+        return [headers for called, headers in self.requests if called == path]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def _respond(self):
+        path = self.path.split('?')[0]
+        self.server.requests.append((path, dict(self.headers)))
+        length = int(self.headers.get('Content-Length') or 0)
+        self.rfile.read(length)
+        status, body, delay = self.server.routes[path].pop(0)
+        if delay:
+            threading.Event().wait(delay)
+        payload = json.dumps(body).encode('utf-8')
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        except OSError:
+            # the client gave up waiting
+            pass
+
+    do_GET = do_POST = _respond
+
+    def log_message(self, format, *args):
+        pass
+
+
+def reply(status, body=None, delay=0):
+    return (status, body or {}, delay)
+
+
+def token(value, expires_in=3599):
+    return reply(200, {"access_token": value, "expires_in": str(expires_in)})
+
+
+@pytest.fixture
+def stub():
+    server = StubDaraja()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def backoffs(monkeypatch):
+    """Upper bounds of the backoff delays drawn, without sleeping them."""
+    drawn = []
+
+    class Random:
+        @staticmethod
+        def uniform(low, high):
+            drawn.append(high)
+            return 0
+
+    monkeypatch.setattr(daraja, 'random', Random)
+    return drawn
+
+
+def client_for(stub, max_retries=3):
+    return DarajaClient(f'http://127.0.0.1:{stub.server_port}', 'key', 'secret', timeout=(1, 0.2),
+                        max_retries=max_retries, metrics_log_seconds=0)
+
+
+def test_idempotent_call_retries_5xx_and_timeouts_with_capped_backoff(stub, backoffs):
+    stub.script(TOKEN_PATH, reply(503), reply(200, delay=0.5), reply(502), reply(503), reply(500), token('t'))
+    client = client_for(stub, max_retries=6)
+
+    response = client.request('GET', TOKEN_PATH, idempotent=True)
+
+    assert response.status_code == 200
+    assert len(stub.calls(TOKEN_PATH)) == 6
+    assert backoffs == [0.25, 0.5, 1.0, 2, 2]
+    assert client.metrics.snapshot()[TOKEN_PATH]["errors"] == 5
+
+
+def test_retries_end_with_the_last_response_or_an_error(stub, backoffs):
+    stub.script(TOKEN_PATH, reply(503), reply(503), reply(504))
+    client = client_for(stub)
+    assert client.request('GET', TOKEN_PATH, idempotent=True).status_code == 504
+
+    stub.script(TOKEN_PATH, *[reply(200, delay=0.5)] * 3)
+    with pytest.raises(DarajaError):
+        client.request('GET', TOKEN_PATH, idempotent=True)
+    assert len(stub.calls(TOKEN_PATH)) == 6
+
+
+def test_4xx_and_non_idempotent_calls_are_not_retried(stub, backoffs):
+    stub.script(TOKEN_PATH, reply(400, {"errorMessage": "Invalid grant type"}))
+    stub.script(STK_PATH, reply(503))
+    client = client_for(stub)
+
+    assert client.request('GET', TOKEN_PATH, idempotent=True).status_code == 400
+    assert client.request('POST', STK_PATH, json={}).status_code == 503
+    assert (len(stub.calls(TOKEN_PATH)), len(stub.calls(STK_PATH))) == (1, 1)
+    assert backoffs == []
+
+
+def test_stk_push_renews_a_rejected_token_once(stub, backoffs):
+    stub.script(TOKEN_PATH, token('first'), token('second'), token('third'))
+    stub.script(STK_PATH, reply(401), reply(200, {"ResponseCode": "0"}), reply(401), reply(401))
+    client = client_for(stub)
+
+    assert client.stk_push({"Amount": 1}).json() == {"ResponseCode": "0"}
+    assert [headers['Authorization'] for headers in stub.calls(STK_PATH)] == ['Bearer first', 'Bearer second']
+
+    # a token that is rejected again is not renewed a second time
+    assert client.stk_push({"Amount": 1}).status_code == 401
+    assert [headers['Authorization'] for headers in stub.calls(STK_PATH)][2:] == ['Bearer second', 'Bearer third']
+    assert len(stub.calls(TOKEN_PATH)) == 3
+
+
+class CountingFetch:
+    """Token endpoint stand-in handing out token-1, token-2, ... after `delay` seconds."""
+
+    def __init__(self, expires_in=3599, delay=0):
+        self.expires_in = expires_in
+        self.delay = delay
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self):
+        with self.lock:
+            self.calls += 1
+            number = self.calls
+        time.sleep(self.delay)
+        return {"access_token": f'token-{number}', "expires_in": str(self.expires_in)}
+
+
+def test_concurrent_callers_share_one_token_fetch():
+    fetch = CountingFetch(delay=0.1)
+    tokens = AccessTokenCache(fetch)
+    barrier = threading.Barrier(10)
+    results = []
+
+    def get():
+        barrier.wait()
+        results.append(tokens.get())
+
+    threads = [threading.Thread(target=get) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ['token-1'] * 10
+    assert fetch.calls == 1
+
+
+def test_token_inside_the_refresh_margin_is_renewed():
+    fetch = CountingFetch(expires_in=3600)
+    tokens = AccessTokenCache(fetch, refresh_margin=300)
+
+    assert tokens.get() == 'token-1'
+    assert tokens.get() == 'token-1'
+    assert fetch.calls == 1
+
+    tokens.expires_at = time.monotonic() + 299
+    assert tokens.get() == 'token-2'
+    assert tokens.get() == 'token-2'
+    assert fetch.calls == 2
+
+
+def test_failed_renewal_keeps_the_valid_token(caplog):
+    tokens = AccessTokenCache(lambda: {"errorMessage": "Invalid Authentication passed"}, refresh_margin=300)
+    tokens.token, tokens.expires_at = 'current', time.monotonic() + 60
+
+    assert tokens.get() == 'current'
+    assert 'proactive token refresh failed' in caplog.text
+
+    tokens.invalidate()
+    assert tokens.get() is None
+
+
+def test_latency_metrics_are_logged(caplog):
+    metrics = LatencyMetrics(log_interval=0.001)
+    time.sleep(0.002)
+    metrics.record('/mpesa/stkpush/v1/processrequest', 0.25)
+    metrics.record('/mpesa/stkpush/v1/processrequest', 0.5, failed=True)
+
+    [record] = [record for record in caplog.records if record.name == 'app.metrics']
+    assert record.getMessage() == 'daraja_latency ' + json.dumps(
+        {'/mpesa/stkpush/v1/processrequest': {"avg_ms": 250.0, "calls": 1, "errors": 0, "max_ms": 250.0}},
+        sort_keys=True)
@@ -0,0 +1,97 @@
+import time
+from types import SimpleNamespace
+
+import dns.exception
+import dns.resolver
+import pytest
+from app.email_checks import EmailChecker
+from email_validator import EmailNotValidError, EmailSyntaxError, EmailUndeliverableError
+
+
+class StubResolver:
+    """dns resolver stand-in answering from a table of (domain, record type) to records or an exception."""
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.queries = []
+
+    def resolve(self, domain, rdtype):
+        self.queries.append((str(domain), rdtype))
+        answer = self.answers.get((str(domain), rdtype), dns.resolver.NoAnswer())
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+def mx(*hosts):
+    return [SimpleNamespace(preference=10, exchange=f'{host}.') for host in hosts]
+
+
+@pytest.fixture
+def resolver():
+    return StubResolver({
+        ('acme-traders.co.ke', 'MX'): mx('mail.acme-traders.co.ke'),
+        ('gone.co.ke', 'MX'): dns.resolver.NXDOMAIN(),
+        ('slow.co.ke', 'MX'): dns.exception.Timeout(),
+        ('broken.co.ke', 'MX'): RuntimeError("resolver crashed"),
+    })
+
+
+@pytest.mark.parametrize('email', ['not an email', 'jane@', '@acme-traders.co.ke', 'jane@acme..co.ke'])
+def test_syntax_is_checked_without_lookups(resolver, email):
+    checker = EmailChecker(resolver=resolver)
+    with pytest.raises(EmailSyntaxError):
+        checker.check(email, mode='sync')
+    assert resolver.queries == []
+
+
+def test_off_mode_normalizes_without_lookups(resolver):
+    checker = EmailChecker(resolver=resolver)
+    assert checker.check('Jane@Gone.CO.KE', mode='off') == 'Jane@gone.co.ke'
+    assert resolver.queries == []
+
+
+def test_sync_lookup_is_cached_per_domain(resolver):
+    checker = EmailChecker(resolver=resolver)
+
+    assert checker.check('jane@acme-traders.co.ke', mode='sync') == 'jane@acme-traders.co.ke'
+    for _ in range(2):
+        with pytest.raises(EmailUndeliverableError):
+            checker.check('jane@gone.co.ke', mode='sync')
+    checker.check('john@acme-traders.co.ke', mode='sync')
+
+    assert resolver.queries == [('acme-traders.co.ke', 'MX'), ('gone.co.ke', 'MX')]
+    assert (checker.deliverable('acme-traders.co.ke'), checker.deliverable('gone.co.ke')) == (True, False)
+
+
+@pytest.mark.parametrize('domain', ['slow.co.ke', 'broken.co.ke'])
+def test_failed_lookup_lets_the_address_through_and_is_asked_again(resolver, caplog, domain):
+    checker = EmailChecker(resolver=resolver)
+
+    for _ in range(2):
+        assert checker.check(f'jane@{domain}', mode='sync') == f'jane@{domain}'
+
+    assert resolver.queries == [(domain, 'MX')] * 2
+    assert checker.deliverable(domain) is None
+    assert f"deliverability lookup for {domain} failed" in caplog.text
+
+
+def test_async_lookup_rejects_later_requests(resolver):
+    checker = EmailChecker(resolver=resolver)
+
+    assert checker.check('jane@gone.co.ke') == 'jane@gone.co.ke'
+    checker.executor.shutdown(wait=True)
+
+    with pytest.raises(EmailNotValidError, match='does not accept email'):
+        checker.check('john@gone.co.ke')
+    assert resolver.queries == [('gone.co.ke', 'MX')]
+
+
+def test_cached_domains_expire(resolver):
+    checker = EmailChecker(ttl=0.05, resolver=resolver)
+    checker.check('jane@acme-traders.co.ke', mode='sync')
+    time.sleep(0.06)
+
+    assert checker.deliverable('acme-traders.co.ke') is None
+    checker.check('jane@acme-traders.co.ke', mode='sync')
+    assert len(resolver.queries) == 2
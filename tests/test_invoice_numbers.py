@@ -0,0 +1,63 @@
+import threading
+from datetime import datetime
+
+from app.invoice_numbers import REFERENCE_ALPHABET, REFERENCE_PREFIX_LENGTH, NumberAllocator, next_invoice_numbers
+from app.models import db, Invoice, InvoiceSequence
+
+
+def test_numbers_are_sequential_per_issuer(app, seed):
+    first, second = seed.user('first'), seed.user('second')
+
+    a = next_invoice_numbers(first.id, count=2) + next_invoice_numbers(first.id)
+    b = next_invoice_numbers(second.id, count=3)
+
+    assert [number for number, _ in a] == ['INV-000001', 'INV-000002', 'INV-000003']
+    assert [number for number, _ in b] == ['INV-000001', 'INV-000002', 'INV-000003']
+    prefix_a, prefix_b = a[0][1][:REFERENCE_PREFIX_LENGTH], b[0][1][:REFERENCE_PREFIX_LENGTH]
+    assert prefix_a != prefix_b
+    assert set(prefix_a) <= set(REFERENCE_ALPHABET)
+    assert [reference for _, reference in a] == [f'{prefix_a}00000{n}' for n in (1, 2, 3)]
+    assert all(len(reference) <= 12 for _, reference in a + b)
+
+
+def test_number_of_a_rolled_back_invoice_is_skipped(app, seed):
+    issuer = seed.user('issuer')
+    business = seed.business(seed.user('owner'))
+
+    def invoice(numbers):
+        [(number, reference)] = numbers
+        return Invoice(invoice_number=number, payment_reference=reference, issuer_id=issuer.id,
+                       business_id=business.id, total_amount=0, due_date=datetime(2024, 2, 1))
+
+    db.session.add(invoice(next_invoice_numbers(issuer.id)))
+    db.session.rollback()
+    db.session.add(invoice(next_invoice_numbers(issuer.id)))
+    db.session.commit()
+
+    assert [number for (number,) in db.session.query(Invoice.invoice_number)] == ['INV-000002']
+    # a restarted process starts after the block the previous one reserved
+    _, numbers = NumberAllocator(block_size=5).take(issuer.id)
+    assert numbers == [21]
+    assert db.session.get(InvoiceSequence, issuer.id).next_value == 26
+
+
+def test_concurrent_allocation_hands_out_each_number_once(app, seed):
+    issuer = seed.user('issuer')
+    allocators = [NumberAllocator(block_size=3), NumberAllocator(block_size=7)]
+    taken = []
+
+    def allocate(allocator):
+        with app.app_context():
+            for _ in range(25):
+                taken.extend(allocator.take(issuer.id)[1])
+
+    threads = [threading.Thread(target=allocate, args=(allocators[i % 2],)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(taken) == 200
+    assert len(set(taken)) == 200
+    assert {allocator.take(issuer.id)[0] for allocator in allocators} == {
+        db.session.get(InvoiceSequence, issuer.id).reference_prefix}
@@ -0,0 +1,21 @@
+from app.models import db, Invoice
+from conftest import auth_headers
+
+
+def test_update_adjusts_total_by_changed_items(client, seed):
+    issuer = seed.user()
+    [invoice] = seed.invoices(issuer, seed.business(seed.user()), 1, unit_price=1250)
+    item = invoice.items[0]
+
+    response = client.put(f'/api/v1/invoices/{invoice.id}/update', headers=auth_headers(issuer.id), json={
+        "items": [
+            {"id": str(item.id), "description": "service", "quantity": 3, "unit_price": "12.50"},
+            {"description": "delivery", "quantity": 1, "unit_price": "5.00"},
+        ]
+    })
+
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()["items"] == {"added": 1, "updated": 1, "removed": 0}
+    db.session.expire_all()
+    assert db.session.get(Invoice, invoice.id).total_amount == 4250
+    assert sorted(item.subtotal for item in db.session.get(Invoice, invoice.id).items) == [500, 3750]
@@ -0,0 +1,120 @@
+import pytest
+from conftest import auth_headers, count_queries
+
+# Listings are projected, joined queries: the number of statements a request
+# runs must not grow with the number of rows it returns.
+
+LISTINGS = [
+    ('/api/v1/invoices?limit=500', 'issuer'),
+    ('/api/v1/invoices/status/pending?limit=500', 'issuer'),
+    ('/api/v1/invoices/business/{business}?limit=500', 'owner'),
+    ('/api/v1/invoices/business/{business}/status/pending?limit=500', 'owner'),
+    ('/api/v1/invoices/received?limit=500', 'owner'),
+    ('/api/v1/invoices/received?status=pending&limit=500', 'owner'),
+    ('/api/v1/payments/', 'issuer'),
+    ('/api/v1/businesses?limit=500', 'issuer'),
+    ('/api/v1/businesses?name=business', 'issuer'),
+]
+
+
+@pytest.fixture
+def accounts(seed):
+    issuer = seed.user('issuer')
+    owner = seed.user('owner')
+    return issuer, owner, seed.business(owner)
+
+
+def _statements(client, url, headers):
+    with count_queries() as statements:
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return len(statements), response
+
+
+@pytest.mark.parametrize('url, viewer', LISTINGS)
+def test_query_count_does_not_grow_with_rows(client, seed, accounts, url, viewer):
+    issuer, owner, business = accounts
+    url = url.format(business=business.id)
+    headers = auth_headers(issuer.id if viewer == 'issuer' else owner.id)
+
+    seed.invoices(issuer, business, 5, payer=issuer)
+    for _ in range(2):
+        seed.business(owner)
+    small, _ = _statements(client, url, headers)
+
+    seed.invoices(issuer, business, 45, payer=issuer)
+    for _ in range(18):
+        seed.business(owner)
+    large, response = _statements(client, url, headers)
+
+    assert response.headers.get('X-Cache') != 'HIT'
+    assert large == small
+
+
+def test_invoice_listing_pages_follow_cursor(client, seed, accounts):
+    issuer, _, business = accounts
+    created = seed.invoices(issuer, business, 7)
+    headers = auth_headers(issuer.id)
+
+    seen, cursor = [], None
+    while True:
+        query = {'limit': 3, **({'cursor': cursor} if cursor else {})}
+        body = client.get('/api/v1/invoices', query_string=query, headers=headers).get_json()
+        seen += [invoice['id'] for invoice in body['invoices']]
+        cursor = body['next_cursor']
+        if not cursor:
+            break
+
+    assert seen == [str(invoice.id) for invoice in reversed(created)]
+
+
+def test_directory_pages_follow_the_cursor_header(client, seed, accounts):
+    issuer, owner, business = accounts
+    names = sorted([business.name] + [seed.business(owner).name for _ in range(6)])
+    headers = auth_headers(issuer.id)
+
+    seen, pages, cursor = [], 0, None
+    while True:
+        query = {'limit': 3, **({'cursor': cursor} if cursor else {})}
+        response = client.get('/api/v1/businesses', query_string=query, headers=headers)
+        assert response.status_code == 200
+        seen += [entry['name'] for entry in response.get_json()]
+        pages += 1
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            break
+
+    assert (seen, pages) == (names, 3)
+
+
+@pytest.mark.parametrize('url', ['/api/v1/businesses?fields={fields}', '/api/v1/businesses?name=business&fields={fields}'])
+def test_directory_returns_only_the_selected_fields(client, seed, accounts, url):
+    issuer, owner, business = accounts
+
+    response = client.get(url.format(fields='name, id,name'), headers=auth_headers(issuer.id))
+
+    assert response.status_code == 200
+    assert response.get_json() == [{"name": business.name, "id": str(business.id)}]
+
+
+def test_directory_owner_field_is_joined(client, seed, accounts):
+    issuer, owner, business = accounts
+
+    response = client.get('/api/v1/businesses?fields=id,owner', headers=auth_headers(issuer.id))
+
+    assert response.get_json() == [{"id": str(business.id), "owner": owner.name}]
+
+
+@pytest.mark.parametrize('query, error', [
+    ({'fields': 'id,password_hash,owner_id'}, "unknown fields: password_hash, owner_id"),
+    ({'name': 'business', 'fields': 'secret'}, "unknown fields: secret"),
+    ({'cursor': 'not-a-cursor'}, "invalid cursor"),
+    ({'limit': 'all'}, "limit must be an integer"),
+])
+def test_directory_rejects_invalid_parameters(client, accounts, query, error):
+    issuer, _, _ = accounts
+
+    response = client.get('/api/v1/businesses', query_string=query, headers=auth_headers(issuer.id))
+
+    assert response.status_code == 400
+    assert response.get_json() == {"error": error}
@@ -0,0 +1,102 @@
+from datetime import datetime
+from decimal import Decimal
+from uuid import UUID, uuid4
+
+import sqlalchemy as sa
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from flask_migrate import downgrade, upgrade
+from sqlalchemy import inspect
+
+from app.models import db
+from conftest import MIGRATIONS, make_app
+
+
+def test_upgrade_creates_every_table_and_index(migrated_app):
+    inspector = inspect(db.engine)
+    tables = set(inspector.get_table_names())
+    assert set(db.metadata.tables) <= tables
+
+    for table in db.metadata.sorted_tables:
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        assert {index.name for index in table.indexes} <= existing, table.name
+
+
+def _drift():
+    with db.engine.connect() as connection:
+        diffs = compare_metadata(MigrationContext.configure(connection), db.metadata)
+    # sqlite reflects UUID columns as NUMERIC, and the FTS5 search tables are not models
+    return [diff for diff in diffs
+            if not (isinstance(diff, list) and diff[0][0] == 'modify_type' and 'UUID' in repr(diff[0][-1]))
+            and not (isinstance(diff, tuple) and diff[0] == 'remove_table' and diff[1].name.startswith('businesses_fts'))]
+
+
+def test_migrated_schema_matches_models(migrated_app):
+    assert _drift() == []
+    with db.engine.connect() as connection:
+        sql = connection.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE name = 'ix_invoices_pending_due_date'").scalar()
+    assert sql.endswith("WHERE status = 'pending'")
+
+
+def test_every_revision_downgrades(migrated_app):
+    downgrade(directory=MIGRATIONS, revision='base')
+    assert inspect(db.engine).get_table_names() == ['alembic_version']
+    upgrade(directory=MIGRATIONS)
+    assert _drift() == []
+
+
+def test_invoice_numbers_are_unique_per_issuer(migrated_app):
+    unique = inspect(db.engine).get_unique_constraints('invoices')
+    assert sorted(constraint['column_names'] for constraint in unique) == [
+        ['issuer_id', 'invoice_number'], ['payment_reference']]
+
+
+_TYPES = {UUID: sa.Uuid(), Decimal: sa.Numeric(10, 2), datetime: sa.DateTime()}
+
+
+def test_item_subtotal_is_generated(migrated_app, seed):
+    owner = seed.user()
+    [invoice] = seed.invoices(owner, seed.business(owner), 1, unit_price=1250)
+    item = invoice.items[0]
+    assert item.subtotal == 2500
+
+    item.quantity = 3
+    db.session.commit()
+    assert item.subtotal == 3750
+
+
+def _insert(table, **values):
+    # plain table, the models describe the schema at head
+    columns = [sa.column(name, _TYPES.get(type(value))) for name, value in values.items()]
+    db.session.execute(sa.table(table, *columns).insert().values(**values))
+
+
+def test_money_is_converted_to_cents(tmp_path):
+    app = make_app(tmp_path)
+    with app.app_context():
+        upgrade(directory=MIGRATIONS, revision='0001_baseline')
+        user, business, invoice = uuid4(), uuid4(), uuid4()
+        now = datetime(2024, 1, 1)
+        _insert('users', id=user, name='issuer', email='issuer@invotrack.test', phone_number='0712345678',
+                password_hash='x')
+        _insert('businesses', id=business, owner_id=user, name='business', phone_number='0712345678',
+                email='business@invotrack.test')
+        _insert('invoices', id=invoice, invoice_number='INV-0A1B2C3D', issuer_id=user, business_id=business,
+                status='pending', total_amount=Decimal('2501.01'), date_issued=now, due_date=now)
+        _insert('invoice_items', id=uuid4(), invoice_id=invoice, description='service', quantity=2,
+                unit_price=Decimal('1250.50'), subtotal=Decimal('2501.00'))
+        _insert('payments', id=uuid4(), invoice_id=invoice, payer_id=user, payment_method='mpesa',
+                transaction_code='TX1', amount=Decimal('0.07'), payment_date=now, status='successful')
+        db.session.commit()
+
+        upgrade(directory=MIGRATIONS)
+
+        assert db.session.execute(sa.text("SELECT total_amount FROM invoices")).scalar() == 250101
+        assert db.session.execute(sa.text("SELECT unit_price, subtotal FROM invoice_items")).one() == (125050, 250100)
+        assert db.session.execute(sa.text("SELECT amount FROM payments")).scalar() == 7
+        assert db.session.execute(sa.text("SELECT pending_total FROM invoice_summaries")).scalar() == 250101
+        # numbers were globally unique before 0009, so they carry on as payment references
+        assert db.session.execute(sa.text("SELECT payment_reference FROM invoices")).scalar() == 'INV-0A1B2C3D'
+        db.session.remove()
+        db.engine.dispose()
@@ -0,0 +1,47 @@
+import threading
+import time
+import uuid
+
+from app import models
+from app.models import uuid7
+
+
+def test_uuid7_sets_the_version_and_variant():
+    for value in (uuid7() for _ in range(100)):
+        assert value.version == 7
+        assert value.variant == uuid.RFC_4122
+
+
+def test_uuid7_leads_with_the_millisecond_timestamp():
+    before = time.time_ns() // 1_000_000
+    value = uuid7()
+    after = time.time_ns() // 1_000_000
+
+    assert before <= value.int >> 80 <= after
+
+
+def test_uuid7_keeps_increasing_within_a_millisecond_and_when_the_clock_steps_back(monkeypatch):
+    clock = iter([2_000_000_000] * 5 + [1_000_000_000] * 5)
+    monkeypatch.setattr(models.time, 'time_ns', lambda: next(clock))
+
+    values = [uuid7() for _ in range(10)]
+
+    assert values == sorted(values)
+    assert len(set(values)) == 10
+
+
+def test_uuid7_is_ordered_and_unique_across_threads():
+    batches = [[] for _ in range(4)]
+
+    def generate(batch):
+        for _ in range(2000):
+            batch.append(uuid7())
+
+    threads = [threading.Thread(target=generate, args=(batch,)) for batch in batches]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(batch == sorted(batch) for batch in batches)
+    assert len({value for batch in batches for value in batch}) == 8000
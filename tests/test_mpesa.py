@@ -0,0 +1,40 @@
+from app import mpesa
+
+
+class StubResponse:
+    status_code = 200
+
+    def json(self):
+        return {"MerchantRequestID": "29115-34620561-1", "CheckoutRequestID": "ws_CO_191220191020363925",
+                "ResponseCode": "0", "CustomerMessage": "Success. Request accepted for processing"}
+
+
+class StubClient:
+    def __init__(self):
+        self.pushes = []
+
+    def stk_push(self, request_body):
+        self.pushes.append(request_body)
+        return StubResponse()
+
+
+def test_stk_push_returns_checkout_request(client, seed, monkeypatch):
+    issuer = seed.user()
+    [invoice] = seed.invoices(issuer, seed.business(seed.user()), 1)
+    stub = StubClient()
+    monkeypatch.setattr(mpesa, 'daraja_client', lambda: stub)
+    monkeypatch.setenv('PASSKEY', 'test-passkey')
+    with client.session_transaction() as session:
+        session['google_id'] = issuer.id
+
+    response = client.post(f'/{invoice.id}/make_payment')
+
+    assert response.status_code == 200
+    assert response.get_json() == {
+        "success": True,
+        "checkout_request_id": "ws_CO_191220191020363925",
+        "merchant_request_id": "29115-34620561-1",
+        "message": "Success. Request accepted for processing",
+    }
+    assert [push["CallbackURL"].rsplit('/', 1)[-1] for push in stub.pushes] == [str(invoice.id)]
+    assert [push["AccountReference"] for push in stub.pushes] == [invoice.payment_reference]
@@ -0,0 +1,50 @@
+from uuid import uuid4
+
+from app.models import db, Invoice, MpesaCallback, Payment
+from app.mpesa_callbacks import MAX_ATTEMPTS, enqueue_callback, mpesa_callback_worker_command, process_pending_callbacks
+from test_scheduled_jobs import stk_callback
+
+
+def test_callback_is_stored_and_applied_by_worker(app, client, seed):
+    issuer = seed.user('issuer')
+    invoice = seed.invoices(issuer, seed.business(seed.user('owner')), 1)[0]
+    payload = stk_callback('QK99999', '25.00')
+
+    for _ in range(2):
+        response = client.post(f'/mpesa_callback/{invoice.id}', data=payload, content_type='application/json')
+        assert response.get_json()['ResultCode'] == 0
+    assert MpesaCallback.query.count() == 1
+
+    result = app.test_cli_runner().invoke(mpesa_callback_worker_command, ['--once'])
+    assert result.exit_code == 0, result.output
+    assert 'payments 1' in result.output
+
+    db.session.expire_all()
+    assert Payment.query.filter_by(transaction_code='QK99999').one().amount == 2500
+    assert db.session.get(Invoice, invoice.id).status == 'paid'
+
+
+def test_failed_callback_is_retried_then_given_up(app, seed):
+    issuer = seed.user('issuer')
+    invoice = seed.invoices(issuer, seed.business(seed.user('owner')), 1)[0]
+    enqueue_callback(invoice.id, stk_callback(None, 10))
+    db.session.commit()
+
+    for _ in range(MAX_ATTEMPTS):
+        report = process_pending_callbacks()
+        assert report['failed'] == 1
+    assert MpesaCallback.query.one().status == 'failed'
+    assert Payment.query.count() == 0
+
+
+def test_callback_for_unknown_invoice_is_kept_as_failed(app, client, seed):
+    invoice_id = uuid4()
+    response = client.post(f'/mpesa_callback/{invoice_id}', data=stk_callback('QK00002', 10),
+                           content_type='application/json')
+
+    assert response.status_code == 200
+    assert response.get_json()['ResultCode'] == 0
+    callback = MpesaCallback.query.one()
+    assert (callback.invoice_id, callback.status) == (None, 'failed')
+    assert callback.last_error == f"invoice {invoice_id} not found"
+    assert process_pending_callbacks()['processed'] == 0
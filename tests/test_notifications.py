@@ -0,0 +1,142 @@
+import threading
+import time
+from contextlib import contextmanager
+from smtplib import SMTPRecipientsRefused, SMTPServerDisconnected
+
+import pytest
+from app import notifications
+from app.notifications import RateLimiter, deliver_messages, provider_limiter
+from flask_mail import Message
+
+
+class StubMail:
+    """Stands in for Flask-Mail: records the recipients sent over each connection,
+    refusing the `refused` recipients and failing the first `unreachable` connects."""
+
+    def __init__(self, refused=(), unreachable=0):
+        self.refused, self.unreachable = set(refused), unreachable
+        self.connections = []
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def connect(self):
+        sent = []
+        with self.lock:
+            if self.unreachable:
+                self.unreachable -= 1
+                raise SMTPServerDisconnected("please run connect() first")
+            self.connections.append(sent)
+        yield StubConnection(self, sent)
+
+
+class StubConnection:
+
+    def __init__(self, mail, sent):
+        self.mail, self.sent = mail, sent
+
+    def send(self, message):
+        recipient = message.recipients[0]
+        if recipient in self.mail.refused:
+            raise SMTPRecipientsRefused({recipient: (550, b'mailbox unavailable')})
+        self.sent.append(recipient)
+
+
+@pytest.fixture
+def stub_mail(app, monkeypatch):
+    app.config.update(MAIL_SERVER='smtp.invotrack.test', MAIL_RATE_LIMIT=0)
+
+    def install(**failures):
+        mail = StubMail(**failures)
+        monkeypatch.setattr(notifications.mail, 'connect', mail.connect)
+        return mail
+    return install
+
+
+def address(n):
+    return f'payer{n}@invotrack.test'
+
+
+def messages(count):
+    return [(n, Message(subject='Invoice Due Reminder', sender='billing@invotrack.test',
+                        recipients=[address(n)], body='due')) for n in range(count)]
+
+
+def test_limiter_spaces_sends_across_threads():
+    limiter = RateLimiter(50)
+    stamps = []
+
+    def send():
+        for _ in range(5):
+            limiter.wait()
+            stamps.append(time.monotonic())
+
+    threads = [threading.Thread(target=send) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stamps.sort()
+    # 20 sends at 50 per second take at least 19 intervals of 20ms
+    assert stamps[-1] - stamps[0] >= 19 * 0.02 - 0.005
+
+
+def test_zero_rate_does_not_wait():
+    limiter = RateLimiter(0)
+    started = time.monotonic()
+    for _ in range(1000):
+        limiter.wait()
+    assert time.monotonic() - started < 0.1
+
+
+def test_limiter_is_shared_per_server_until_its_rate_changes():
+    limiter = provider_limiter('smtp.one.test', 10)
+
+    assert provider_limiter('smtp.one.test', 10) is limiter
+    assert provider_limiter('smtp.two.test', 10) is not limiter
+    assert provider_limiter('smtp.one.test', 20).interval == 0.05
+
+
+def test_each_batch_is_sent_over_one_connection(app, stub_mail):
+    mail = stub_mail()
+    app.config.update(MAIL_BATCH_SIZE=4, MAIL_MAX_WORKERS=2)
+
+    outcomes = deliver_messages(app, messages(10))
+
+    assert sorted(len(sent) for sent in mail.connections) == [2, 4, 4]
+    assert sorted(recipient for sent in mail.connections for recipient in sent) == sorted(map(address, range(10)))
+    assert [outcome["key"] for outcome in outcomes] == list(range(10))
+    assert {outcome["status"] for outcome in outcomes} == {'sent'}
+
+
+def test_deliveries_are_rate_limited(app, stub_mail):
+    stub_mail()
+    app.config.update(MAIL_BATCH_SIZE=2, MAIL_MAX_WORKERS=4, MAIL_RATE_LIMIT=40)
+
+    started = time.monotonic()
+    deliver_messages(app, messages(8))
+
+    # the limit holds across the four workers: 8 sends at 40 per second
+    assert time.monotonic() - started >= 7 / 40 - 0.005
+
+
+def test_refused_recipient_fails_alone(app, stub_mail):
+    mail = stub_mail(refused={address(1)})
+    app.config.update(MAIL_BATCH_SIZE=10)
+
+    outcomes = deliver_messages(app, messages(3))
+
+    assert [outcome["status"] for outcome in outcomes] == ['sent', 'failed', 'sent']
+    assert address(1) in outcomes[1]["error"]
+    assert mail.connections == [[address(0), address(2)]]
+
+
+def test_unreachable_server_fails_the_whole_batch(app, stub_mail):
+    mail = stub_mail(unreachable=1)
+    app.config.update(MAIL_BATCH_SIZE=3, MAIL_MAX_WORKERS=1)
+
+    outcomes = deliver_messages(app, messages(6))
+
+    assert [outcome["status"] for outcome in outcomes] == ['failed'] * 3 + ['sent'] * 3
+    assert outcomes[0]["error"] == "please run connect() first"
+    assert mail.connections == [[address(3), address(4), address(5)]]
@@ -0,0 +1,147 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+from app import outbox
+from app.models import db, OutboxMessage
+from app.outbox import backoff, claim_batch, deliver_pending, enqueue, record_outcomes
+from flask_mail import Message
+
+
+@pytest.fixture
+def invoices(app, seed):
+    issuer = seed.user('issuer')
+    business = seed.business(seed.user('owner'))
+    return seed.invoices(issuer, business, 3)
+
+
+@pytest.fixture
+def no_jitter(monkeypatch):
+    monkeypatch.setattr(outbox.random, 'uniform', lambda low, high: 1.0)
+
+
+def reminder(n):
+    return Message(subject='Invoice Due Reminder', sender='billing@invotrack.test',
+                   recipients=[f'payer{n}@invotrack.test'], body='due')
+
+
+def queue(invoices, day=date(2025, 1, 31)):
+    queued = enqueue('due_reminder', [(invoice.id, reminder(n)) for n, invoice in enumerate(invoices)], day)
+    db.session.commit()
+    return queued
+
+
+def stored(message_id):
+    db.session.expire_all()
+    return db.session.get(OutboxMessage, message_id)
+
+
+def test_enqueue_keeps_one_message_per_invoice_kind_and_day(invoices):
+    assert queue(invoices[:2]) == 2
+    assert queue(invoices) == 1
+    assert queue(invoices, day=date(2025, 2, 1)) == 3
+    assert enqueue('overdue_notice', [(invoices[0].id, reminder(0))], date(2025, 1, 31)) == 1
+    assert OutboxMessage.query.count() == 7
+
+
+def test_claim_is_limited_to_the_batch_and_leased(invoices):
+    queue(invoices)
+
+    first = claim_batch(limit=2)
+    second = claim_batch(limit=2)
+
+    assert (len(first), len(second)) == (2, 1)
+    assert claim_batch(limit=2) == []
+    assert {row.attempts for row in first + second} == {1}
+    message = stored(first[0].id)
+    assert message.status == 'sending'
+    assert message.leased_until > datetime.now() + timedelta(seconds=outbox.LEASE_SECONDS - 5)
+
+
+def test_expired_lease_is_claimed_again(invoices):
+    queue(invoices[:1])
+    claimed = claim_batch(lease_seconds=-1)
+
+    again = claim_batch()
+
+    assert [row.id for row in again] == [claimed[0].id]
+    assert again[0].attempts == 2
+
+
+def test_messages_not_yet_due_are_not_claimed(invoices):
+    queue(invoices[:1])
+    OutboxMessage.query.update({"next_attempt_at": datetime.now() + timedelta(minutes=1)})
+    db.session.commit()
+
+    assert claim_batch() == []
+
+
+def test_backoff_doubles_up_to_the_maximum(no_jitter):
+    assert [backoff(n).total_seconds() for n in range(1, 8)] == [60, 120, 240, 480, 960, 1920, 3600]
+
+
+def test_backoff_is_jittered_by_a_fifth(monkeypatch):
+    monkeypatch.setattr(outbox.random, 'uniform', lambda low, high: high)
+    assert backoff(2).total_seconds() == pytest.approx(144)
+
+
+def test_failed_message_is_retried_with_backoff_then_given_up(invoices, no_jitter):
+    queue(invoices[:1])
+    message_id = OutboxMessage.query.one().id
+
+    delays = []
+    for _ in range(3):
+        claimed = claim_batch()
+        before = datetime.now()
+        assert record_outcomes(claimed, [{"key": message_id, "status": "failed", "error": "451 try later"}],
+                               max_attempts=3) == (0, 1)
+        message = stored(message_id)
+        delays.append(round((message.next_attempt_at - before).total_seconds()))
+        # make the retry due now
+        OutboxMessage.query.update({"next_attempt_at": datetime.now() - timedelta(seconds=1)})
+        db.session.commit()
+
+    assert delays == [60, 120, 240]
+    message = stored(message_id)
+    assert (message.status, message.attempts, message.last_error) == ('failed', 3, "451 try later")
+    assert message.leased_until is None
+    assert claim_batch() == []
+
+
+def test_retried_message_is_sent_later(invoices):
+    queue(invoices[:1])
+    message_id = OutboxMessage.query.one().id
+    record_outcomes(claim_batch(), [{"key": message_id, "status": "failed", "error": "timed out"}])
+    assert stored(message_id).status == 'pending'
+    OutboxMessage.query.update({"next_attempt_at": datetime.now() - timedelta(seconds=1)})
+    db.session.commit()
+
+    assert record_outcomes(claim_batch(), [{"key": message_id, "status": "sent", "error": None}]) == (1, 0)
+
+    message = stored(message_id)
+    assert (message.status, message.attempts, message.last_error) == ('sent', 2, None)
+    assert message.sent_at is not None
+
+
+def test_deliver_pending_sends_one_batch(app, invoices, monkeypatch):
+    queue(invoices)
+    # oldest first: payer0, payer1, then payer2
+    for n, message in enumerate(OutboxMessage.query.order_by(OutboxMessage.recipient)):
+        message.next_attempt_at = datetime.now() - timedelta(minutes=3 - n)
+    db.session.commit()
+    app.config['OUTBOX_BATCH_SIZE'] = 2
+    delivered = []
+
+    def deliver(app, messages):
+        delivered.append([message.recipients[0] for _, message in messages])
+        return [{"key": key, "recipients": message.recipients,
+                 "status": 'failed' if message.recipients[0] == 'payer1@invotrack.test' else 'sent',
+                 "error": "550 mailbox unavailable"} for key, message in messages]
+    monkeypatch.setattr(outbox, 'deliver_messages', deliver)
+
+    assert deliver_pending(app) == (1, 1)
+    assert deliver_pending(app) == (1, 0)
+    assert deliver_pending(app) == (0, 0)
+
+    assert delivered == [['payer0@invotrack.test', 'payer1@invotrack.test'], ['payer2@invotrack.test']]
+    assert [message.status for message in OutboxMessage.query.order_by(OutboxMessage.recipient)] == [
+        'sent', 'pending', 'sent']
@@ -0,0 +1,55 @@
+import pytest
+from sqlalchemy import event
+
+from app.models import db
+from conftest import auth_headers
+
+# Runs every statement a listing request issues through EXPLAIN QUERY PLAN on
+# the migrated schema. A plain "SCAN <table>" is a full table scan; index
+# scans (keyset ordered, bounded by LIMIT) and searches are fine.
+
+LISTINGS = [
+    ('/api/v1/invoices', 'issuer'),
+    ('/api/v1/invoices/status/pending', 'issuer'),
+    ('/api/v1/invoices/business/{business}', 'owner'),
+    ('/api/v1/invoices/business/{business}/status/pending', 'owner'),
+    ('/api/v1/invoices/received', 'owner'),
+    ('/api/v1/invoices/received?status=pending', 'owner'),
+    ('/api/v1/payments/', 'issuer'),
+    ('/api/v1/businesses', 'issuer'),
+]
+
+
+def _full_scans(statement, parameters):
+    with db.engine.connect() as connection:
+        plan = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters).all()
+    details = [row[3] for row in plan]
+    return [detail for detail in details if detail.startswith('SCAN ') and ' USING ' not in detail]
+
+
+@pytest.mark.parametrize('url, viewer', LISTINGS)
+def test_listing_does_not_scan_tables(migrated_app, seed, url, viewer):
+    issuer = seed.user('issuer')
+    owner = seed.user('owner')
+    business = seed.business(owner)
+    seed.invoices(issuer, business, 50, payer=issuer)
+    for _ in range(5):
+        seed.invoices(issuer, seed.business(owner), 50, status='paid')
+
+    captured = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        response = migrated_app.test_client().get(
+            url.format(business=business.id),
+            headers=auth_headers(issuer.id if viewer == 'issuer' else owner.id))
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+    assert response.status_code == 200
+    assert captured
+    for statement, parameters in captured:
+        assert _full_scans(statement, parameters) == [], statement
@@ -0,0 +1,203 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from app import reconciliation
+from app.invoice_numbers import next_invoice_numbers
+from app.models import db, Invoice, InvoiceSummary, Payment
+from app.reconciliation import load_statement, reconcile, reconcile_mpesa_command
+
+PAID_AT = datetime(2024, 1, 5, 10, 0)
+
+
+def entry(receipt, amount, reference=None, line=1, phone='254712345678', time=PAID_AT):
+    return {"line": line, "receipt": receipt, "amount": amount, "phone": phone, "time": time, "reference": reference}
+
+
+@pytest.fixture
+def parties(app, seed):
+    issuer, owner = seed.user('issuer'), seed.user('owner')
+    return issuer, owner, seed.business(owner)
+
+
+def record_payment(invoice, payer, receipt, amount, paid_at=PAID_AT):
+    db.session.add(Payment(invoice_id=invoice.id, payer_id=payer.id, payment_method='mpesa',
+                           transaction_code=receipt, amount=amount, payment_date=paid_at))
+    db.session.commit()
+
+
+def issues(report):
+    return [(flag["receipt"], flag["issue"]) for flag in report["flagged"]]
+
+
+def test_csv_rows_are_parsed_and_unreadable_rows_reported(tmp_path):
+    path = tmp_path / 'statement.csv'
+    path.write_text(
+        'Receipt No.,Completion Time,Paid In,Other Party Info,A/C No.\n'
+        'QK1,2024-01-05 10:00:00,"1,250.50",0712 345 678 - JANE DOE,7KQ2M000001\n'
+        ',2024-01-05 10:01:00,10.00,0712345678,7KQ2M000002\n'
+        'QK3,yesterday,10.00,0712345678,7KQ2M000003\n'
+        'QK4,2024-01-05 10:03:00,ten,0712345678,7KQ2M000004\n'
+    )
+
+    entries, errors = load_statement(str(path))
+
+    assert entries == [{"line": 1, "receipt": 'QK1', "amount": 125050, "phone": '254712345678',
+                        "time": PAID_AT, "reference": '7KQ2M000001'}]
+    assert [(error["line"], error["issue"]) for error in errors] == [(2, 'unreadable'), (3, 'unreadable'),
+                                                                      (4, 'unreadable')]
+    assert errors[0]["detail"] == "missing receipt number"
+    assert errors[1]["detail"] == "unrecognised time: yesterday"
+
+
+def test_json_statement_with_transactions_key(tmp_path):
+    path = tmp_path / 'statement.json'
+    path.write_text(json.dumps({"transactions": [
+        {"TransID": 'QK1', "TransTime": '20240105100000', "TransAmount": '25', "MSISDN": '254712345678',
+         "BillRefNumber": 'REF1'},
+    ]}))
+
+    entries, errors = load_statement(str(path))
+
+    assert errors == []
+    assert [(e["receipt"], e["amount"], e["time"], e["reference"]) for e in entries] == [('QK1', 2500, PAID_AT, 'REF1')]
+
+
+def test_receipts_on_record_are_matched_and_amounts_compared(parties, seed):
+    issuer, owner, business = parties
+    first, second = seed.invoices(issuer, business, 2)
+    record_payment(first, owner, 'QK1', 2500)
+    record_payment(second, owner, 'QK2', 2500, paid_at=PAID_AT - timedelta(days=60))
+
+    report = reconcile([entry('QK1', 2500), entry('QK2', 2500, line=2), entry('QK1', 2400, line=3)])
+
+    assert report["matched"] == 2
+    assert issues(report) == [('QK1', 'amount_mismatch')]
+    assert report["flagged"][0]["detail"] == "statement 24.00, recorded 25.00"
+    assert Payment.query.count() == 2
+
+
+def test_unknown_receipts_pair_with_the_closest_payment(parties, seed):
+    issuer, owner, business = parties
+    [invoice] = seed.invoices(issuer, business, 1)
+    phone = f'254{owner.phone_number[1:]}'
+    record_payment(invoice, owner, 'REC-A', 2500, paid_at=PAID_AT)
+    record_payment(invoice, owner, 'REC-B', 2500, paid_at=PAID_AT + timedelta(minutes=6))
+    payments = {payment.transaction_code: str(payment.id) for payment in Payment.query}
+
+    report = reconcile([
+        entry('QK1', 2500, phone=phone, time=PAID_AT + timedelta(minutes=5)),
+        entry('QK2', 2500, phone=phone, time=PAID_AT + timedelta(minutes=1), line=2),
+        entry('QK3', 2500, phone=phone, time=PAID_AT + timedelta(minutes=30), line=3),
+    ])
+
+    assert issues(report) == [('QK1', 'receipt_mismatch'), ('QK2', 'receipt_mismatch'), ('QK3', 'unknown_invoice')]
+    assert payments['REC-B'] in report["flagged"][0]["detail"]
+    assert payments['REC-A'] in report["flagged"][1]["detail"]
+
+
+def test_missing_payment_is_inserted_and_invoice_marked_paid(parties, seed):
+    issuer, owner, business = parties
+    pending, overdue = seed.invoices(issuer, business, 1) + seed.invoices(issuer, business, 1, status='overdue')
+
+    report = reconcile([entry('QK1', 2500, pending.payment_reference),
+                        entry('QK2', 2500, str(overdue.id), line=2)])
+
+    assert (report["inserted"], report["flagged"]) == (2, [])
+    db.session.expire_all()
+    assert {p.transaction_code: p.payer_id for p in Payment.query} == {'QK1': owner.id, 'QK2': owner.id}
+    assert [pending.status, overdue.status] == ['paid', 'paid']
+    summary = db.session.get(InvoiceSummary, issuer.id)
+    assert (summary.pending_count, summary.overdue_count, summary.paid_count, summary.paid_total) == (0, 0, 2, 5000)
+
+
+def test_dry_run_writes_nothing(parties, seed):
+    issuer, _, business = parties
+    [invoice] = seed.invoices(issuer, business, 1)
+
+    report = reconcile([entry('QK1', 2500, invoice.payment_reference)], dry_run=True)
+
+    assert (report["to_insert"], report["inserted"]) == (1, 0)
+    db.session.expire_all()
+    assert Payment.query.count() == 0
+    assert invoice.status == 'pending'
+
+
+def test_rerun_is_idempotent(parties, seed, monkeypatch):
+    issuer, owner, business = parties
+    [invoice] = seed.invoices(issuer, business, 1)
+    entries = [entry('QK1', 2500, invoice.payment_reference)]
+
+    assert reconcile(entries)["inserted"] == 1
+    again = reconcile(entries)
+    assert (again["matched"], again["inserted"], again["flagged"]) == (1, 0, [])
+
+    # a receipt recorded while the statement was being matched is left alone by the insert
+    record_payment(invoice, owner, 'QK2', 2500, paid_at=PAID_AT - timedelta(days=60))
+    monkeypatch.setattr(reconciliation, '_receipts_on_record', lambda receipts: set())
+    raced = reconcile([entry('QK2', 2500, invoice.payment_reference)])
+    assert (raced["to_insert"], raced["inserted"]) == (1, 0)
+    assert Payment.query.count() == 2
+
+
+def test_invoice_stays_unpaid_until_payments_cover_it(parties, seed):
+    issuer, _, business = parties
+    [invoice] = seed.invoices(issuer, business, 1)
+
+    short = reconcile([entry('QK1', 1000, invoice.payment_reference)])
+    assert issues(short) == [('QK1', 'amount_mismatch')]
+    assert short["flagged"][0]["detail"] == f"invoice {invoice.payment_reference} underpaid: 10.00 of 25.00"
+    db.session.expire_all()
+    assert invoice.status == 'pending'
+
+    rest = reconcile([entry('QK2', 1500, invoice.payment_reference)])
+    assert (rest["inserted"], rest["flagged"]) == (1, [])
+    db.session.expire_all()
+    assert invoice.status == 'paid'
+
+
+def test_overpaid_invoice_is_paid_and_flagged(parties, seed):
+    issuer, _, business = parties
+    [invoice] = seed.invoices(issuer, business, 1)
+
+    report = reconcile([entry('QK1', 3000, invoice.payment_reference)])
+
+    assert report["flagged"][0]["detail"] == f"invoice {invoice.payment_reference} overpaid: 30.00 of 25.00"
+    db.session.expire_all()
+    assert invoice.status == 'paid'
+
+
+def test_command_reports_dry_run(app, parties, seed, tmp_path):
+    issuer, _, business = parties
+    [invoice] = seed.invoices(issuer, business, 1)
+    statement, flagged = tmp_path / 'statement.csv', tmp_path / 'flagged.json'
+    statement.write_text('TransID,TransTime,TransAmount,MSISDN,BillRefNumber\n'
+                         f'QK1,20240105100000,25.00,254712345678,{invoice.payment_reference}\n'
+                         'QK2,20240105100000,25.00,254712345678,NOSUCHREF\n'
+                         'QK3,never,25.00,254712345678,NOSUCHREF\n')
+
+    result = app.test_cli_runner().invoke(reconcile_mpesa_command,
+                                          [str(statement), '--dry-run', '--output', str(flagged)])
+
+    assert result.exit_code == 0, result.output
+    assert result.output.strip() == "2 entries: 0 matched, 1 to insert, 2 flagged"
+    assert [flag["issue"] for flag in json.loads(flagged.read_text())] == ['unreadable', 'unknown_invoice']
+    assert Payment.query.count() == 0
+
+
+def test_payment_reference_names_one_invoice_across_issuers(parties, seed):
+    _, _, business = parties
+    invoices = []
+    for issuer in (seed.user('first'), seed.user('second')):
+        [(number, reference)] = next_invoice_numbers(issuer.id)
+        invoices.append(Invoice(invoice_number=number, payment_reference=reference, issuer_id=issuer.id,
+                                business_id=business.id, total_amount=2500, due_date=datetime(2024, 2, 1)))
+    db.session.add_all(invoices)
+    db.session.commit()
+    assert invoices[0].invoice_number == invoices[1].invoice_number
+
+    report = reconcile([entry('QK1', 2500, invoices[1].payment_reference)])
+
+    assert (report["inserted"], report["flagged"]) == (1, [])
+    assert Payment.query.one().invoice_id == invoices[1].id
+    assert [invoice.status for invoice in invoices] == ['pending', 'paid']
@@ -0,0 +1,74 @@
+import json
+import logging
+from datetime import datetime, timedelta
+
+import pytest
+from app import scheduled_jobs
+from app.models import db, Invoice, MpesaCallback, OutboxMessage, Payment
+from app.mpesa_callbacks import enqueue_callback
+
+# The jobs catch and log their own errors, so each test also checks that
+# nothing was logged at ERROR.
+
+
+@pytest.fixture
+def no_errors(caplog):
+    caplog.set_level(logging.INFO)
+    yield
+    errors = [record.getMessage() for record in caplog.records if record.levelno >= logging.ERROR]
+    assert errors == []
+
+
+@pytest.fixture
+def invoice(app, seed):
+    issuer = seed.user('issuer')
+    business = seed.business(seed.user('owner'))
+    return seed.invoices(issuer, business, 1)[0]
+
+
+def stk_callback(receipt, amount, checkout_request_id='ws_CO_1'):
+    return json.dumps({"Body": {"stkCallback": {
+        "CheckoutRequestID": checkout_request_id,
+        "ResultCode": 0,
+        "ResultDesc": "The service request is processed successfully.",
+        "CallbackMetadata": {"Item": [
+            {"Name": "Amount", "Value": amount},
+            {"Name": "MpesaReceiptNumber", "Value": receipt},
+        ]},
+    }}})
+
+
+def test_update_invoice_status_marks_overdue(invoice, no_errors):
+    invoice.due_date = datetime.now() - timedelta(days=2)
+    db.session.commit()
+
+    scheduled_jobs.update_invoice_status()
+
+    db.session.expire_all()
+    assert db.session.get(Invoice, invoice.id).status == 'overdue'
+
+
+def test_due_notifications_are_queued_and_delivered(invoice, no_errors):
+    invoice.due_date = datetime.now() + timedelta(days=1)
+    db.session.commit()
+
+    scheduled_jobs.send_due_notifications()
+    message = OutboxMessage.query.filter_by(invoice_id=invoice.id).one()
+    assert message.status == 'pending'
+
+    scheduled_jobs.deliver_outbox()
+    db.session.expire_all()
+    assert db.session.get(OutboxMessage, message.id).status == 'sent'
+
+
+def test_process_mpesa_callbacks_records_payment(invoice, no_errors):
+    enqueue_callback(invoice.id, stk_callback('QK12345', 25.00))
+    db.session.commit()
+
+    scheduled_jobs.process_mpesa_callbacks()
+
+    db.session.expire_all()
+    payment = Payment.query.filter_by(transaction_code='QK12345').one()
+    assert payment.amount == 2500
+    assert db.session.get(Invoice, invoice.id).status == 'paid'
+    assert MpesaCallback.query.one().status == 'processed'
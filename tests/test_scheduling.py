@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from app import create_app, scheduler, scheduling
+
+
+@pytest.fixture
+def started(app):
+    # paused, as a newly elected leader is while it registers the jobs
+    scheduler.start(paused=True)
+    yield app
+    # a stopping scheduler runs the jobs that are due
+    scheduler.remove_all_jobs()
+    scheduler.shutdown(wait=False)
+
+
+def test_registering_again_keeps_the_stored_next_run_time(started):
+    scheduling.register_jobs(started)
+    # the previous leader stopped three hours before the job was due to run
+    missed = datetime.now(timezone.utc).replace(microsecond=0) - timedelta(hours=3)
+    scheduler.scheduler.modify_job('update_overdue_invoices', next_run_time=missed)
+    outbox_next_run = scheduler.get_job('deliver_outbox').next_run_time
+
+    # the next leader registers the jobs against the stored ones
+    started.config['OUTBOX_POLL_SECONDS'] = 300
+    scheduling.register_jobs(started)
+
+    # the missed run is still due, so it is caught up once the scheduler resumes
+    assert scheduler.get_job('update_overdue_invoices').next_run_time == missed
+    outbox = scheduler.get_job('deliver_outbox')
+    assert outbox.trigger.interval == timedelta(seconds=300)
+    assert outbox.next_run_time == outbox_next_run
+    assert sorted(job.id for job in scheduler.get_jobs()) == [
+        'deliver_outbox', 'process_mpesa_callbacks', 'send_due_invoice_notifications', 'update_overdue_invoices']
+
+
+@pytest.mark.parametrize('config, cli, elected', [
+    ({}, False, False),
+    ({"SCHEDULER_AUTOSTART": True}, False, True),
+    ({"SCHEDULER_AUTOSTART": True}, True, False),
+])
+def test_scheduler_autostart(tmp_path, monkeypatch, config, cli, elected):
+    calls = []
+    monkeypatch.setattr(scheduling, 'init_scheduler', calls.append)
+    monkeypatch.delenv('SCHEDULER_AUTOSTART', raising=False)
+    if cli:
+        monkeypatch.setenv('FLASK_RUN_FROM_CLI', 'true')
+    else:
+        monkeypatch.delenv('FLASK_RUN_FROM_CLI', raising=False)
+
+    app = create_app({**config, "TESTING": True, "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'app.db'}"})
+
+    assert calls == ([app] if elected else [])
@@ -0,0 +1,59 @@
+import logging
+
+from app.models import db, Business
+from app.search import search_businesses
+
+
+def test_migrated_database_searches_the_index(migrated_app, seed, caplog):
+    owner = seed.user()
+    kiosk = seed.business(owner, 'Mama Mboga Kiosk')
+    seed.business(owner, 'Nairobi Hardware')
+
+    assert search_businesses('mbo kio') == [kiosk.id]
+    assert not [record for record in caplog.records if record.levelno >= logging.WARNING]
+
+
+def test_missing_index_falls_back_to_like(migrated_app, seed, caplog):
+    owner = seed.user()
+    kiosk = seed.business(owner, 'Mama Mboga Kiosk')
+    seed.business(owner, 'Nairobi Hardware')
+    db.session.execute(db.text("DROP TABLE businesses_fts"))
+    db.session.commit()
+
+    assert search_businesses('mboga') == [kiosk.id]
+    assert 'business search index unavailable' in caplog.text
+    # the session is still usable after the failed search
+    assert db.session.query(Business).count() == 2
+
+
+def test_postgres_matches_close_spellings_by_trigram(postgres_app, seed):
+    owner = seed.user()
+    hardware = seed.business(owner, 'Nairobi Hardware')
+    seed.business(owner, 'Mama Mboga Kiosk')
+
+    assert search_businesses('hardwre') == [hardware.id]
+    assert search_businesses('nairobi hardwear') == [hardware.id]
+    assert search_businesses('zzzz') == []
+
+
+def test_postgres_ranks_containing_names_first_and_limits(postgres_app, seed):
+    owner = seed.user()
+    names = ['Kiosk Central', 'Mama Mboga Kiosk', 'Kiosks of Kisumu', 'Nairobi Hardware']
+    businesses = {name: seed.business(owner, name).id for name in names}
+
+    found = search_businesses('kiosk')
+    assert found[:2] == [businesses['Kiosk Central'], businesses['Mama Mboga Kiosk']]
+    assert businesses['Nairobi Hardware'] not in found
+    assert len(search_businesses('kiosk', limit=1)) == 1
+
+
+def test_postgres_search_uses_the_trigram_index(postgres_app, seed):
+    owner = seed.user()
+    seed.business(owner, 'Nairobi Hardware')
+    db.session.execute(db.text("SET LOCAL enable_seqscan = off"))
+
+    plan = db.session.execute(db.text(
+        "EXPLAIN SELECT id FROM businesses WHERE name ILIKE :pattern OR name %> :query"
+    ), {"pattern": '%hardwre%', "query": 'hardwre'}).scalars().all()
+
+    assert any('ix_businesses_name_trgm' in line for line in plan)
@@ -0,0 +1,74 @@
+from datetime import datetime
+
+from sqlalchemy import select
+
+from app.models import db, InvoiceSummary
+from app.scheduled_jobs import sweep_overdue_invoices
+from app.summaries import rebuild_summaries
+from conftest import auth_headers
+
+# The summaries kept up to date on flush must always equal a rebuild from the
+# invoices table, whatever sequence of writes produced them.
+
+
+def _summaries():
+    db.session.expire_all()
+    table = InvoiceSummary.__table__
+    return {row.issuer_id: dict(row._mapping) for row in db.session.execute(select(table))}
+
+
+def _assert_matches_rebuild():
+    maintained = _summaries()
+    rebuild_summaries()
+    assert _summaries() == maintained
+    return maintained
+
+
+def _item(quantity, unit_price, **extra):
+    return {"description": "service", "quantity": quantity, "unit_price": unit_price, **extra}
+
+
+def test_summaries_match_rebuild_across_writes(client, seed):
+    issuer, other = seed.user('issuer'), seed.user('other')
+    business = seed.business(seed.user('owner'))
+    headers = auth_headers(issuer.id)
+
+    created = []
+    for due_date, items in [('01-01-2020', [_item(2, '12.50')]),
+                            ('01-01-2999', [_item(1, '100.00'), _item(3, '0.99')]),
+                            ('01-01-2999', [_item(5, '7.00')]),
+                            ('01-01-2020', [_item(1, '40.00')])]:
+        response = client.post('/api/v1/invoices/create', headers=headers,
+                               json={"business_id": str(business.id), "due_date": due_date, "items": items})
+        assert response.status_code == 201, response.get_json()
+        created.append(response.get_json()["invoice_id"])
+    seed.invoices(other, business, 2)
+    _assert_matches_rebuild()
+
+    assert client.patch(f'/api/v1/invoices/{created[1]}/cancel', headers=headers).status_code == 200
+    _assert_matches_rebuild()
+
+    assert client.delete(f'/api/v1/invoices/{created[2]}/delete', headers=headers).status_code == 200
+    _assert_matches_rebuild()
+
+    item_id = client.get(f'/api/v1/invoices/{created[0]}', headers=headers).get_json()["invoice"]["details"][0]["id"]
+    response = client.put(f'/api/v1/invoices/{created[0]}/update', headers=headers,
+                          json={"items": [_item(4, '12.50', id=item_id), _item(1, '3.00')]})
+    assert response.status_code == 200, response.get_json()
+    _assert_matches_rebuild()
+
+    assert sweep_overdue_invoices(now=datetime(2021, 1, 1))["updated"] == 2
+    summary = _assert_matches_rebuild()[issuer.id]
+    assert (summary["overdue_count"], summary["overdue_total"]) == (2, 5300 + 4000)
+    assert (summary["cancelled_count"], summary["cancelled_total"]) == (1, 10297)
+    assert summary["pending_count"] == 0
+
+    response = client.get('/dashboard', headers=headers)
+    assert response.get_json() == {"success": True, "outstanding_invoices": 3,
+                                   "total_paid": 0, "total_unpaid": 195.97}
+
+
+def test_dashboard_without_invoices(client, seed):
+    response = client.get('/dashboard', headers=auth_headers(seed.user().id))
+    assert response.status_code == 200
+    assert response.get_json()["outstanding_invoices"] == 0
@@ -0,0 +1,98 @@
+from datetime import datetime
+from uuid import UUID
+
+import pytest
+from app.validation import INVOICE_CREATE, INVOICE_UPDATE, ListOf, Schema, ValidationError, optional, positive_int, text
+
+BUSINESS_ID = '0191f4b2-7c4e-7a3b-8f00-000000000001'
+
+
+def invoice(**overrides):
+    data = {"business_id": BUSINESS_ID, "due_date": '31-01-2025',
+            "items": [{"description": ' Design ', "quantity": '1,000', "unit_price": '1,250.50'}]}
+    data.update(overrides)
+    return data
+
+
+def errors(schema, data):
+    with pytest.raises(ValidationError) as raised:
+        schema.validate(data)
+    return raised.value.errors
+
+
+def test_valid_invoice_is_parsed():
+    assert INVOICE_CREATE.validate(invoice()) == {
+        "business_id": UUID(BUSINESS_ID),
+        "due_date": datetime(2025, 1, 31),
+        "items": [{"description": 'Design', "quantity": 1000, "unit_price": 125050}],
+    }
+
+
+def test_single_item_object_is_accepted_as_a_list():
+    item = {"description": 'Design', "quantity": 1, "unit_price": 5}
+    assert INVOICE_CREATE.validate(invoice(items=item))["items"] == [{"description": 'Design', "quantity": 1,
+                                                                        "unit_price": 500}]
+
+
+@pytest.mark.parametrize('field, value, message', [
+    ("business_id", 'not-a-uuid', "invalid id: not-a-uuid"),
+    ("due_date", '2025-01-31', "invalid date format. Use DD-MM-YYYY"),
+    ("items", [], "needs at least 1 item(s)"),
+])
+def test_invalid_field_is_reported_at_its_location(field, value, message):
+    assert errors(INVOICE_CREATE, invoice(**{field: value})) == [{"loc": field, "message": message}]
+
+
+@pytest.mark.parametrize('item, loc, message', [
+    ({"description": '  ', "quantity": 1, "unit_price": 1}, 'description', "cannot be empty"),
+    ({"description": 'x', "quantity": 0, "unit_price": 1}, 'quantity', "must be greater than 0"),
+    ({"description": 'x', "quantity": True, "unit_price": 1}, 'quantity', "invalid integer: True"),
+    ({"description": 'x', "quantity": '1.5', "unit_price": 1}, 'quantity', "invalid integer: 1.5"),
+    ({"description": 'x', "quantity": 1, "unit_price": '0.00'}, 'unit_price', "must be greater than 0"),
+    ({"description": 'x', "quantity": 1, "unit_price": '1.005'}, 'unit_price',
+     "amounts have at most two decimal places: 1.005"),
+    ({"description": 'x', "quantity": 1, "unit_price": 'ten'}, 'unit_price', "invalid amount: ten"),
+    ({"description": 'x', "quantity": 1}, 'unit_price', "is required"),
+])
+def test_invalid_item_field_is_reported_at_its_location(item, loc, message):
+    valid = {"description": 'ok', "quantity": 1, "unit_price": 1}
+    assert errors(INVOICE_CREATE, invoice(items=[valid, item])) == [{"loc": f"items[1].{loc}", "message": message}]
+
+
+def test_every_problem_is_collected():
+    found = errors(INVOICE_CREATE, {"due_date": 'tomorrow', "items": [{"quantity": -1, "unit_price": 1}, 'x']})
+
+    assert found == [
+        {"loc": "business_id", "message": "is required"},
+        {"loc": "due_date", "message": "invalid date format. Use DD-MM-YYYY"},
+        {"loc": "items[0].description", "message": "is required"},
+        {"loc": "items[0].quantity", "message": "must be greater than 0"},
+        {"loc": "items[1]", "message": "must be an object"},
+    ]
+
+
+def test_error_message_names_the_first_problem():
+    with pytest.raises(ValidationError, match=r'^business_id: is required$'):
+        INVOICE_CREATE.validate(invoice(business_id=None))
+    with pytest.raises(ValidationError, match=r'^must be an object$'):
+        INVOICE_CREATE.validate(['not', 'an', 'object'])
+
+
+def test_update_fields_are_optional_except_items():
+    item_id = '0191f4b2-7c4e-7a3b-8f00-000000000002'
+    parsed = INVOICE_UPDATE.validate({"items": [{"id": item_id, "description": 'x', "quantity": 1, "unit_price": 1},
+                                                {"description": 'y', "quantity": 2, "unit_price": '0.5'}]})
+
+    assert parsed == {"items": [{"id": UUID(item_id), "description": 'x', "quantity": 1, "unit_price": 100},
+                                {"description": 'y', "quantity": 2, "unit_price": 50}]}
+    assert errors(INVOICE_UPDATE, {"due_date": '01-02-2025'}) == [{"loc": "items", "message": "is required"}]
+
+
+def test_schemas_compose():
+    schema = Schema({"name": text, "tags": optional(ListOf(text)), "counts": ListOf(positive_int, min_items=2)})
+
+    assert schema.validate({"name": 'a', "counts": [1, '2']}) == {"name": 'a', "counts": [1, 2]}
+    assert errors(schema, {"name": 'a', "tags": ['', 'b'], "counts": [1]}) == [
+        {"loc": "tags[0]", "message": "cannot be empty"},
+        {"loc": "counts", "message": "needs at least 2 item(s)"},
+    ]